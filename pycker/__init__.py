@@ -9,10 +9,17 @@ License: MIT
 """
 
 from .pick import Pick
-from .quantity_error import QuantityError
+from .quantity_error import QuantityError, QuantityErrorArray
 from .wiggle import wiggle
 from .read_stream import StreamReader
+from .super_gather import SuperGather
+from .data_cube import DataCube, ingest
+from .pick_store import PickStore
+from .memory import MemoryBudget
+from .server import PickServer, PickClient
 from .gui import PyckerGUI
 
 __version__ = "1.1.1"
-__all__ = [ "Pick", "QuantityError", "wiggle", "StreamReader", "PyckerGUI" ]
\ No newline at end of file
+__all__ = [ "Pick", "QuantityError", "QuantityErrorArray", "wiggle", "StreamReader", "SuperGather",
+            "DataCube", "ingest", "PickStore", "PickServer", "PickClient",
+            "MemoryBudget", "PyckerGUI" ]
\ No newline at end of file
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from .read_stream import StreamReader
+from .headers import trace_geometry
+from .qc import moveout_residual
+
+__all__ = [ "pick_table", "reciprocity_check", "moveout_outliers", "PICK_DTYPE" ]
+
+PICK_DTYPE = np.dtype([ ("shot", np.int32), ("receiver", np.int32), ("time", np.float64),
+                        ("sampling_rate", np.float64), ("source_x", np.float64), ("source_y", np.float64),
+                        ("receiver_x", np.float64), ("receiver_y", np.float64) ])
+
+
+def pick_table(filenames, picks, nproc = None):
+    """
+    Join all picks of a survey with source and receiver geometry read from
+    trace headers (read by a pool of worker processes).
+
+    Parameters
+    ----------
+    filenames : list of str
+        Paths to stream files.
+    picks : list
+        Picks of each file (list of Pick or None for each receiver).
+    nproc : int or None, default None
+        Number of worker processes. If None, use all available CPUs.
+
+    Returns
+    -------
+    table : ndarray
+        Pick table with dtype PICK_DTYPE. Time is relative to the start time
+        of the record (in s). Sampling rate is the one of the picks.
+        Coordinates and sampling rates not available are NaN.
+    """
+    if not isinstance(filenames, (list, tuple)) or len(picks) != len(filenames):
+        raise ValueError("filenames and picks must be lists of same length")
+    if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+        raise ValueError("nproc must be a positive integer")
+    shots = [ k for k, p in enumerate(picks) if p is not None and any(pick is not None for pick in p) ]
+    if not shots:
+        return np.zeros(0, dtype = PICK_DTYPE)
+    headers = [ (st[0].stats.starttime, trace_geometry(st))
+                for st in StreamReader().read_headers([ filenames[k] for k in shots ], nproc) ]
+
+    tables = []
+    for k, (starttime, geometry) in zip(shots, headers):
+        receivers = np.array([ r for r, pick in enumerate(picks[k])
+                               if pick is not None and pick.time is not None ], dtype = int)
+        receivers = receivers[receivers < len(geometry["channel"])]
+        table = np.zeros(len(receivers), dtype = PICK_DTYPE)
+        table["shot"] = k
+        table["receiver"] = receivers
+        table["time"] = [ picks[k][r].time - starttime for r in receivers ]
+        table["sampling_rate"] = [ picks[k][r].sampling_rate if picks[k][r].sampling_rate is not None
+                                   else np.nan for r in receivers ]
+        for field in [ "source_x", "source_y", "receiver_x", "receiver_y" ]:
+            table[field] = geometry[field][receivers]
+        tables.append(table)
+    return np.concatenate(tables)
+
+
+def _station_ids(table, decimals):
+    ids = np.zeros(2*len(table), dtype = np.int64)
+    for axis in [ "x", "y" ]:
+        coord = np.concatenate((table["source_" + axis], table["receiver_" + axis]))
+        coord = np.round(np.nan_to_num(coord) * 10.**decimals).astype(np.int64)
+        ucoord, inverse = np.unique(coord, return_inverse = True)
+        ids = ids * len(ucoord) + inverse.ravel()
+    _, ids = np.unique(ids, return_inverse = True)
+    ids = ids.ravel()
+    n = len(table)
+    return ids[:n], ids[n:], ids.max() + 1
+
+
+def reciprocity_check(table, tolerance, decimals = 3):
+    """
+    Compare the picks of reciprocal source-receiver pairs. Picks are joined
+    on integer station keys with a sorted index (no nested loops).
+
+    Parameters
+    ----------
+    table : ndarray
+        Pick table with dtype PICK_DTYPE.
+    tolerance : scalar
+        Maximum time difference between reciprocal picks (in s).
+    decimals : int, default 3
+        Number of decimals used to match source and receiver coordinates.
+
+    Returns
+    -------
+    mismatch : ndarray
+        Time difference with the reciprocal pick (in s), NaN if there is no
+        reciprocal pick or no geometry.
+    flagged : ndarray
+        True for picks whose mismatch is greater than tolerance.
+    """
+    n = len(table)
+    mismatch = np.full(n, np.nan)
+    valid = np.nonzero(np.isfinite(table["source_x"]) & np.isfinite(table["receiver_x"]))[0]
+    if len(valid) > 0:
+        sub = table[valid]
+        src, rcv, nstation = _station_ids(sub, decimals)
+        key = src * nstation + rcv
+        ukey, inverse = np.unique(key, return_inverse = True)
+        inverse = inverse.ravel()
+        tmean = np.bincount(inverse, sub["time"]) / np.bincount(inverse)
+        rkey = rcv * nstation + src
+        pos = np.searchsorted(ukey, rkey).clip(0, len(ukey)-1)
+        found = (ukey[pos] == rkey) & (src != rcv)
+        mismatch[valid[found]] = sub["time"][found] - tmean[pos[found]]
+    with np.errstate(invalid = "ignore"):
+        flagged = np.abs(mismatch) > tolerance
+    return mismatch, flagged
+
+
+def _group_order(values, groups):
+    # Same as np.lexsort((values, groups)) but with a single sort
+    vmin, vmax = values.min(), values.max()
+    span = vmax - vmin if vmax > vmin else 1.
+    return np.argsort(groups + 0.5 * (values - vmin) / span)
+
+
+def _group_median(values, groups, ngroup):
+    # Median of each group, NaN for empty groups
+    if len(values) == 0:
+        return np.full(ngroup, np.nan)
+    order = _group_order(values, groups)
+    counts = np.bincount(groups, minlength = ngroup)
+    starts = np.cumsum(counts) - counts
+    lo = (starts + (counts - 1) // 2).clip(0, max(len(values)-1, 0))
+    hi = (starts + counts // 2).clip(0, max(len(values)-1, 0))
+    sorted_values = values[order]
+    med = np.full(ngroup, np.nan)
+    nonempty = counts > 0
+    med[nonempty] = 0.5 * (sorted_values[lo[nonempty]] + sorted_values[hi[nonempty]])
+    return med
+
+
+def moveout_outliers(table, half_width = 2, nmad = 3., min_samples = 1.):
+    """
+    Flag picks departing from a smooth moveout. Within each shot, picks are
+    sorted by signed offset (receiver index if geometry is not available)
+    and compared to the linear extrapolations of their neighbours (see
+    qc.moveout_residual).
+
+    Parameters
+    ----------
+    table : ndarray
+        Pick table with dtype PICK_DTYPE.
+    half_width : int, default 2
+        Number of neighbours on each side.
+    nmad : scalar, default 3.
+        Picks with residual greater than nmad scaled median absolute
+        deviations of their shot are flagged.
+    min_samples : scalar, default 1.
+        Minimum residual scale (in samples at the sampling rate of each
+        pick), so that noise-free picks are not flagged for sub-sample
+        residuals. Picks without sampling rate have no minimum scale.
+
+    Returns
+    -------
+    residual : ndarray
+        Time residual to the neighbour extrapolation (in s).
+    flagged : ndarray
+        True for outliers.
+
+    Examples
+    --------
+    >>> x = np.arange(-48., 50., 2.)
+    >>> table = np.zeros(len(x), dtype = PICK_DTYPE)
+    >>> table["receiver"] = np.arange(len(x))
+    >>> table["source_x"], table["receiver_x"] = 0., x
+    >>> table["time"] = np.round(np.hypot(x, 10.) / 1500. * 4000.) / 4000.
+    >>> table["sampling_rate"] = 4000.
+    >>> int(moveout_outliers(table)[1].sum())
+    0
+    >>> table["time"][[0, 24]] += 0.005
+    >>> np.nonzero(moveout_outliers(table)[1])[0].tolist()
+    [0, 24]
+    """
+    if not isinstance(half_width, int) or half_width < 1:
+        raise ValueError("half_width must be a positive integer")
+    n = len(table)
+    if n == 0:
+        return np.zeros(0), np.zeros(0, dtype = bool)
+    dx = table["receiver_x"] - table["source_x"]
+    dy = np.nan_to_num(table["receiver_y"] - table["source_y"])
+    offset = np.sign(np.where(dx != 0., dx, dy)) * np.hypot(dx, dy)
+    offset = np.where(np.isfinite(offset), offset, table["receiver"])
+    shot = table["shot"].astype(np.int64)
+    order = _group_order(offset, shot)
+    g = shot[order]
+    res = moveout_residual(offset[order], table["time"][order], half_width, g)
+
+    # Picks without residual (e.g. shots with too few picks) are left out
+    finite = np.isfinite(res)
+    ngroup = g.max() + 1
+    center = _group_median(res[finite], g[finite], ngroup)
+    dev = np.abs(res - center[g])
+    scale = 1.4826 * _group_median(dev[finite], g[finite], ngroup)
+    with np.errstate(divide = "ignore"):
+        floor = min_samples / table["sampling_rate"][order]
+    scale = np.fmax(np.nan_to_num(scale[g]), floor)
+    with np.errstate(invalid = "ignore"):
+        flags = finite & (dev > nmad * scale)
+
+    residual = np.empty(n)
+    flagged = np.empty(n, dtype = bool)
+    residual[order] = res
+    flagged[order] = flags
+    return residual, flagged
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""
+Survey ingest into a single memory-mapped data file.
+
+Usage:
+    python -m pycker.data_cube dirname [-o output] [-n nproc]
+
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os, json
+import numpy as np
+from multiprocessing import cpu_count
+from obspy.core.utcdatetime import UTCDateTime
+from .read_stream import StreamReader
+
+__all__ = [ "DataCube", "ingest", "CUBE_NAME" ]
+
+CUBE_NAME = "pycker_cube"
+
+
+def ingest(dirname, output = None, nproc = None):
+    """
+    Decode all stream files of a directory into one memory-mapped data file
+    (float32) and write its index (JSON) next to it. The size and
+    modification time of each file are stored in the index to detect files
+    changed after ingest (see DataCube.is_current).
+
+    Parameters
+    ----------
+    dirname : str
+        Path to directory containing stream files.
+    output : str or None, default None
+        Output path without extension. If None, files are written in dirname
+        as 'pycker_cube.dat' and 'pycker_cube.json'.
+    nproc : int or None, default None
+        Number of worker processes. If None, use all available CPUs.
+
+    Returns
+    -------
+    cube : DataCube
+        Reader of the ingested survey.
+    """
+    if not os.path.isdir(dirname):
+        raise ValueError("dirname must be an existing directory")
+    if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+        raise ValueError("nproc must be a positive integer")
+    dirname = os.path.join(dirname, "")
+    if output is None:
+        output = dirname + CUBE_NAME
+    filenames = StreamReader().read_dir(dirname)
+    if len(filenames) < 1:
+        raise ValueError("dirname is empty or contains incompatible files")
+    nproc = min(nproc or cpu_count(), len(filenames))
+
+    stread = StreamReader()
+    paths = [ dirname + filename for filename in filenames ]
+    stats = [ os.stat(path) for path in paths ]
+    headers = [ (len(st), max(tr.stats.npts for tr in st), st[0].stats.sampling_rate, str(st[0].stats.starttime))
+                for st in stread.read_headers(paths, nproc) ]
+    sizes = [ nrcv * npts for nrcv, npts, _, _ in headers ]
+    offsets = np.concatenate(([ 0 ], np.cumsum(sizes)))
+    buf = np.memmap(output + ".dat", dtype = np.float32, mode = "w+", shape = (int(offsets[-1]),))
+    for (_, X, _), offset, size in zip(stread.read_many(paths, nproc, dtype = np.float32), offsets, sizes):
+        buf[offset:offset+size] = X.ravel()
+    buf.flush()
+    del buf
+
+    index = {
+        "dtype": "float32",
+        "files": [ { "filename": filename,
+                     "offset": int(offset),
+                     "shape": list(header[:2]),
+                     "sampling_rate": header[2],
+                     "starttime": header[3],
+                     "size": stat.st_size,
+                     "mtime": stat.st_mtime }
+                   for filename, offset, header, stat in zip(filenames, offsets, headers, stats) ],
+        }
+    with open(output + ".json", "w") as f:
+        json.dump(index, f, indent = 1)
+    return DataCube(output)
+
+
+class DataCube:
+    """
+    Random access reader of a survey ingested with ingest. Shots are sliced
+    from the memory-mapped data file without decoding.
+
+    Parameters
+    ----------
+    filename : str
+        Path to data cube without extension.
+    """
+
+    def __init__(self, filename):
+        filename = os.path.splitext(filename)[0] if filename.endswith((".dat", ".json")) else filename
+        if not os.path.isfile(filename + ".json") or not os.path.isfile(filename + ".dat"):
+            raise ValueError("data cube '%s' not found" % filename)
+        with open(filename + ".json", "r") as f:
+            index = json.load(f)
+        files = index["files"]
+        self._filenames = [ entry["filename"] for entry in files ]
+        self._lookup = dict((name, k) for k, name in enumerate(self._filenames))
+        self._offsets = np.array([ entry["offset"] for entry in files ], dtype = np.int64)
+        self._shapes = np.array([ entry["shape"] for entry in files ], dtype = np.int64)
+        self._sampling_rates = np.array([ entry["sampling_rate"] for entry in files ], dtype = float)
+        self._starttimes = [ UTCDateTime(entry["starttime"]) for entry in files ]
+        self._stats = [ (entry.get("size"), entry.get("mtime")) for entry in files ]
+        self._data = np.memmap(filename + ".dat", dtype = index["dtype"], mode = "r")
+
+    def __len__(self):
+        return len(self._filenames)
+
+    def __contains__(self, filename):
+        return filename in self._lookup
+
+    def index(self, filename):
+        """
+        Index of a shot.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename (without directory).
+
+        Returns
+        -------
+        i : int
+            Shot index.
+        """
+        if filename not in self._lookup:
+            raise ValueError("'%s' not in data cube" % filename)
+        return self._lookup[filename]
+
+    def is_current(self, filename, path):
+        """
+        Check that a shot has not changed since ingest.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename (without directory).
+        path : str
+            Path to the stream file of the shot.
+
+        Returns
+        -------
+        current : bool
+            True if the shot is in the data cube and the size and
+            modification time of its file are unchanged (False for cubes
+            ingested without them).
+        """
+        if filename not in self._lookup:
+            return False
+        size, mtime = self._stats[self._lookup[filename]]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return size == stat.st_size and mtime == stat.st_mtime
+
+    def shot(self, i):
+        """
+        Traces of a shot.
+
+        Parameters
+        ----------
+        i : int or str
+            Shot index or filename.
+
+        Returns
+        -------
+        X : ndarray
+            Read-only view of the seismic traces. Each row corresponds to a
+            seismic record.
+        """
+        if not isinstance(i, (int, np.integer)):
+            i = self.index(i)
+        nrcv, npts = self._shapes[i]
+        offset = self._offsets[i]
+        return self._data[offset:offset+nrcv*npts].reshape((nrcv, npts))
+
+    def receiver(self, j, shots = None):
+        """
+        Common-receiver gather.
+
+        Parameters
+        ----------
+        j : int
+            Receiver index.
+        shots : list of int or None, default None
+            Shot indices. If None, use all shots.
+
+        Returns
+        -------
+        X : ndarray
+            Seismic traces of receiver j, zero-padded to the longest record.
+            Each row corresponds to a shot.
+        shots : ndarray
+            Indices of the shots recorded by receiver j.
+        """
+        shots = np.arange(len(self)) if shots is None else np.asarray(shots)
+        shots = shots[self._shapes[shots,0] > j]
+        npts = self._shapes[shots,1]
+        X = np.zeros((len(shots), npts.max() if len(shots) else 0), dtype = np.float32)
+        for k, (i, n) in enumerate(zip(shots, npts)):
+            start = self._offsets[i] + j * n
+            X[k,:n] = self._data[start:start+n]
+        return X, shots
+
+    @property
+    def filenames(self):
+        """
+        list of str
+        Shot filenames.
+        """
+        return self._filenames
+
+    @property
+    def shapes(self):
+        """
+        ndarray
+        Number of receivers and samples of each shot.
+        """
+        return self._shapes
+
+    @property
+    def sampling_rates(self):
+        """
+        ndarray
+        Sampling rate of each shot (in Hz).
+        """
+        return self._sampling_rates
+
+    @property
+    def starttimes(self):
+        """
+        list of UTCDateTime
+        Start time of each shot.
+        """
+        return self._starttimes
+
+
+def main():
+    """
+    Ingest a survey directory from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description = "Decode a survey directory into a memory-mapped data cube.")
+    parser.add_argument("dirname", help = "directory containing stream files")
+    parser.add_argument("-o", "--output", default = None, help = "output path without extension")
+    parser.add_argument("-n", "--nproc", type = int, default = None, help = "number of worker processes")
+    args = parser.parse_args()
+    cube = ingest(args.dirname, args.output, args.nproc)
+    print("%d files ingested" % len(cube))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+
+"""
+Export of all picks of a survey to CSV or QuakeML.
+
+Usage:
+    python -m pycker.export dirname output [-p picks]
+
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os, pickle
+import numpy as np
+from obspy.core.utcdatetime import UTCDateTime
+from .read_stream import StreamReader
+from .quantity_error import QuantityErrorArray
+from .pick_store import PickStore
+from .headers import read_geometry, GEOMETRY_FIELDS
+from .server import STORE_NAME, PickClient
+
+__all__ = [ "pick_records", "export_csv", "iter_events", "export_quakeml", "RECORD_DTYPE" ]
+
+RECORD_DTYPE = np.dtype([ ("filename", object), ("receiver", np.int32), ("time", "U30"),
+                          ("traveltime", np.float64), ("index", np.float64), ("shift", np.float64),
+                          ("sampling_rate", np.float64), ("uncertainty", np.float64),
+                          ("lower_uncertainty", np.float64), ("upper_uncertainty", np.float64) ]
+                        + [ (field, np.float64) for field in GEOMETRY_FIELDS ])
+
+_CSV_FORMATS = [ "%s", "%d", "%s" ] + [ "%.9g" ] * (len(RECORD_DTYPE) - 3)
+
+
+def _time_strings(times):
+    # ISO 8601 strings of UTCDateTime (or epoch seconds) with nanoseconds,
+    # formatted at once
+    missing = np.iinfo(np.int64).min
+    ns = np.array([ t.ns if isinstance(t, UTCDateTime) else int(round(t * 1e9)) if t is not None
+                    else missing for t in times ], dtype = np.int64)
+    valid = ns != missing
+    strings = np.char.add(np.datetime_as_string(ns.astype("datetime64[ns]"), unit = "ns"), "Z")
+    strings[~valid] = ""
+    return strings
+
+
+def pick_records(filename, picks, geometry = None):
+    """
+    Convert the picks of a shot to records. Pick attributes are gathered
+    into arrays once and converted column by column.
+
+    Parameters
+    ----------
+    filename : str
+        Shot filename.
+    picks : list or None
+        Pick (or None) of each receiver.
+    geometry : dict or None, default None
+        Arrays of GEOMETRY_FIELDS of each receiver. If None, geometry is NaN.
+
+    Returns
+    -------
+    records : ndarray
+        Pick records with dtype RECORD_DTYPE. Time is the absolute pick time
+        (ISO 8601), traveltime is relative to the start time of the record
+        (in s). Values not available are NaN.
+    """
+    picked = [ (r, pick) for r, pick in enumerate(picks or []) if pick is not None ]
+    records = np.zeros(len(picked), dtype = RECORD_DTYPE)
+    if not picked:
+        return records
+    receivers, picked = zip(*picked)
+    records["filename"] = filename
+    records["receiver"] = receivers
+    records["time"] = _time_strings([ pick.time for pick in picked ])
+    for field in [ "index", "shift", "sampling_rate" ]:
+        records[field] = np.array([ getattr(pick, field) for pick in picked ], dtype = float)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        records["traveltime"] = records["index"] / records["sampling_rate"]
+    errors = QuantityErrorArray.fromlist([ pick.time_errors for pick in picked ])
+    for field in [ "uncertainty", "lower_uncertainty", "upper_uncertainty" ]:
+        records[field] = getattr(errors, field)
+    rcv = records["receiver"]
+    for field in GEOMETRY_FIELDS:
+        records[field] = np.nan
+        if geometry is not None:
+            inside = rcv < len(geometry[field])
+            records[field][inside] = np.asarray(geometry[field], dtype = float)[rcv[inside]]
+    return records
+
+
+def _shot_picks(picks, filename, k):
+    if isinstance(picks, (PickStore, PickClient)):
+        return picks.get_picks(filename)
+    else:
+        return picks[k]
+
+
+def _shot_geometry(dirname, filename, picks):
+    # Trace headers of local files first, then geometry stored with picks
+    try:
+        if dirname is not None:
+            return read_geometry(dirname + filename)
+        elif isinstance(picks, PickClient):
+            return picks.geometry(filename)
+        elif isinstance(picks, PickStore):
+            return picks.get_geometry(filename)
+    except Exception:
+        pass
+    return None
+
+
+def export_csv(output, filenames, picks, dirname = None, chunksize = 10000):
+    """
+    Write the picks of all shots to a CSV file (one row per pick, columns of
+    RECORD_DTYPE). Shots are converted one at a time and rows are written by
+    chunks so that memory use does not depend on the size of the survey.
+
+    Parameters
+    ----------
+    output : str
+        Path to output CSV file.
+    filenames : list of str
+        Shot filenames.
+    picks : list, PickStore or PickClient
+        Picks of each file (list of Pick or None for each receiver), pick
+        storage or client of a pick server.
+    dirname : str or None, default None
+        Path to directory containing stream files. If not None, geometry is
+        read from trace headers, otherwise from the pick storage or server
+        (if any).
+    chunksize : int, default 10000
+        Number of rows written at once.
+
+    Returns
+    -------
+    npicks : int
+        Number of picks written.
+    """
+    if not isinstance(picks, (PickStore, PickClient)) and len(picks) != len(filenames):
+        raise ValueError("picks must have the same length as filenames")
+    if not isinstance(chunksize, int) or chunksize < 1:
+        raise ValueError("chunksize must be a positive integer")
+    if dirname is not None:
+        dirname = os.path.join(dirname, "")
+    npicks = 0
+    with open(output, "w") as f:
+        f.write(",".join(RECORD_DTYPE.names) + "\n")
+        chunk = []
+        for k, filename in enumerate(filenames):
+            shot_picks = _shot_picks(picks, filename, k)
+            if not shot_picks or all(pick is None for pick in shot_picks):
+                continue
+            geometry = _shot_geometry(dirname, filename, picks)
+            chunk.append(pick_records(filename, shot_picks, geometry))
+            if sum(len(records) for records in chunk) >= chunksize:
+                records = np.concatenate(chunk)
+                np.savetxt(f, records, fmt = _CSV_FORMATS, delimiter = ",")
+                npicks += len(records)
+                chunk = []
+        if chunk:
+            records = np.concatenate(chunk)
+            np.savetxt(f, records, fmt = _CSV_FORMATS, delimiter = ",")
+            npicks += len(records)
+    return npicks
+
+
+def iter_events(filenames, picks):
+    """
+    Convert the picks of each shot to an ObsPy Event. Events are created
+    one at a time.
+
+    Parameters
+    ----------
+    filenames : list of str
+        Shot filenames.
+    picks : list, PickStore or PickClient
+        Picks of each file (list of Pick or None for each receiver), pick
+        storage or client of a pick server.
+
+    Yields
+    ------
+    event : obspy.core.event.Event
+        Picks of a shot with absolute times (UTCDateTime) and time
+        uncertainties. The station code of a pick is its receiver index and
+        the event description is the shot filename.
+    """
+    from obspy.core import event as ev
+    for k, filename in enumerate(filenames):
+        shot_picks = _shot_picks(picks, filename, k)
+        records = pick_records(filename, shot_picks)
+        if len(records) == 0:
+            continue
+        event = ev.Event(event_descriptions = [ ev.EventDescription(text = filename) ])
+        for rec in records:
+            errors = ev.QuantityError(*[ float(rec[field]) if np.isfinite(rec[field]) else None
+                                         for field in [ "uncertainty", "lower_uncertainty", "upper_uncertainty" ] ])
+            pick = shot_picks[rec["receiver"]]
+            if isinstance(pick.time, UTCDateTime):
+                time = UTCDateTime(ns = pick.time.ns, precision = 9)
+            else:
+                time = UTCDateTime(pick.time) if pick.time is not None else None
+            event.picks.append(ev.Pick(time = time, time_errors = errors, phase_hint = pick.phase_hint,
+                                       waveform_id = ev.WaveformStreamID(station_code = str(rec["receiver"])),
+                                       method_id = "smi:local/pycker"))
+        yield event
+
+
+def export_quakeml(output, filenames, picks):
+    """
+    Write the picks of all shots to a QuakeML file (one event per shot, see
+    iter_events).
+
+    Parameters
+    ----------
+    output : str
+        Path to output QuakeML file.
+    filenames : list of str
+        Shot filenames.
+    picks : list, PickStore or PickClient
+        Picks of each file (list of Pick or None for each receiver), pick
+        storage or client of a pick server.
+
+    Returns
+    -------
+    npicks : int
+        Number of picks written.
+    """
+    from obspy.core.event import Catalog
+    catalog = Catalog(events = list(iter_events(filenames, picks)))
+    catalog.write(output, format = "QUAKEML")
+    return sum(len(event.picks) for event in catalog)
+
+
+def main():
+    """
+    Export picks from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description = "Export all picks of a directory to CSV or QuakeML (from output extension).")
+    parser.add_argument("dirname", help = "directory containing stream files")
+    parser.add_argument("output", help = "output file (.csv or .xml)")
+    parser.add_argument("-p", "--picks", default = None, help = "pick pickle file or database")
+    args = parser.parse_args()
+    dirname = os.path.join(args.dirname, "")
+    filenames = StreamReader().read_dir(dirname)
+    path = args.picks if args.picks is not None else dirname + STORE_NAME
+    if path.endswith(".pickle"):
+        with open(path, "rb") as f:
+            picks = pickle.load(f)
+    elif os.path.isfile(path):
+        picks = PickStore(path)
+    else:
+        parser.error("no pick file or database found")
+    if args.output.lower().endswith(".csv"):
+        npicks = export_csv(args.output, filenames, picks, dirname)
+    else:
+        npicks = export_quakeml(args.output, filenames, picks)
+    print("%d picks exported" % npicks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+
+__all__ = [ "agc", "tpow_gain", "exp_gain", "apply_gain", "GAINS" ]
+
+GAINS = [ "agc", "tpow", "exp" ]
+
+
+def _dtype(X):
+    # Keep single precision gathers in single precision
+    return np.result_type(X.dtype, np.float32)
+
+
+def agc(X, window):
+    """
+    Automatic gain control. Each sample is divided by the RMS amplitude of a
+    centered sliding window, computed with cumulative sums so that the cost
+    does not depend on the window length.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    window : int
+        Window length (in samples).
+
+    Returns
+    -------
+    Y : ndarray
+        Gained seismic traces.
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    if not isinstance(window, (int, np.integer)) or window < 1:
+        raise ValueError("window must be a positive integer")
+    nrcv, npts = X.shape
+    half = window // 2
+    S = np.zeros((nrcv, npts+1))
+    np.cumsum(np.square(X, dtype = np.float64), axis = 1, out = S[:,1:])
+    i = np.arange(npts)
+    lo = np.maximum(i - half, 0)
+    hi = np.minimum(i + window - half, npts)
+    ms = (S[:,hi] - S[:,lo]) / (hi - lo)
+    rms = np.sqrt(np.maximum(ms, 0.))
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        Y = np.where(rms > 0., X / rms, 0.)
+    return Y.astype(_dtype(X), copy = False)
+
+
+def tpow_gain(X, sampling_rate, power = 2.):
+    """
+    Time power gain (t^n).
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+    power : scalar, default 2.
+        Exponent of time.
+
+    Returns
+    -------
+    Y : ndarray
+        Gained seismic traces.
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    t = np.arange(X.shape[1]) / float(sampling_rate)
+    return X * (t**power).astype(_dtype(X))
+
+
+def exp_gain(X, sampling_rate, alpha = 1.):
+    """
+    Exponential gain (exp(alpha*t)).
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+    alpha : scalar, default 1.
+        Gain coefficient (in 1/s).
+
+    Returns
+    -------
+    Y : ndarray
+        Gained seismic traces.
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    t = np.arange(X.shape[1]) / float(sampling_rate)
+    return X * np.exp(alpha * t).astype(_dtype(X))
+
+
+def apply_gain(X, method, value, sampling_rate = 1.):
+    """
+    Apply a display gain.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    method : str
+        Gain method:
+            - 'agc', value is the window length (in samples),
+            - 'tpow', value is the exponent of time,
+            - 'exp', value is the gain coefficient (in 1/s).
+    value : scalar
+        Gain parameter.
+    sampling_rate : scalar, default 1.
+        Sampling rate (in Hz).
+
+    Returns
+    -------
+    Y : ndarray
+        Gained seismic traces.
+    """
+    if method == "agc":
+        return agc(X, int(value))
+    elif method == "tpow":
+        return tpow_gain(X, sampling_rate, value)
+    elif method == "exp":
+        return exp_gain(X, sampling_rate, value)
+    else:
+        raise ValueError("method must be either 'agc', 'tpow' or 'exp'")
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+"""
+Virtualized file list for Pycker Viewer.
+
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+from fnmatch import fnmatch
+
+import sys
+if sys.version_info[0] < 3:
+    import Tkinter as tk
+    import ttk
+    import tkFont as font
+else:
+    import tkinter as tk
+    import tkinter.ttk as ttk
+    from tkinter import font
+
+__all__ = [ "FileList" ]
+
+
+class FileList(ttk.Frame):
+    """
+    List of files with a filter entry and a status column (e.g. pick
+    completion). Only the visible rows are inserted in the listboxes and
+    rendered again when the list is scrolled, so that the cost of loading or
+    updating the list does not depend on the number of files. Items can be
+    displayed in another order than their index order (see set_order).
+
+    Parameters
+    ----------
+    master : tkinter object
+        Parent widget.
+    on_open : callable or None, default None
+        Function called with the item index and the read delay (0 when an
+        item is opened explicitly, None when browsing with arrow keys).
+    scroll : int, default 3
+        Number of rows scrolled by a mouse wheel step.
+    """
+
+    def __init__(self, master, on_open = None, scroll = 3, **kwargs):
+        ttk.Frame.__init__(self, master, **kwargs)
+        self._on_open = on_open
+        self._scroll = scroll
+        self._items = []
+        self._status = []
+        self._order = None
+        self._rows = None
+        self._positions = None
+        self._top = 0
+        self._nrows = 1
+        self._selected = None
+
+        # Filter
+        self._pattern = tk.StringVar(self)
+        self._pattern.trace("w", self._apply_filter)
+        entry = ttk.Entry(self, textvariable = self._pattern)
+        entry.bind("<Return>", self._open_first)
+        entry.bind("<Down>", lambda event: self._names.focus_set())
+
+        # Listboxes
+        self._scrollbar = ttk.Scrollbar(self, command = self._yview)
+        self._names = tk.Listbox(self, activestyle = "none", exportselection = False)
+        self._counts = tk.Listbox(self, activestyle = "none", exportselection = False,
+                                  width = 8, justify = "right", takefocus = False)
+        for listbox in [ self._names, self._counts ]:
+            listbox.bind("<Configure>", self._resize)
+            listbox.bind("<Button-1>", self._click)
+            listbox.bind("<Double-Button-1>", self._double_click)
+            listbox.bind("<MouseWheel>", lambda event: self._wheel(-1 if event.delta > 0 else 1))
+            listbox.bind("<Button-4>", lambda event: self._wheel(-1))
+            listbox.bind("<Button-5>", lambda event: self._wheel(1))
+            listbox.bind("<B1-Motion>", lambda event: "break")
+        self._names.bind("<Down>", lambda event: self._move(1))
+        self._names.bind("<Up>", lambda event: self._move(-1))
+        self._names.bind("<Next>", lambda event: self._move(self._nrows))
+        self._names.bind("<Prior>", lambda event: self._move(-self._nrows))
+        self._names.bind("<Return>", lambda event: self._open(self._selected, 0))
+
+        # Layout
+        entry.grid(row = 0, column = 0, columnspan = 3, sticky = "ew")
+        self._names.grid(row = 1, column = 0, sticky = "nsew")
+        self._counts.grid(row = 1, column = 1, sticky = "ns")
+        self._scrollbar.grid(row = 1, column = 2, sticky = "ns")
+        self.rowconfigure(1, weight = 1)
+        self.columnconfigure(0, weight = 1)
+
+    def set_items(self, items, status = None):
+        """
+        Replace all items.
+
+        Parameters
+        ----------
+        items : list of str
+            Item names.
+        status : list of str or None, default None
+            Status of each item. If None, status is empty.
+        """
+        self._items = list(items)
+        self._status = list(status) if status is not None else [ "" ] * len(self._items)
+        self._order = None
+        self._selected = None
+        self._apply_filter()
+
+    def set_order(self, order = None):
+        """
+        Set the display order of items. Item indices are unchanged.
+
+        Parameters
+        ----------
+        order : list of int or None, default None
+            Item indices in display order. If None, items are displayed in
+            index order.
+        """
+        if order is not None:
+            order = [ int(i) for i in order ]
+            if sorted(order) != list(range(len(self._items))):
+                raise ValueError("order must be a permutation of item indices")
+        self._order = order
+        self._apply_filter()
+
+    def append(self, item, status = ""):
+        """
+        Append an item.
+
+        Parameters
+        ----------
+        item : str
+            Item name.
+        status : str, default ''
+            Item status.
+        """
+        self._items.append(item)
+        self._status.append(status)
+        index = len(self._items) - 1
+        if self._order is not None:
+            self._order.append(index)
+        if self._rows is not None and self._match(item):
+            self._positions[index] = len(self._rows)
+            self._rows.append(index)
+        self._render()
+
+    def set_status(self, index, status):
+        """
+        Update the status of an item.
+
+        Parameters
+        ----------
+        index : int
+            Item index.
+        status : str
+            Item status.
+        """
+        if self._status[index] != status:
+            self._status[index] = status
+            row = self._row(index)
+            if row is not None and self._top <= row < self._top + self._nrows:
+                self._counts.delete(row - self._top)
+                self._counts.insert(row - self._top, status)
+
+    def select(self, index):
+        """
+        Highlight an item and scroll the list to show it (if not filtered
+        out).
+
+        Parameters
+        ----------
+        index : int or None
+            Item index. If None, clear selection.
+        """
+        self._selected = index
+        row = self._row(index) if index is not None else None
+        if row is not None:
+            if row < self._top:
+                self._top = row
+            elif row >= self._top + self._nrows:
+                self._top = row - self._nrows + 1
+        self._render()
+
+    def neighbour(self, index, step = 1):
+        """
+        Item displayed some rows away from another.
+
+        Parameters
+        ----------
+        index : int
+            Item index.
+        step : int, default 1
+            Number of rows (negative for rows above).
+
+        Returns
+        -------
+        index : int or None
+            Item index, None if the item is filtered out or the row is out
+            of the list.
+        """
+        row = self._row(index)
+        if row is None or not 0 <= row + step < self._nitems:
+            return None
+        return self._item(row + step)
+
+    @property
+    def selected(self):
+        """
+        int or None
+        Index of selected item.
+        """
+        return self._selected
+
+    def _match(self, item):
+        pattern = self._pattern.get()
+        if any(c in pattern for c in "*?["):
+            return fnmatch(item.lower(), pattern.lower())
+        else:
+            return pattern.lower() in item.lower()
+
+    def _apply_filter(self, *args):
+        # Rows are indices of the items matching the pattern in display
+        # order (None if all in index order)
+        if self._pattern.get() or self._order is not None:
+            order = self._order if self._order is not None else range(len(self._items))
+            self._rows = [ i for i in order if self._match(self._items[i]) ]
+            self._positions = dict((i, row) for row, i in enumerate(self._rows))
+        else:
+            self._rows = None
+            self._positions = None
+        self._top = 0
+        self.select(self._selected)
+
+    @property
+    def _nitems(self):
+        return len(self._items) if self._rows is None else len(self._rows)
+
+    def _item(self, row):
+        return row if self._rows is None else self._rows[row]
+
+    def _row(self, index):
+        if self._rows is None:
+            return index if 0 <= index < len(self._items) else None
+        return self._positions.get(index)
+
+    def _render(self):
+        n = self._nitems
+        self._top = max(min(self._top, n - self._nrows), 0)
+        last = min(self._top + self._nrows, n)
+        indices = [ self._item(row) for row in range(self._top, last) ]
+        for listbox, values in zip([ self._names, self._counts ], [ self._items, self._status ]):
+            listbox.delete(0, tk.END)
+            if indices:
+                listbox.insert(tk.END, *[ values[i] for i in indices ])
+            if self._selected in indices:
+                listbox.selection_set(indices.index(self._selected))
+        if n > 0:
+            self._scrollbar.set(float(self._top) / n, float(last) / n)
+        else:
+            self._scrollbar.set(0., 1.)
+
+    def _resize(self, event):
+        linespace = font.Font(font = self._names.cget("font")).metrics("linespace") \
+                    + 2 * int(self._names.cget("selectborderwidth"))
+        nrows = max(1, (self._names.winfo_height() - 2 * int(self._names.cget("borderwidth"))) // linespace)
+        if nrows != self._nrows:
+            self._nrows = nrows
+            self.select(self._selected)
+
+    def _yview(self, *args):
+        if args[0] == "moveto":
+            self._top = int(round(float(args[1]) * self._nitems))
+        elif args[0] == "scroll":
+            step = self._nrows if args[2] == "pages" else 1
+            self._top += int(args[1]) * step
+        self._render()
+
+    def _wheel(self, direction):
+        self._top += direction * self._scroll
+        self._render()
+        return "break"
+
+    def _click(self, event):
+        row = self._top + self._names.nearest(event.y)
+        if row < self._nitems:
+            self.select(self._item(row))
+        self._names.focus_set()
+        return "break"
+
+    def _double_click(self, event):
+        self._click(event)
+        self._open(self._selected, 0)
+        return "break"
+
+    def _move(self, step):
+        if self._nitems > 0:
+            row = self._row(self._selected) if self._selected is not None else None
+            if row is None:
+                row = 0
+            else:
+                row = max(min(row + step, self._nitems - 1), 0)
+            if self._item(row) != self._selected:
+                self.select(self._item(row))
+                self._open(self._selected, None)
+        return "break"
+
+    def _open_first(self, event):
+        if self._nitems > 0:
+            self.select(self._item(0))
+            self._open(self._selected, 0)
+        return "break"
+
+    def _open(self, index, delay):
+        if index is not None and self._on_open is not None:
+            self._on_open(index, delay)
@@ -10,16 +10,35 @@ License: MIT
 
 from matplotlib.figure import Figure
 from matplotlib.gridspec import GridSpec
-from matplotlib.ticker import FormatStrFormatter
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2TkAgg
+from matplotlib.ticker import FormatStrFormatter, FuncFormatter, MaxNLocator
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+try:
+    from matplotlib.backends.backend_tkagg import NavigationToolbar2Tk
+except ImportError:
+    from matplotlib.backends.backend_tkagg import NavigationToolbar2TkAgg as NavigationToolbar2Tk
 
-from obspy.signal.filter import lowpass, highpass
 from obspy.core.utcdatetime import UTCDateTime
 
 import numpy as np
 from ..pick import Pick
-from ..wiggle import wiggle
+from ..wiggle import wiggle, wiggle_image, RasterCache, _envelope, _visible_samples
 from ..read_stream import StreamReader
+from ..super_gather import SuperGather
+from ..spectrum import SpectrumCache, filter_response
+from ..pipeline import ProcessingPipeline, filter_traces
+from ..resample import rate_ratio, resample
+from ..gain import apply_gain, GAINS
+from ..data_cube import DataCube, CUBE_NAME
+from ..server import PickClient
+from ..qc import survey_qc, shot_summary
+from ..consistency import pick_table, reciprocity_check, moveout_outliers
+from ..memory import MemoryBudget, array_nbytes, picks_nbytes, figure_nbytes
+from ..headers import read_geometry, read_statics, empty_geometry
+from ..moveout import PhaseShifter, lmo_shifts
+from ..watch import FolderWatcher
+from ..snapping import PickSnapper
+from ..uncertainty import snr_uncertainty
+from ..export import export_csv, export_quakeml
 
 import os, sys
 if sys.version_info[0] < 3:
@@ -28,13 +47,18 @@ if sys.version_info[0] < 3:
     import tkMessageBox as tkmessage
     import ttk
     import tkFont as font
+    import tkSimpleDialog as tksimple
 else:
     import tkinter as tk
     import tkinter.filedialog as tkfile
     import tkinter.messagebox as tkmessage
     import tkinter.ttk as ttk
     from tkinter import font
+    import tkinter.simpledialog as tksimple
 from .ttk_spinbox import Spinbox
+from .spectrum_panel import SpectrumPanel
+from .scheduler import RenderScheduler
+from .file_list import FileList
     
 try:
     import cPickle as pickle
@@ -64,22 +88,58 @@ class PyckerGUI():
     _first_import = True
     _current_file = None
     _current_index = None
+    _gather = None
+    _gather_key = None
+    _raw_key = None
+    _cube = None
+    _client = None
+    _flagged = {}
+    _geometries = {}
+    _statics = {}
+    _shifter = None
+    _trace_shifts = None
+    _watcher = None
+    _watch_after = None
+    _spectrum_panel = None
+    _raw = None
+    _traces = None
+    _snapper = None
+    _viewports = None
+    _params = {}
     UNITS = [ "samples", "s", "ms", "us" ]
+    WATCH_INTERVAL = 2000
+    MAX_FLAGGED = 20
     
     def __init__(self, master, ncolumn = 2):
         self._ncolumn = ncolumn
         self.master = master
-        master.title("Pycker Viewer")
-        master.protocol("WM_DELETE_WINDOW", self.close_window)
-        master.geometry("1200x700")
-        master.minsize(1200, 700)
+        self.init_window()
         
         UTCDateTime.DEFAULT_PRECISION = 9
-        default_font = font.nametofont("TkDefaultFont")
-        default_font.configure(family = "Helvetica", size = 9)
-        master.option_add("*Font", default_font)
-        
         self._stread = StreamReader()
+        self._spectra = SpectrumCache()
+        self._pipeline = ProcessingPipeline()
+        self._pipeline.add_stage("resample", resample)
+        self._pipeline.add_stage("filter", filter_traces)
+        self._pipeline.add_stage("gain", apply_gain)
+        self._pipeline.add_stage("moveout", self._shift_traces)
+        self._scheduler = RenderScheduler(master)
+        self._rasterizer = RenderScheduler(master, delay = 0)
+        self._survey = RenderScheduler(master, delay = 0)
+        self._rasters = RasterCache()
+        self._memory = MemoryBudget()
+        self._memory.register("spectra", lambda: self._spectra.nbytes, self._spectra.clear, priority = 0)
+        self._memory.register("rasters", lambda: self._rasters.nbytes, self._rasters.clear, priority = 0)
+        self._memory.register("traces", lambda: array_nbytes([ self._raw, self._traces ]),
+                              self._downcast_traces, priority = 1)
+        self._memory.register("processing", lambda: array_nbytes([ self._raw, self._traces, self._pipeline.outputs ])
+                              - array_nbytes([ self._raw, self._traces ]), self._pipeline.clear_cache, priority = 2)
+        self._memory.register("moveout", lambda: self._shifter.nbytes if self._shifter is not None else 0,
+                              self._clear_shifter, priority = 0)
+        self._memory.register("snapping", lambda: self._snapper.nbytes if self._snapper is not None else 0,
+                              self._clear_snapper, priority = 0)
+        self._memory.register("picks", lambda: picks_nbytes(self.picks or []))
+        self._memory.register("figure", lambda: figure_nbytes(self.fig))
         self.define_variables()
         self.trace_variables()
         self.init_variables()
@@ -90,6 +150,15 @@ class PyckerGUI():
         self.init_frame3()
         self.footer()
     
+    def init_window(self):
+        self.master.title("Pycker Viewer")
+        self.master.protocol("WM_DELETE_WINDOW", self.close_window)
+        self.master.geometry("1200x700")
+        self.master.minsize(1200, 700)
+        default_font = font.nametofont("TkDefaultFont")
+        default_font.configure(family = "Helvetica", size = 9)
+        self.master.option_add("*Font", default_font)
+        
     def about(self):
         about = "Pycker Viewer 1.0" + "\n" \
                 + "A picker program for first break arrival times" + "\n\n" \
@@ -101,6 +170,11 @@ class PyckerGUI():
         
         # File
         filemenu = tk.Menu(menubar, tearoff = 0)
+        filemenu.add_command(label = "Connect to server", command = self.connect_server)
+        filemenu.add_separator()
+        filemenu.add_checkbutton(label = "Watch directory", onvalue = 1, offvalue = 0, variable = self.watch, command = self._set_watch)
+        filemenu.add_checkbutton(label = "Auto-pick new files", onvalue = 1, offvalue = 0, variable = self.autopick, command = self._set_autopick)
+        filemenu.add_separator()
         filemenu.add_command(label = "Import all picks", command = self.import_all_picks)
         filemenu.add_separator()
         filemenu.add_command(label = "Export current pick", command = self.export_current_pick)
@@ -112,12 +186,40 @@ class PyckerGUI():
         viewmenu = tk.Menu(menubar, tearoff = 0)
         viewmenu.add_checkbutton(label = "Gather", onvalue = 1, offvalue = 0, variable = self.plot_type, command = self.plot)
         viewmenu.add_checkbutton(label = "Fill", onvalue = 1, offvalue = 0, variable = self.fill, command = self.plot)
+        viewmenu.add_checkbutton(label = "Rasterize gather", onvalue = 1, offvalue = 0, variable = self.raster, command = self.plot)
+        viewmenu.add_checkbutton(label = "Sort by offset", onvalue = 1, offvalue = 0, variable = self.sort_offset, command = self._set_sort_offset)
+        viewmenu.add_command(label = "Spectrum", command = self.view_spectrum)
         
         # Time axis
         taxismenu = tk.Menu(viewmenu, tearoff = 0)
         taxismenu.add_checkbutton(label = "Seconds", onvalue = 1, offvalue = 0, variable = self.taxis_seconds, command = self._set_taxis_seconds)
         taxismenu.add_checkbutton(label = "Samples", onvalue = 1, offvalue = 0, variable = self.taxis_samples, command = self._set_taxis_samples)
         
+        # Super gather layout
+        layoutmenu = tk.Menu(viewmenu, tearoff = 0)
+        layoutmenu.add_checkbutton(label = "Side by side", onvalue = 1, offvalue = 0, variable = self.layout_shots, command = self._set_layout_shots)
+        layoutmenu.add_checkbutton(label = "Common receiver", onvalue = 1, offvalue = 0, variable = self.layout_receivers, command = self._set_layout_receivers)
+        
+        # Pick snapping
+        snapmenu = tk.Menu(menubar, tearoff = 0)
+        snapmenu.add_radiobutton(label = "Off", value = "none", variable = self.snap)
+        snapmenu.add_radiobutton(label = "Onset", value = "onset", variable = self.snap)
+        snapmenu.add_radiobutton(label = "Peak", value = "peak", variable = self.snap)
+        snapmenu.add_radiobutton(label = "Trough", value = "trough", variable = self.snap)
+        snapmenu.add_radiobutton(label = "Zero crossing", value = "zero", variable = self.snap)
+        
+        # Tools
+        toolsmenu = tk.Menu(menubar, tearoff = 0)
+        toolsmenu.add_command(label = "Quality control", command = self.quality_control)
+        toolsmenu.add_command(label = "Consistency checks", command = self.consistency_checks)
+        toolsmenu.add_command(label = "Sort files by name", command = self.sort_by_name)
+        toolsmenu.add_separator()
+        toolsmenu.add_cascade(label = "Snap picks", menu = snapmenu)
+        toolsmenu.add_command(label = "Snap window", command = self.snap_window_dialog)
+        toolsmenu.add_separator()
+        toolsmenu.add_command(label = "Memory usage", command = self.memory_usage)
+        toolsmenu.add_command(label = "Memory budget", command = self.memory_budget)
+        
         # Help
         helpmenu = tk.Menu(menubar, tearoff = 0)
         helpmenu.add_command(label = "About", command = self.about)
@@ -125,8 +227,10 @@ class PyckerGUI():
         # Display menu bar
         menubar.add_cascade(label = "File", menu = filemenu)
         menubar.add_cascade(label = "View", menu = viewmenu)
+        menubar.add_cascade(label = "Tools", menu = toolsmenu)
         menubar.add_cascade(label = "Help", menu = helpmenu)
         viewmenu.add_cascade(label = "Time axis", menu = taxismenu)
+        viewmenu.add_cascade(label = "Super gather", menu = layoutmenu)
         self.master.config(menu = menubar)
         
     def init_containers(self):
@@ -171,6 +275,8 @@ class PyckerGUI():
                                     takefocus = False)
         fs_entry = ttk.Entry(self.frame1, width = 10, textvariable = self.sampling_rate,
                              justify = "right", takefocus = True)  
+        resample_button = ttk.Checkbutton(self.frame1, text = "Resample", variable = self.resample,
+                                          takefocus = False)
         
         # low
         low_button = ttk.Checkbutton(self.frame1, text = "Lowpass (Hz)", variable = self.lowpass,
@@ -192,6 +298,33 @@ class PyckerGUI():
         delay_option_menu = ttk.OptionMenu(self.frame1, self.delay_unit, self.delay_unit.get(), *self.UNITS)
         delay_option_menu.config(width = 7)
         
+        # gain
+        gain_button = ttk.Checkbutton(self.frame1, text = "Gain", variable = self.gain,
+                                      takefocus = False)
+        gain_option_menu = ttk.OptionMenu(self.frame1, self.gain_type, self.gain_type.get(), *GAINS)
+        gain_option_menu.config(width = 7)
+        gain_entry = ttk.Entry(self.frame1, width = 10, textvariable = self.gain_val,
+                               justify = "right", takefocus = True)
+        
+        # linear moveout and statics
+        lmo_button = ttk.Checkbutton(self.frame1, text = "LMO (m/s)", variable = self.lmo,
+                                     takefocus = False)
+        statics_button = ttk.Checkbutton(self.frame1, text = "Statics", variable = self.statics,
+                                         takefocus = False)
+        lmo_entry = ttk.Entry(self.frame1, width = 10, textvariable = self.lmo_velocity,
+                              justify = "right", takefocus = True)
+        
+        # super gather
+        gather_button = ttk.Checkbutton(self.frame1, text = "Super gather (shots)", variable = self.super_gather,
+                                        takefocus = False)
+        gather_spinbox = Spinbox(self.frame1, from_ = 1, to_ = 1000, increment = 1, textvariable = self.nshot,
+                                 width = 7, justify = "right", takefocus = True)
+        
+        # receiver
+        receiver_label = ttk.Label(self.frame1, text = "Common receiver")
+        receiver_spinbox = Spinbox(self.frame1, from_ = 1, to_ = 10000, increment = 1, textvariable = self.receiver,
+                                   width = 7, justify = "right", takefocus = True)
+        
         # apply
         apply_button = ttk.Button(self.frame1, text = "Apply", command = self.apply,
                                   takefocus = False)
@@ -203,6 +336,7 @@ class PyckerGUI():
         norm_button.grid(row = 2, column = 0, padx = 5, pady = 1, sticky = "w")
         norm_spinbox.grid(row = 2, column = 2, ipadx = 8, padx = 5, pady = 1)
         fs_button.grid(row = 3, column = 0, padx = 5, pady = 1, sticky = "w")
+        resample_button.grid(row = 3, column = 1, padx = 5, pady = 1, sticky = "w")
         fs_entry.grid(row = 3, column = 2, padx = 5, pady = 1)
         low_button.grid(row = 4, column = 0, padx = 5, pady = 1, sticky = "w")
         low_entry.grid(row = 4, column = 2, padx = 5, pady = 1)
@@ -211,18 +345,33 @@ class PyckerGUI():
         delay_button.grid(row = 6, column = 0, padx = 5, pady = 1, sticky = "w")
         delay_entry.grid(row = 6, column = 1, padx = 5, pady = 1)
         delay_option_menu.grid(row = 6, column = 2, padx = 5, pady = 1, sticky = "ew")
-        apply_button.grid(row = 7, column = 2, padx = 5, pady = 5, sticky = "se")
+        gain_button.grid(row = 7, column = 0, padx = 5, pady = 1, sticky = "w")
+        gain_option_menu.grid(row = 7, column = 1, padx = 5, pady = 1, sticky = "ew")
+        gain_entry.grid(row = 7, column = 2, padx = 5, pady = 1)
+        lmo_button.grid(row = 8, column = 0, padx = 5, pady = 1, sticky = "w")
+        statics_button.grid(row = 8, column = 1, padx = 5, pady = 1, sticky = "w")
+        lmo_entry.grid(row = 8, column = 2, padx = 5, pady = 1)
+        gather_button.grid(row = 9, column = 0, padx = 5, pady = 1, sticky = "w")
+        gather_spinbox.grid(row = 9, column = 2, ipadx = 8, padx = 5, pady = 1)
+        receiver_label.grid(row = 10, column = 0, padx = 5, pady = 1, sticky = "w")
+        receiver_spinbox.grid(row = 10, column = 2, ipadx = 8, padx = 5, pady = 1)
+        apply_button.grid(row = 11, column = 2, padx = 5, pady = 5, sticky = "se")
 
     def init_frame2(self):
         self.frame2 = ttk.LabelFrame(self.data_container, text = "Files", borderwidth = 2, relief = "groove", width = 100, height = 100)
         self.frame2.grid(row = 1, column = 0, sticky = "nsew")
         
+    def init_file_list(self):
+        # Only visible rows are rendered
+        self._file_list = FileList(self.frame2, on_open = self._open_file)
+        self._file_list.pack(expand = "y", fill = "both")
+        
     def init_frame3(self):
         self.frame3 = ttk.Frame(self.canvas_container, borderwidth = 0)
         self.frame3.pack()
         self.fig = Figure(figsize = (12, 8), facecolor = "white", dpi = 150)
         self.canvas = FigureCanvasTkAgg(self.fig, master = self.frame3)
-        self.toolbar = NavigationToolbar2TkAgg(self.canvas, self.frame3)
+        self.toolbar = NavigationToolbar2Tk(self.canvas, self.frame3)
         self.toolbar.update()
         self.canvas.get_tk_widget().pack()
         self.toolbar.pack(side = "top", fill = "both", expand = 1)
@@ -244,50 +393,159 @@ class PyckerGUI():
                                       )
         if len(dirname) > 0:
             dirname += "/"
-            self.input_dirname.set(dirname)
-            self.fig.clear()
-            self.canvas.draw()
-            
-            if not self._first_import:
-                self.frame2.forget()
-                self._current_file = None
-                self._current_index = None
+            self._client = None
+            if os.path.isfile(dirname + CUBE_NAME + ".json"):
+                self._cube = DataCube(dirname + CUBE_NAME)
             else:
-                self._first_import = False
-            self.init_frame2()
+                self._cube = None
             
             # List all files in data directory
-            self._filenames = self._stread.read_dir(dirname)
-            nsrc = len(self._filenames)
-            self.picks = [ None ] * nsrc
+            self._init_file_list(dirname, self._stread.read_dir(dirname))
+            
+    def _set_watch(self):
+        if not self.watch.get():
+            self._stop_watch()
+        elif not self.picks:
+            tkmessage.showerror("Error", "No data imported.")
+            self.watch.set(False)
+        else:
+            if self._client is None:
+                self._watcher = FolderWatcher(self.input_dirname.get(), self._filenames,
+                                              autopick = self.autopick.get())
+            self._watch_after = self.master.after(self.WATCH_INTERVAL, self._watch_dir)
             
-            if nsrc < 1:
-                tkmessage.showerror("Error", "Chosen directory is empty or contains incompatible files.")
-                self.input_dirname.set("")
-                pass
+    def _set_autopick(self):
+        # Files of a server are auto-picked by the server itself
+        if self._watcher is not None:
+            self._watcher.autopick = bool(self.autopick.get())
+        elif self._client is not None and self.watch.get():
+            tkmessage.showerror("Error", "Auto-picking is set when starting the server (--autopick).")
+            self.autopick.set(not self.autopick.get())
+            
+    def _stop_watch(self):
+        if self._watch_after is not None:
+            self.master.after_cancel(self._watch_after)
+            self._watch_after = None
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+        self.watch.set(False)
+        
+    def _watch_dir(self):
+        # New files are processed by worker processes, the file list is only appended to
+        if self._client is not None:
+            try:
+                known = set(self._filenames)
+                new = [ (filename, None) for filename in self._client.filenames() if filename not in known ]
+            except (IOError, OSError, ValueError):
+                new = []
+        else:
+            # Directory may be unmounted or files locked, try again next time
+            try:
+                self._watcher.poll()
+                new = [ (filename, picks) for filename, _, picks in self._watcher.collect() ]
+            except (IOError, OSError, ValueError):
+                new = []
+        try:
+            if new and self._client is not None:
+                counts = self._pick_counts()
+            for filename, picks in new:
+                self._file_index[filename] = len(self._filenames)
+                self._filenames.append(filename)
+                self.picks.append(picks)
+                if picks is not None:
+                    self._npicks.append(sum(pick is not None for pick in picks))
+                else:
+                    self._npicks.append(counts.get(filename, 0) if self._client is not None else 0)
+                self._file_list.append(filename, self._pick_status(len(self._filenames)-1))
+        finally:
+            self._watch_after = self.master.after(self.WATCH_INTERVAL, self._watch_dir)
+        
+    def connect_server(self):
+        url = tksimple.askstring("Connect to server", "Server URL",
+                                 initialvalue = "http://127.0.0.1:8765",
+                                 parent = self.master)
+        if url:
+            client = PickClient(url)
+            try:
+                filenames = client.filenames()
+            except (IOError, OSError, ValueError) as e:
+                tkmessage.showerror("Error", "Cannot connect to server: %s" % e)
             else:
-                # Scrollbar
-                scrollbar = ttk.Scrollbar(self.frame2)
-                scrollbar.pack(side = "right", fill = "y")        
+                self._client = client
+                self._cube = None
+                self.super_gather.set(False)
+                self._init_file_list(url, filenames)
                 
-                # Listbox
-                event_list = tk.Listbox(self.frame2, yscrollcommand = scrollbar.set)
-                for item in self._filenames:
-                    event_list.insert(tk.END, item)
-                event_list.bind("<Double-Button-1>", self.OnDoubleClick)
-                event_list.bind("<Down>", self.OnEntryDown)
-                event_list.bind("<Up>", self.OnEntryUp)
-        
-                # Layout
-                event_list.pack(expand = "y", fill = "both")
-                scrollbar.config(command = event_list.yview)
+    def _init_file_list(self, dirname, filenames):
+        self._scheduler.cancel()
+        self._cancel_survey_job()
+        self._stop_watch()
+        self.input_dirname.set(dirname)
+        self._flagged = {}
+        self._geometries = {}
+        self._statics = {}
+        self.fig.clear()
+        self.canvas.draw()
+        
+        if not self._first_import:
+            self.frame2.forget()
+            self._current_file = None
+            self._current_index = None
+            self._close_gather()
+            self._spectra.clear()
+            self._raw_key = None
+        else:
+            self._first_import = False
+        self.init_frame2()
+        
+        self._filenames = filenames
+        self._file_index = dict((filename, i) for i, filename in enumerate(self._filenames))
+        nsrc = len(self._filenames)
+        self.picks = [ None ] * nsrc
+        if self._client is not None:
+            counts = self._pick_counts()
+            self._npicks = [ counts.get(filename, 0) for filename in self._filenames ]
+        else:
+            self._npicks = [ 0 ] * nsrc
+        
+        if nsrc < 1:
+            tkmessage.showerror("Error", "Chosen directory is empty or contains incompatible files.")
+            self.input_dirname.set("")
+            pass
+        else:
+            self.init_file_list()
+            self._file_list.set_items(self._filenames, [ self._pick_status(i) for i in range(nsrc) ])
+            
+    def _pick_counts(self):
+        try:
+            return self._client.counts()
+        except (IOError, OSError, ValueError):
+            return {}
+        
+    def _pick_status(self, i):
+        # Number of picks of a shot (out of number of receivers once read)
+        if self.picks[i] is not None:
+            return "%d/%d" % (self._npicks[i], len(self.picks[i]))
+        else:
+            return "%d" % self._npicks[i] if self._npicks[i] > 0 else ""
+        
+    def _count_picks(self, i):
+        # Called when all picks of a shot are replaced, single picks are counted in _set_pick
+        if self.picks[i] is not None:
+            self._npicks[i] = sum(pick is not None for pick in self.picks[i])
+        self._file_list.set_status(i, self._pick_status(i))
 
     def apply(self):
         if self._current_file is None:
             tkmessage.showerror("Error", "No event chosen yet.")
         else:
-            self._read_traces()
-            self._filter_traces()
+            self._scheduler.cancel()
+            if self._source_key() != self._raw_key:
+                self._read_traces()
+            elif not self.enforce_fs.get():
+                self.sampling_rate.set(self._header_fs)
+            self._process_traces()
             self.plot()
     
     def plot(self):
@@ -297,6 +555,7 @@ class PyckerGUI():
             self.view_pick()
     
     def view_seismogram(self):
+        self._rasterizer.cancel()
         self.fig.clear()
         nrcv, npts = self._shape
         if self.delay.get():
@@ -310,7 +569,8 @@ class PyckerGUI():
             ylabel = "Time (s)"
         else:
             ylabel = "Time (samples)"
-        if self.plot_type.get() == 0:
+        self._taxis = t
+        if not self._gather_view():
             nr = int(np.ceil(nrcv/self._ncolumn))
             gs = GridSpec(nr, self._ncolumn)
             self.ax1 = [ self.fig.add_subplot(gs[k%nr,k//nr]) for k in range(nrcv) ]
@@ -318,16 +578,16 @@ class PyckerGUI():
                 clip = np.percentile(np.abs(self._traces.ravel()), self.perc.get() * 100.)
                 X_clip = np.clip(self._traces, -clip, clip)
             else:
-                X_clip = np.array(self._traces)
+                X_clip = self._traces
             if self.normalize.get():
                 ymax = np.max(np.abs(X_clip))
+            self._X_clip = X_clip
+            self._viewports = [ (max(tmin, 0.), t[-1]) ] * nrcv
             for k, (ax, tr) in enumerate(zip(self.ax1, X_clip)):
                 if not self.normalize.get():
                     ymax = np.max(np.abs(tr))
-                ax.plot(t, tr, color = "black", linewidth = 0.5)
-                if self.fill.get():
-                    ax.fill_between(t, tr, 0, where = (tr > 0), color = "black")
-                ax.text(0, 1, "Receiver " + str(k+1), fontsize = 6, ha = "left", va = "bottom", transform = ax.transAxes)
+                self._plot_trace(ax, tr, self._viewports[k])
+                ax.text(0, 1, self._trace_label(k), fontsize = 6, ha = "left", va = "bottom", transform = ax.transAxes)
                 ax.set_xlim(max(tmin, 0.), t[-1])
                 ax.get_xaxis().set_visible(False)
                 ax.set_ylim(-ymax, ymax)
@@ -337,22 +597,117 @@ class PyckerGUI():
                 ax.set_picker(True)
         else:
             self.ax1 = self.fig.add_subplot(1, 1, 1)
-            self.ax1 = wiggle(self._traces, perc = self.perc.get(), taxis = t,
-                              norm = self.normalize.get(), fill = self.fill.get(),
-                              axes = self.ax1)
+            self._viewports = (0., nrcv+1., max(tmin, 0.), t[-1])
+            if self.raster.get():
+                self.ax1.set_xlabel("Trace number")
+                self.ax1.set_xlim(0, nrcv+1)
+            else:
+                self._plot_wiggle(self._viewports)
             self.ax1.set_ylabel(ylabel)
+            if self.super_gather.get():
+                shots = self._trace_map[:,0]
+                for k in np.nonzero(np.diff(shots))[0]:
+                    self.ax1.axvline(k+1.5, color = "gray", linestyle = "--", linewidth = 0.5)
+                if self.layout_receivers.get():
+                    self.ax1.set_xlabel("Shot number")
+            offsets = self._trace_offsets() if self.sort_offset.get() else None
+            if offsets is not None and np.isfinite(offsets).all():
+                # Traces stay evenly spaced, ticks are only put at trace
+                # positions and labelled with their offset
+                self.ax1.xaxis.set_major_locator(MaxNLocator(integer = True))
+                self.ax1.xaxis.set_major_formatter(FuncFormatter(lambda x, pos: self._offset2str(offsets, x)))
+                self.ax1.set_xlabel("Offset of trace (m, traces evenly spaced)")
             self.ax1.set_ylim(max(tmin, 0.), t[-1])
             self.ax1.invert_yaxis()
             self.ax1.set_picker(True)
         self.fig.suptitle(self._starttime, fontsize = 8, va = "bottom", ha = "left", position = (0.01, 0.01))
         self.fig.tight_layout()
+        if self._gather_view() and self.raster.get():
+            self._request_raster(self._viewports)
+        for ax in (self.ax1 if not self._gather_view() else [ self.ax1 ]):
+            ax.callbacks.connect("xlim_changed", self._view_changed)
+            ax.callbacks.connect("ylim_changed", self._view_changed)
         self.canvas.draw()
         
+    def _view_changed(self, ax):
+        # Zoom and pan: redraw visible traces once the view settles
+        self._rasterizer.request(None, self._redraw_view, delay = 60)
+        
+    def _redraw_view(self):
+        if not self._gather_view():
+            for k, ax in enumerate(self.ax1):
+                viewport = tuple(sorted(ax.get_xlim()))
+                if viewport != self._viewports[k]:
+                    self._viewports[k] = viewport
+                    self._remove_wiggle(ax)
+                    self._plot_trace(ax, self._X_clip[k], viewport)
+            self.canvas.draw_idle()
+        else:
+            viewport = tuple(sorted(self.ax1.get_xlim())) + tuple(sorted(self.ax1.get_ylim()))
+            if viewport != self._viewports:
+                self._viewports = viewport
+                if self.raster.get():
+                    self._request_raster(viewport)
+                else:
+                    self._remove_wiggle(self.ax1)
+                    self._plot_wiggle(viewport)
+                    self.canvas.draw_idle()
+                    
+    def _remove_wiggle(self, ax):
+        for artist in list(ax.lines) + list(ax.collections) + list(ax.images):
+            if artist.get_gid() == "wiggle":
+                artist.remove()
+        
+    def _plot_trace(self, ax, tr, viewport):
+        # Samples within view, decimated to the axes width
+        i0, i1 = _visible_samples(self._taxis, *viewport)
+        resolution = max(int(ax.get_window_extent().width), 1)
+        t, tr = _envelope(self._taxis[i0:i1], tr[None,i0:i1], resolution)
+        ax.plot(t, tr[0], color = "black", linewidth = 0.5, gid = "wiggle")
+        if self.fill.get():
+            ax.fill_between(t, tr[0], 0, where = (tr[0] > 0), color = "black", gid = "wiggle")
+        
+    def _plot_wiggle(self, viewport):
+        # Traces and samples within view, decimated to the axes height
+        xlabel = self.ax1.get_xlabel()
+        resolution = max(int(self.ax1.get_window_extent().height), 1)
+        wiggle(self._traces, perc = self.perc.get(), taxis = self._taxis,
+               norm = self.normalize.get(), fill = self.fill.get(), axes = self.ax1,
+               limits = viewport, resolution = resolution)
+        self.ax1.set_xlabel(xlabel or "Trace number")
+        
+    def _request_raster(self, viewport):
+        ax = self.ax1
+        bbox = ax.get_window_extent()
+        shape = (max(int(bbox.height), 1), max(int(bbox.width), 1))
+        xmin, xmax, tmin, tmax = viewport
+        t = self._taxis
+        dt = t[1] - t[0] if len(t) > 1 else 1.
+        limits = (xmin, xmax, (tmin - t[0]) / dt, (tmax - t[0]) / dt)
+        extent = (xmin, xmax, tmax, tmin)
+        X, perc, norm, fill = self._traces, self.perc.get(), self.normalize.get(), self.fill.get()
+        key = (shape, perc, norm, fill, limits)
+        if key in self._rasters:
+            self._show_raster(ax, self._rasters.get(key), extent)
+        else:
+            self._rasterizer.request(lambda: wiggle_image(X, shape, perc, norm, fill, limits = limits),
+                                     lambda img: self._show_raster(ax, img, extent, key))
+        
+    def _show_raster(self, ax, img, extent, key = None):
+        if key is not None:
+            self._rasters.add(key, img)
+        xlim, ylim = ax.get_xlim(), ax.get_ylim()
+        self._remove_wiggle(ax)
+        ax.imshow(img, extent = extent, aspect = "auto", interpolation = "nearest", zorder = 0, gid = "wiggle")
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        self.canvas.draw_idle()
+        
     def view_pick(self):
-        if self.plot_type.get() == 0:
-            for k, pick in enumerate(self.picks[self._current_index]):
+        if not self._gather_view():
+            for k, pick in enumerate(self._trace_picks()):
                 if pick is not None and pick.index is not None:
-                    idx = (pick.time - self._starttime) * pick.sampling_rate + pick.shift
+                    idx = self._pick2samples(pick, self._trace_map[k,0]) - self._trace_shifts[k]
                     if self.delay.get():
                         idx -= self._delay2samples()
                     if self.taxis_seconds.get():
@@ -361,28 +716,143 @@ class PyckerGUI():
                     else:
                         title = "Pick = %s" % self._tobs2str(idx / self.sampling_rate.get())
                     if self._axlines[k] is None:
-                        self._axlines[k] = self.ax1[k].axvline(idx, color = "red", linewidth = 0.5)
+                        self._axlines[k] = self.ax1[k].axvline(idx, color = self._pick_color(k), linewidth = 0.5, zorder = 3)
                     else:
                         self._axlines[k].set_xdata([idx, idx])
+                        self._axlines[k].set_color(self._pick_color(k))
                         self._axlines[k].set_visible(True)
                     if len(self.ax1[k].patches) != 0:
                         self.ax1[k].patches = []
                     self.ax1[k].set_title(title, fontsize = 6, va = "top", ha = "right", position = (1, 1.05))
         else:
-            for k, pick in enumerate(self.picks[self._current_index]):
+            for k, pick in enumerate(self._trace_picks()):
                 if pick is not None and pick.index is not None:
-                    idx = (pick.time - self._starttime) * pick.sampling_rate + pick.shift
+                    idx = self._pick2samples(pick, self._trace_map[k,0]) - self._trace_shifts[k]
                     if self.delay.get():
                         idx -= self._delay2samples()
                     if self.taxis_seconds.get():
                         idx /= self.sampling_rate.get()
                     if self._axlines[k] is None:
-                        self._axlines[k], = self.ax1.plot([k+0.5, k+1.5], [idx, idx], color = "red", linewidth = 0.5)
+                        self._axlines[k], = self.ax1.plot([k+0.5, k+1.5], [idx, idx], color = self._pick_color(k),
+                                                          linewidth = 0.5, zorder = 3)
                     else:
                         self._axlines[k].set_ydata([idx, idx])
+                        self._axlines[k].set_color(self._pick_color(k))
                         self._axlines[k].set_visible(True)
         self.canvas.draw()
         
+    def view_spectrum(self):
+        if self._spectrum_panel is None:
+            self._spectrum_panel = SpectrumPanel(self.master, on_close = self._close_spectrum)
+        self._refresh_spectrum()
+        
+    def quality_control(self):
+        if self.picks is None:
+            tkmessage.showerror("Error", "No data imported.")
+        elif self._client is not None:
+            tkmessage.showerror("Error", "Quality control is not available when connected to a server.")
+        else:
+            filenames = [ self.input_dirname.get() + filename for filename in self._filenames ]
+            picks = list(self.picks)
+            self._run_survey_job(lambda: survey_qc(filenames, picks), self._show_quality_control)
+            
+    def _show_quality_control(self, table):
+        self._qc = table
+        summary = shot_summary(self._qc, len(self._filenames))
+        self._sort_files(np.argsort(-summary["score"], kind = "mergesort").tolist())
+        info = "%d dead, %d clipped, %d low SNR and %d outlier traces in %d files.\n" \
+               % (summary["ndead"].sum(), summary["nclipped"].sum(), summary["nlowsnr"].sum(),
+                  summary["noutliers"].sum(), np.count_nonzero(summary["score"])) \
+               + "Files are sorted from worst to best."
+        tkmessage.showinfo("Quality control", info)
+            
+    def consistency_checks(self):
+        if self.picks is None:
+            tkmessage.showerror("Error", "No data imported.")
+        elif self._client is not None:
+            tkmessage.showerror("Error", "Consistency checks are not available when connected to a server.")
+        else:
+            filenames = [ self.input_dirname.get() + filename for filename in self._filenames ]
+            picks = list(self.picks)
+            tolerance = 2. / self.sampling_rate.get() if self.sampling_rate.get() > 0. else 1e-3
+            self._run_survey_job(lambda: self._check_consistency(filenames, picks, tolerance),
+                                 self._show_consistency_checks)
+            
+    def _check_consistency(self, filenames, picks, tolerance):
+        # Run in a worker thread, must not use Tk
+        table = pick_table(filenames, picks)
+        mismatch, reciprocal = reciprocity_check(table, tolerance)
+        _, outlier = moveout_outliers(table)
+        return table, mismatch, reciprocal, outlier
+        
+    def _show_consistency_checks(self, result):
+        table, mismatch, reciprocal, outlier = result
+        self._flagged = {}
+        for k in np.nonzero(reciprocal | outlier)[0]:
+            reason = "reciprocity (%s)" % self._tobs2str(abs(mismatch[k])) if reciprocal[k] else "moveout"
+            self._flagged[(self._filenames[table["shot"][k]], int(table["receiver"][k]))] = reason
+        info = "%d reciprocal mismatches and %d moveout outliers in %d picks.\n" \
+               % (np.count_nonzero(reciprocal), np.count_nonzero(outlier), len(table)) \
+               + "Flagged picks are shown in blue."
+        if np.isnan(table["source_x"]).all():
+            info += "\nNo geometry in trace headers, reciprocity not checked."
+        flagged = sorted(self._flagged.items())
+        if flagged:
+            info += "\n\n" + "\n".join([ "%s, receiver %d: %s" % (filename, r+1, reason)
+                                          for (filename, r), reason in flagged[:self.MAX_FLAGGED] ])
+            if len(flagged) > self.MAX_FLAGGED:
+                info += "\n... and %d more" % (len(flagged) - self.MAX_FLAGGED)
+        tkmessage.showinfo("Consistency checks", info)
+        if self._current_file is not None:
+            self.view_pick()
+            
+    def _run_survey_job(self, job, callback):
+        # Survey-wide tools decode all files, run them in a worker thread
+        if self._survey.busy:
+            tkmessage.showinfo("Busy", "Another survey-wide tool is running.")
+        else:
+            self._set_busy(True)
+            self._survey.request(job, lambda result: self._survey_done(callback, result),
+                                 self._survey_error)
+            
+    def _survey_done(self, callback, result):
+        self._set_busy(False)
+        callback(result)
+        
+    def _survey_error(self, error):
+        self._set_busy(False)
+        tkmessage.showerror("Error", "Cannot read files: %s" % error)
+        
+    def _cancel_survey_job(self):
+        if self._survey.busy:
+            self._survey.cancel()
+            self._set_busy(False)
+            
+    def _set_busy(self, busy):
+        self.master.config(cursor = "watch" if busy else "")
+        
+    def memory_usage(self):
+        self._memory.enforce()
+        tkmessage.showinfo("Memory usage", str(self._memory))
+        
+    def memory_budget(self):
+        limit = tksimple.askinteger("Memory budget", "Memory budget in MB (0 for no limit)",
+                                    initialvalue = self.memory_limit.get(), minvalue = 0,
+                                    parent = self.master)
+        if limit is not None:
+            self.memory_limit.set(limit)
+            
+    def snap_window_dialog(self):
+        window = tksimple.askinteger("Snap window", "Maximum snapping distance in samples",
+                                     initialvalue = self.snap_window.get(), minvalue = 1,
+                                     parent = self.master)
+        if window is not None:
+            self.snap_window.set(window)
+            
+    def sort_by_name(self):
+        if self.picks is not None:
+            self._sort_files(np.argsort(self._filenames, kind = "mergesort").tolist())
+        
     def export_current_pick(self):
         if self.picks is not None and self._current_index is not None \
             and self.picks[self._current_index] is not None:
@@ -399,15 +869,33 @@ class PyckerGUI():
             tkmessage.showerror("Error", "No pick to export.")
     
     def export_all_picks(self):
-        if self.picks is not None and not np.all([ pick is None for pick in self.picks ]):
+        # Shots not opened in this session may have picks on the server
+        if self.picks is not None and (self._client is not None or not np.all([ pick is None for pick in self.picks ])):
             filename = tkfile.asksaveasfilename(title = "Export all picks",
                                                 initialdir = os.getcwd(),
-                                                filetypes = [ ("Pickle", ".pickle") ],
+                                                filetypes = [ ("Pickle", ".pickle"), ("CSV", ".csv"),
+                                                              ("QuakeML", ".xml") ],
                                                 defaultextension = ".pickle",
                                                 )
-            if len(filename) > 0:
-                with open(filename, "wb") as f:
-                    pickle.dump(self.picks, f, protocol = pickle.HIGHEST_PROTOCOL)
+            ext = os.path.splitext(filename)[1].lower()
+            try:
+                if ext == ".csv":
+                    # Picks and geometry of a server come from its pick store
+                    if self._client is None:
+                        export_csv(filename, self._filenames, self.picks, self.input_dirname.get())
+                    else:
+                        export_csv(filename, self._filenames, self._client)
+                elif ext == ".xml":
+                    export_quakeml(filename, self._filenames, self.picks if self._client is None else self._client)
+                elif len(filename) > 0:
+                    picks = self.picks
+                    if self._client is not None:
+                        picks = [ self._client.get_picks(f, len(p) if p is not None else None)
+                                  for f, p in zip(self._filenames, self.picks) ]
+                    with open(filename, "wb") as f:
+                        pickle.dump(picks, f, protocol = pickle.HIGHEST_PROTOCOL)
+            except (IOError, OSError) as e:
+                tkmessage.showerror("Error", "Picks not exported: %s" % e)
         else:
             tkmessage.showerror("Error", "No pick to export.")
     
@@ -423,33 +911,44 @@ class PyckerGUI():
                     picks = pickle.load(f)
                 if len(self.picks) == len(picks):
                     self.picks = picks
+                    for i in range(len(picks)):
+                        self._count_picks(i)
+                    if self._client is not None:
+                        for filename, shot_picks in zip(self._filenames, picks):
+                            if shot_picks is not None:
+                                self._client.set_picks(filename, shot_picks)
                     self.plot()
                 else:
                     tkmessage.showerror("Error", "Picks does not match imported data.")
         else:
             tkmessage.showerror("Error", "No data imported.")
     
-    def OnDoubleClick(self, event):
-        widget = event.widget
-        selection = widget.curselection()
-        filename = widget.get(selection[0])
-        self._read(filename)
-        
-    def OnEntryDown(self, event):
-        if self._current_index is not None and self._current_index < len(self._filenames)-1:
-            self._current_index += 1
-            self._current_file = self._filenames[self._current_index]
-            self._read(self._current_file)
-        
-    def OnEntryUp(self, event):
-        if self._current_index is not None and self._current_index > 0:
-            self._current_index -= 1
-            self._current_file = self._filenames[self._current_index]
-            self._read(self._current_file)
+    def OnDoubleClick(self, event = None):
+        if self._file_list.selected is not None:
+            self._open_file(self._file_list.selected, 0)
+        
+    def OnEntryDown(self, event = None):
+        self._step_file(1)
+        
+    def OnEntryUp(self, event = None):
+        self._step_file(-1)
+        
+    def _step_file(self, step):
+        # Next or previous file in file list order (debounced read)
+        if self._current_index is not None:
+            index = self._file_list.neighbour(self._current_index, step)
+            if index is not None:
+                self._file_list.select(index)
+                self._open_file(index)
+        
+    def _open_file(self, index, delay = None):
+        self._current_index = index
+        self._current_file = self._filenames[index]
+        self._schedule_read(delay)
     
     def OnPick(self, event):
         nrcv = self._shape[0]
-        if self.plot_type.get() == 0:
+        if not self._gather_view():
             for k in range(nrcv):
                 if event.artist == self.ax1[k]:
                     break
@@ -457,58 +956,314 @@ class PyckerGUI():
             rcv = np.arange(nrcv+1)
             idx = max(min(nrcv, np.argmin(np.abs(event.mouseevent.xdata - rcv))), 1)
             k = int(rcv[int(idx)] - 1)
+        i, r = self._trace_map[k]
         if event.mouseevent.button == 1:
-            if self.plot_type.get() == 0:
+            if not self._gather_view():
                 self._man_pick(k, event.mouseevent.xdata)
             else:
                 self._man_pick(k, event.mouseevent.ydata)
             self.view_pick()
         elif event.mouseevent.button == 2:
-            self.picks[self._current_index][k] = None
-            self._axlines[k].set_visible(False)
-            if self.plot_type.get() == 0:
+            self._set_pick(i, r, None)
+            if self._axlines[k] is not None:
+                self._axlines[k].set_visible(False)
+            if not self._gather_view():
                 self.ax1[k].set_title("")
                 if len(self.ax1[k].patches) != 0:
                     self.ax1[k].patches = []
         elif event.mouseevent.button == 3:
-            if self.plot_type.get() == 0:
+            if not self._gather_view():
                 idx = event.mouseevent.xdata
             else:
                 idx = event.mouseevent.ydata
             if self.taxis_seconds.get():
-                string = "%d %.3f %s" % (k+1, idx * self.sampling_rate.get(), idx)
+                string = "%d %.3f %s" % (r+1, idx * self.sampling_rate.get(), idx)
             else:
-                string = "%d %.3f %s" % (k+1, idx, idx / self.sampling_rate.get())
+                string = "%d %.3f %s" % (r+1, idx, idx / self.sampling_rate.get())
+            if self.super_gather.get():
+                string = "%s %s" % (self._filenames[i], string)
             print(string)
         self.canvas.draw()
     
-    def _read_traces(self):
-        st = self._stread.read_file(self.input_dirname.get() + self._current_file)
-        self._starttime = st[0].stats.starttime
-        self._traces = np.array([ tr.detrend("constant") for tr in st.traces ])
-        self._shape = self._traces.shape
+    def _read_traces(self, fetched = None):
+        if self.super_gather.get() and self._client is not None:
+            tkmessage.showerror("Error", "Super gather is not available when connected to a server.")
+            self.super_gather.set(False)
+        if self.super_gather.get():
+            self._read_super_gather()
+        else:
+            if fetched is None:
+                fetched = self._fetch_traces(self.input_dirname.get(), self._current_file)
+            self._raw, self._header_fs, self._starttime, geometry = fetched
+            self._geometries[self._current_file] = geometry
+        if not self.super_gather.get():
+            self._starttimes = { self._current_index: self._starttime }
+            self._shape = self._raw.shape
+            self._trace_map = np.column_stack((np.full(self._shape[0], self._current_index), np.arange(self._shape[0])))
+            if self._client is not None:
+                self.picks[self._current_index] = self._client.get_picks(self._current_file, self._shape[0])
+            elif self.picks[self._current_index] is None:
+                self.picks[self._current_index] = [ None ] * self._shape[0]
+            self._count_picks(self._current_index)
+        if self.sort_offset.get():
+            self._sort_traces()
         if not self.enforce_fs.get():
-            self.sampling_rate.set(st[0].stats.sampling_rate)
-        if self.picks[self._current_index] is None:
-            self.picks[self._current_index] = [ None ] * self._shape[0]
+            self.sampling_rate.set(self._header_fs)
+        self._raw_key = self._source_key()
+        self._pipeline.set_input(self._raw)
+        self._refresh_spectrum()
+                
+    def _fetch_traces(self, dirname, filename):
+        # Called from worker threads: must not use Tk
+        if self._client is not None:
+            X, fs, starttime = self._client.gather(filename)
+        elif self._cube is not None and self._cube.is_current(filename, dirname + filename):
+            i = self._cube.index(filename)
+            X = np.array(self._cube.shot(i), dtype = np.float64)
+            X, fs, starttime = X - X.mean(axis = 1, keepdims = True), self._cube.sampling_rates[i], self._cube.starttimes[i]
+        else:
+            st = self._stread.read_file(dirname + filename)
+            X = np.array([ tr.detrend("constant") for tr in st.traces ])
+            fs, starttime = st[0].stats.sampling_rate, st[0].stats.starttime
+        return X, fs, starttime, self._fetch_geometry(dirname, filename, len(X))
+    
+    def _fetch_geometry(self, dirname, filename, n):
+        # Called from worker threads: must not use Tk
+        if filename in self._geometries:
+            return self._geometries[filename]
+        try:
+            if self._client is not None:
+                geometry = self._client.geometry(filename)
+            else:
+                geometry = read_geometry(dirname + filename)
+        except Exception:
+            geometry = None
+        if geometry is None or len(geometry["offset"]) != n:
+            geometry = empty_geometry(n)
+        return geometry
         
-    def _filter_traces(self):
-        if self.lpcut.get() > self.sampling_rate.get():
+    def _trace_offsets(self):
+        offsets = np.full(len(self._trace_map), np.nan)
+        for i in np.unique(self._trace_map[:,0]):
+            filename = self._filenames[i]
+            if filename not in self._geometries:
+                self._geometries[filename] = self._fetch_geometry(self.input_dirname.get(), filename,
+                                                                  len(self.picks[i]))
+            rows = self._trace_map[:,0] == i
+            offsets[rows] = self._geometries[filename]["offset"][self._trace_map[rows,1]]
+        return offsets
+    
+    def _trace_statics(self):
+        statics = np.zeros(len(self._trace_map))
+        for i in np.unique(self._trace_map[:,0]):
+            filename = self._filenames[i]
+            if filename not in self._statics:
+                self._statics[filename] = read_statics(self.input_dirname.get() + filename)
+            rows = self._trace_map[:,0] == i
+            statics[rows] = self._statics[filename][self._trace_map[rows,1]]
+        return statics
+    
+    def _moveout_shifts(self):
+        # Display shift of each trace (in samples), picks stay in true time
+        fs = self.sampling_rate.get()
+        shifts = np.zeros(len(self._trace_map))
+        if self.lmo.get():
+            offsets = self._trace_offsets()
+            if self.lmo_velocity.get() <= 0.:
+                tkmessage.showerror("Error", "Reduction velocity must be positive.")
+            elif not np.isfinite(offsets).all():
+                tkmessage.showerror("Error", "No offset in trace headers.")
+                self.lmo.set(False)
+            else:
+                shifts += lmo_shifts(offsets, self.lmo_velocity.get(), fs)
+        if self.statics.get():
+            if self._client is not None:
+                tkmessage.showerror("Error", "Statics are not available when connected to a server.")
+                self.statics.set(False)
+            else:
+                shifts -= self._trace_statics() * fs
+        return shifts
+    
+    def _shift_traces(self, X, shifts):
+        if self._shifter is None or self._shifter.input is not X:
+            self._shifter = PhaseShifter(X)
+        return self._shifter.shift(np.array(shifts))
+    
+    def _clear_shifter(self):
+        self._shifter = None
+    
+    def _sort_traces(self):
+        offsets = self._trace_offsets()
+        if np.isfinite(offsets).all():
+            order = np.lexsort((offsets, self._trace_map[:,0]))
+            self._raw = self._raw[order]
+            self._trace_map = self._trace_map[order]
+        else:
+            tkmessage.showerror("Error", "No offset in trace headers.")
+            self.sort_offset.set(False)
+            
+    def _set_sort_offset(self):
+        if self._current_file is not None:
+            self.apply()
+            
+    def _trace_label(self, k):
+        i, r = self._trace_map[k]
+        geometry = self._geometries.get(self._filenames[i])
+        if geometry is not None and np.isfinite(geometry["offset"][r]):
+            return "Receiver %d (%g m)" % (r+1, geometry["offset"][r])
+        else:
+            return "Receiver %d" % (r+1)
+        
+    def _offset2str(self, offsets, x):
+        k = int(round(x)) - 1
+        return "%g" % offsets[k] if 0 <= k < len(offsets) and abs(x-k-1) < 1e-6 else ""
+            
+    def _schedule_read(self, delay = None):
+        filename = self._current_file
+        if self.super_gather.get():
+            self._scheduler.request(None, lambda: self._read(filename), delay = delay)
+        else:
+            dirname = self.input_dirname.get()
+            self._scheduler.request(lambda: self._fetch_traces(dirname, filename),
+                                    lambda fetched: self._read(filename, fetched),
+                                    self._read_error, delay)
+            
+    def _read_error(self, error):
+        tkmessage.showerror("Error", "Cannot read file: %s" % error)
+        
+    def _read_super_gather(self):
+        first = self._current_index
+        last = min(first + max(self.nshot.get(), 1), len(self._filenames))
+        key = (self.input_dirname.get(), first, last)
+        if self._gather_key != key:
+            self._close_gather()
+            filenames = [ self.input_dirname.get() + filename for filename in self._filenames[first:last] ]
+            self._gather = SuperGather(filenames)
+            self._gather_key = key
+        if self.layout_receivers.get():
+            receiver = min(max(self.receiver.get(), 1), self._gather.nrcv.max()) - 1
+            self._raw, self._trace_map = self._gather.common_receiver(receiver)
+        else:
+            self._raw, self._trace_map = self._gather.side_by_side()
+        self._trace_map[:,0] += first
+        self._shape = self._raw.shape
+        self._starttime = self._gather.starttimes[0]
+        self._starttimes = dict(zip(range(first, last), self._gather.starttimes))
+        self._header_fs = self._gather.sampling_rate
+        for i, nrcv in zip(range(first, last), self._gather.nrcv):
+            if self.picks[i] is None:
+                self.picks[i] = [ None ] * nrcv
+                self._count_picks(i)
+                
+    def _close_gather(self):
+        if self._gather is not None:
+            self._gather.close()
+        self._gather = None
+        self._gather_key = None
+        
+    def _source_key(self):
+        key = (self.input_dirname.get(), self._current_index, self.super_gather.get(), self.sort_offset.get())
+        if self.super_gather.get():
+            key += (self.nshot.get(), self.layout_receivers.get(), self.receiver.get())
+        return key
+    
+    def _refresh_spectrum(self):
+        if self._spectrum_panel is not None and self._raw_key is not None:
+            fs = self._header_fs if self._resampling() else self.sampling_rate.get()
+            self._spectrum = self._spectra.get(self._raw_key + (fs,), self._raw, fs)
+            self._spectrum_panel.set_spectrum(*self._spectrum)
+            self._update_spectrum()
+    
+    def _update_spectrum(self, *args):
+        if self._spectrum_panel is not None and self._raw_key is not None:
+            try:
+                lpcut = self.lpcut.get() if self.lowpass.get() else None
+                hpcut = self.hpcut.get() if self.highpass.get() else None
+            except (tk.TclError, ValueError):
+                return
+            H = filter_response(self._spectrum[0], self.sampling_rate.get(), lpcut, hpcut)
+            if self._resampling():
+                H[self._spectrum[0] > 0.5 * self.sampling_rate.get()] = 0.
+            self._spectrum_panel.set_response(H)
+            
+    def _close_spectrum(self):
+        self._spectrum_panel = None
+        
+    def _gather_view(self):
+        return self.plot_type.get() == 1 or self.super_gather.get()
+    
+    def _trace_picks(self):
+        return [ self.picks[i][r] for i, r in self._trace_map ]
+        
+    def _process_traces(self):
+        if self._resampling():
+            up, down = rate_ratio(self._header_fs, self.sampling_rate.get())
+            self.sampling_rate.set(self._header_fs * up / down)
+        self._params = self._stage_params()
+        self._traces = self._pipeline.run(**self._params)
+        self._shape = self._traces.shape
+        self._snapper = None
+        self._rasters.clear()
+        self._memory.enforce()
+        
+    def _downcast_traces(self):
+        if self._pipeline.raw is not None:
+            self._pipeline.downcast(np.float32)
+            self._raw = self._pipeline.raw
+            self._traces = self._pipeline.run(**self._params)
+            self._snapper = None
+            self._rasters.clear()
+            
+    def _clear_snapper(self):
+        self._snapper = None
+            
+    def _set_gain_type(self, *args):
+        # Default window (in samples), exponent and coefficient (in 1/s)
+        defaults = { "agc": 100., "tpow": 2., "exp": 1. }
+        self.gain_val.set(defaults[self.gain_type.get()])
+        
+    def _set_memory_limit(self, *args):
+        limit = self.memory_limit.get()
+        self._memory.limit = limit * 1024**2 if limit > 0 else None
+        self._memory.enforce()
+        
+    def _stage_params(self):
+        params = {}
+        fs = self.sampling_rate.get()
+        if self._resampling():
+            params["resample"] = (self._header_fs, fs)
+        if self.lpcut.get() > fs:
             tkmessage.showerror("Error", "Lowpass cutoff frequency greater than sampling rate.")
-        elif self.hpcut.get() > self.sampling_rate.get():
+        elif self.hpcut.get() > fs:
             tkmessage.showerror("Error", "Highpass cutoff frequency greater than sampling rate.")
-        else:
-            for k, tr in enumerate(self._traces):
-                if self.lowpass.get():
-                    self._traces[k,:] = lowpass(tr, self.lpcut.get(), self.sampling_rate.get())
-                if self.highpass.get():
-                    self._traces[k,:] = highpass(tr, self.hpcut.get(), self.sampling_rate.get())
+        elif self.lowpass.get() or self.highpass.get():
+            lpcut = self.lpcut.get() if self.lowpass.get() else None
+            hpcut = self.hpcut.get() if self.highpass.get() else None
+            params["filter"] = (fs, lpcut, hpcut)
+        if self.gain.get():
+            if self.gain_type.get() == "agc" and self.gain_val.get() < 1.:
+                tkmessage.showerror("Error", "AGC window must be at least one sample.")
+            else:
+                params["gain"] = (self.gain_type.get(), self.gain_val.get(), fs)
+        self._trace_shifts = self._moveout_shifts()
+        if np.any(self._trace_shifts != 0.):
+            params["moveout"] = (tuple(self._trace_shifts),)
+        return params
+    
+    def _resampling(self):
+        return self.enforce_fs.get() and self.resample.get() \
+            and 0. < self.sampling_rate.get() != self._header_fs
+    
+    def _pick2samples(self, pick, i):
+        pick = pick.resample(self.sampling_rate.get())
+        return (pick.time - self._starttimes[i]) * pick.sampling_rate + pick.shift
     
-    def _read(self, filename):
+    def _read(self, filename, fetched = None):
         self._current_file = filename
-        self._current_index = self._filenames.index(filename)
-        self._read_traces()
-        self._filter_traces()
+        self._current_index = self._file_index[filename]
+        self._file_list.select(self._current_index)
+        self._read_traces(fetched)
+        self._process_traces()
         self.plot()
         
     def _man_pick(self, k, index):
@@ -518,9 +1273,48 @@ class PyckerGUI():
             shift = 0
         if self.taxis_seconds.get():
             index *= self.sampling_rate.get()
-        time = self._starttime + index / self.sampling_rate.get()
+        if self.snap.get() != "none":
+            index = self._snap(k, index + shift) - shift
+        index += self._trace_shifts[k]
+        i, r = self._trace_map[k]
+        time = self._starttimes[i] + index / self.sampling_rate.get()
         fs = self.sampling_rate.get()
-        self.picks[self._current_index][k] = Pick(time, index, fs, shift = shift)
+        errors = self._pick_errors(k, index + shift)
+        self._set_pick(i, r, Pick(time, index, fs, errors, shift))
+        
+    def _pick_errors(self, k, index):
+        # Uncertainty from the SNR of the unprocessed trace around the pick
+        idx = index * self._header_fs / self.sampling_rate.get()
+        X = np.asarray(self._raw[k:k+1], dtype = np.float64)
+        return snr_uncertainty(X, [ idx ], self._header_fs)[0]
+        
+    def _snap(self, k, index):
+        # Features are computed once per gather and kept until traces change
+        if self._snapper is None:
+            self._snapper = PickSnapper(self._traces)
+        return self._snapper.snap(k, index, self.snap.get(), self.snap_window.get())
+        
+    def _sort_files(self, order):
+        # Only the file list is sorted, files and picks stay in directory
+        # order so that exported pick files match read_dir
+        self._file_list.set_order(order)
+        if self._current_index is not None:
+            self._file_list.select(self._current_index)
+        
+    def _set_pick(self, i, r, pick):
+        self._npicks[i] += int(pick is not None) - int(self.picks[i][r] is not None)
+        self.picks[i][r] = pick
+        self._file_list.set_status(i, self._pick_status(i))
+        self._flagged.pop((self._filenames[i], r), None)
+        if self._client is not None:
+            try:
+                self._client.set_pick(self._filenames[i], r, pick)
+            except (IOError, OSError) as e:
+                tkmessage.showerror("Error", "Pick not sent to server: %s" % e)
+        
+    def _pick_color(self, k):
+        i, r = self._trace_map[k]
+        return "blue" if (self._filenames[i], r) in self._flagged else "red"
         
     def _tobs2str(self, tobs):
         base = np.floor(np.log10(tobs))
@@ -558,10 +1352,23 @@ class PyckerGUI():
         self.taxis_seconds.set(False)
         self.plot()
         
+    def _set_layout_shots(self):
+        self.layout_shots.set(True)
+        self.layout_receivers.set(False)
+        if self.super_gather.get() and self._current_file is not None:
+            self.apply()
+        
+    def _set_layout_receivers(self):
+        self.layout_receivers.set(True)
+        self.layout_shots.set(False)
+        if self.super_gather.get() and self._current_file is not None:
+            self.apply()
+        
     def define_variables(self):
         self.input_dirname = tk.StringVar(self.master)
         self.sampling_rate = tk.DoubleVar(self.master)
         self.enforce_fs = tk.BooleanVar(self.master)
+        self.resample = tk.BooleanVar(self.master)
         self.lowpass = tk.BooleanVar(self.master)
         self.highpass = tk.BooleanVar(self.master)
         self.lpcut = tk.DoubleVar(self.master)
@@ -574,6 +1381,8 @@ class PyckerGUI():
         self.second = tk.IntVar(self.master)
         self.plot_type = tk.IntVar(self.master)
         self.fill = tk.BooleanVar(self.master)
+        self.raster = tk.BooleanVar(self.master)
+        self.sort_offset = tk.BooleanVar(self.master)
         self.delay = tk.BooleanVar(self.master)
         self.delay_val = tk.DoubleVar(self.master)
         self.delay_unit = tk.StringVar(self.master)
@@ -581,11 +1390,28 @@ class PyckerGUI():
         self.perc = tk.DoubleVar(self.master)
         self.taxis_seconds = tk.BooleanVar(self.master)
         self.taxis_samples = tk.BooleanVar(self.master)
+        self.super_gather = tk.BooleanVar(self.master)
+        self.nshot = tk.IntVar(self.master)
+        self.receiver = tk.IntVar(self.master)
+        self.layout_shots = tk.BooleanVar(self.master)
+        self.layout_receivers = tk.BooleanVar(self.master)
+        self.memory_limit = tk.IntVar(self.master)
+        self.gain = tk.BooleanVar(self.master)
+        self.gain_type = tk.StringVar(self.master)
+        self.gain_val = tk.DoubleVar(self.master)
+        self.lmo = tk.BooleanVar(self.master)
+        self.lmo_velocity = tk.DoubleVar(self.master)
+        self.statics = tk.BooleanVar(self.master)
+        self.snap = tk.StringVar(self.master)
+        self.watch = tk.BooleanVar(self.master)
+        self.autopick = tk.BooleanVar(self.master)
+        self.snap_window = tk.IntVar(self.master)
     
     def trace_variables(self):
         self.input_dirname.trace("w", self.callback)
         self.sampling_rate.trace("w", self.callback)
         self.enforce_fs.trace("w", self.callback)
+        self.resample.trace("w", self.callback)
         self.lowpass.trace("w", self.callback)
         self.highpass.trace("w", self.callback)
         self.lpcut.trace("w", self.callback)
@@ -598,6 +1424,7 @@ class PyckerGUI():
         self.second.trace("w", self.callback)
         self.plot_type.trace("w", self.callback)
         self.fill.trace("w", self.callback)
+        self.raster.trace("w", self.callback)
         self.delay.trace("w", self.callback)
         self.delay_val.trace("w", self.callback)
         self.delay_unit.trace("w", self.callback)
@@ -605,13 +1432,36 @@ class PyckerGUI():
         self.perc.trace("w", self.callback)
         self.taxis_seconds.trace("w", self.callback)
         self.taxis_samples.trace("w", self.callback)
+        self.super_gather.trace("w", self.callback)
+        self.nshot.trace("w", self.callback)
+        self.receiver.trace("w", self.callback)
+        self.layout_shots.trace("w", self.callback)
+        self.layout_receivers.trace("w", self.callback)
+        self.lowpass.trace("w", self._update_spectrum)
+        self.highpass.trace("w", self._update_spectrum)
+        self.lpcut.trace("w", self._update_spectrum)
+        self.hpcut.trace("w", self._update_spectrum)
+        self.memory_limit.trace("w", self._set_memory_limit)
+        self.gain.trace("w", self.callback)
+        self.gain_type.trace("w", self._set_gain_type)
+        self.gain_val.trace("w", self.callback)
+        self.lmo.trace("w", self.callback)
+        self.lmo_velocity.trace("w", self.callback)
+        self.statics.trace("w", self.callback)
+        self.snap.trace("w", self.callback)
+        self.watch.trace("w", self.callback)
+        self.autopick.trace("w", self.callback)
+        self.snap_window.trace("w", self.callback)
 
     def init_variables(self):
         self.enforce_fs.set(False)
+        self.resample.set(False)
         self.lowpass.set(False)
         self.highpass.set(False)
         self.plot_type.set(1)
         self.fill.set(False)
+        self.raster.set(True)
+        self.sort_offset.set(False)
         self.delay.set(False)
         self.delay_val.set(0.)
         self.delay_unit.set("samples")
@@ -619,8 +1469,28 @@ class PyckerGUI():
         self.perc.set(1.)
         self.taxis_seconds.set(False)
         self.taxis_samples.set(True)
+        self.super_gather.set(False)
+        self.nshot.set(5)
+        self.receiver.set(1)
+        self.layout_shots.set(True)
+        self.layout_receivers.set(False)
+        self.memory_limit.set(0)
+        self.gain.set(False)
+        self.gain_type.set("agc")
+        self.lmo.set(False)
+        self.lmo_velocity.set(1000.)
+        self.statics.set(False)
+        self.snap.set("none")
+        self.watch.set(False)
+        self.autopick.set(False)
+        self.snap_window.set(20)
 
     def close(self):
+        self._stop_watch()
+        self._scheduler.cancel()
+        self._rasterizer.cancel()
+        self._survey.cancel()
+        self._close_gather()
         self.master.quit()
         self.master.destroy()
 
@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+
+"""
+Interactive latency harness of Pycker Viewer. Scripted sessions (import,
+stepping through files, picking and view options) are replayed on a viewer
+without display (Tcl interpreter and Agg canvas), and the latency of each
+interaction is reported.
+
+Usage:
+    python -m pycker.gui.latency [-s nshot] [-r nrcv] [-n npts] [--save file] [--baseline file]
+
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os, time, json, shutil, tempfile
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backend_bases import MouseEvent, PickEvent
+from .gui import PyckerGUI
+
+import sys
+if sys.version_info[0] < 3:
+    import Tkinter as tk
+else:
+    import tkinter as tk
+
+__all__ = [ "LatencyHarness", "HeadlessPyckerGUI", "synthetic_survey", "compare_latencies" ]
+
+# Methods whose own latency is recorded in addition to interactions
+TIMED_METHODS = [ "view_seismogram", "view_pick", "OnPick" ]
+
+
+def synthetic_survey(dirname, nshot = 20, nrcv = 48, npts = 2000, sampling_rate = 4000.,
+                     velocity = 1500., spacing = 2.):
+    """
+    Write a synthetic survey (one SEG-Y file per shot) with linear first
+    breaks and offsets in trace headers.
+
+    Parameters
+    ----------
+    dirname : str
+        Output directory.
+    nshot : int, default 20
+        Number of shots.
+    nrcv : int, default 48
+        Number of receivers.
+    npts : int, default 2000
+        Number of samples per trace.
+    sampling_rate : scalar, default 4000.
+        Sampling rate (in Hz).
+    velocity : scalar, default 1500.
+        Apparent velocity of first breaks (in m/s).
+    spacing : scalar, default 2.
+        Receiver spacing (in m).
+
+    Returns
+    -------
+    filenames : list of str
+        Shot filenames.
+    """
+    from obspy import Stream, Trace, UTCDateTime
+    from obspy.core import AttribDict
+    from obspy.io.segy.segy import SEGYTraceHeader
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    rng = np.random.RandomState(0)
+    t = np.arange(npts) / sampling_rate
+    filenames = []
+    for i in range(nshot):
+        source = (i * nrcv // max(nshot, 1)) * spacing
+        traces = []
+        for r in range(nrcv):
+            offset = r * spacing - source
+            tau = t - abs(offset) / velocity - 0.01
+            arg = (np.pi * 60. * tau)**2
+            data = (1. - 2. * arg) * np.exp(-arg) + 0.05 * rng.randn(npts)
+            tr = Trace(data.astype(np.float32))
+            tr.stats.sampling_rate = sampling_rate
+            tr.stats.starttime = UTCDateTime(2020, 1, 1) + 60. * i
+            h = SEGYTraceHeader()
+            h.trace_number_within_the_original_field_record = r + 1
+            h.distance_from_center_of_the_source_point_to_the_center_of_the_receiver_group = int(round(offset))
+            tr.stats.segy = AttribDict({ "trace_header": h })
+            traces.append(tr)
+        filename = "shot_%05d.segy" % i
+        Stream(traces).write(os.path.join(dirname, filename), format = "SEGY", data_encoding = 5)
+        filenames.append(filename)
+    return filenames
+
+
+class _NullWidget:
+    # Stands for widgets of the viewer without display
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class _NullFileList(_NullWidget):
+    # File list without display, files are in directory order
+
+    def __init__(self, gui):
+        self._gui = gui
+        self.selected = None
+
+    def select(self, index):
+        self.selected = index
+
+    def neighbour(self, index, step = 1):
+        index += step
+        return index if 0 <= index < len(self._gui._filenames) else None
+
+
+class HeadlessPyckerGUI(PyckerGUI):
+    """
+    Pycker Viewer without display. Tk variables and timers run in a Tcl
+    interpreter, figures are drawn on an Agg canvas, and widgets are not
+    created.
+
+    Parameters
+    ----------
+    master : tkinter object or None, default None
+        Tcl interpreter. If None, a new one is created.
+    ncolumn : int, default 2
+        Number of columns in non-gather plot.
+    """
+
+    def __init__(self, master = None, ncolumn = 2):
+        PyckerGUI.__init__(self, master if master is not None else tk.Tcl(), ncolumn)
+
+    def init_window(self):
+        pass
+
+    def init_containers(self):
+        pass
+
+    def menubar(self):
+        pass
+
+    def init_frame1(self):
+        pass
+
+    def init_frame2(self):
+        self.frame2 = _NullWidget()
+
+    def init_file_list(self):
+        self._file_list = _NullFileList(self)
+
+    def init_frame3(self):
+        self.fig = Figure(figsize = (12, 8), facecolor = "white", dpi = 150)
+        self.canvas = FigureCanvasAgg(self.fig)
+        # Look up OnPick at each event so that it can be wrapped afterwards
+        self.canvas.mpl_connect("pick_event", lambda event: self.OnPick(event))
+
+    def footer(self):
+        pass
+
+    def _set_busy(self, busy):
+        pass
+
+    def close(self):
+        self._stop_watch()
+        self._scheduler.cancel()
+        self._rasterizer.cancel()
+        self._close_gather()
+
+
+class LatencyHarness:
+    """
+    Replay scripted sessions on a headless Pycker Viewer and record the
+    latency of each interaction. An interaction lasts until the viewer is
+    idle again (including debounced reads and background rasterization).
+
+    Parameters
+    ----------
+    dirname : str or None, default None
+        Path to directory containing stream files. If None, a synthetic
+        survey is written to a temporary directory.
+    timeout : scalar, default 30.
+        Maximum duration of an interaction (in s).
+    **kwargs : dict
+        Parameters of synthetic_survey.
+    """
+
+    def __init__(self, dirname = None, timeout = 30., **kwargs):
+        self._tmpdir = None
+        if dirname is None:
+            self._tmpdir = tempfile.mkdtemp(prefix = "pycker_")
+            dirname = self._tmpdir
+            synthetic_survey(dirname, **kwargs)
+        self._dirname = os.path.join(dirname, "")
+        self._timeout = timeout
+        self._latencies = {}
+        self.gui = HeadlessPyckerGUI()
+        for name in TIMED_METHODS:
+            setattr(self.gui, name, self._timed(name, getattr(self.gui, name)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _record(self, name, seconds):
+        self._latencies.setdefault(name, []).append(1e3 * seconds)
+
+    def _timed(self, name, method):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record(name, time.perf_counter() - start)
+        return wrapper
+
+    def _wait(self):
+        # Run the event loop until debounced and background jobs are done
+        gui = self.gui
+        deadline = time.time() + self._timeout
+        while gui._scheduler.busy or gui._rasterizer.busy or gui._survey.busy:
+            if time.time() > deadline:
+                raise RuntimeError("interaction did not complete within %g s" % self._timeout)
+            gui.master.update()
+            time.sleep(0.001)
+        gui.master.update()
+
+    def interact(self, name, func, *args):
+        """
+        Run an interaction and record its latency.
+
+        Parameters
+        ----------
+        name : str
+            Interaction name.
+        func : callable
+            Function run with args.
+        """
+        start = time.perf_counter()
+        func(*args)
+        self._wait()
+        self._record(name, time.perf_counter() - start)
+
+    def pick_event(self, k, y, button = 1):
+        """
+        Synthesize a pick event on a trace and process it through the canvas
+        callbacks.
+
+        Parameters
+        ----------
+        k : int
+            Trace index in view.
+        y : scalar
+            Pick position along the time axis (in axis units).
+        button : int, default 1
+            Mouse button (1 to pick, 2 to remove, 3 to print).
+        """
+        gui = self.gui
+        mouseevent = MouseEvent("button_press_event", gui.canvas, 0, 0, button = button)
+        if gui._gather_view():
+            artist = gui.ax1
+            mouseevent.xdata, mouseevent.ydata = k + 1., y
+        else:
+            artist = gui.ax1[k]
+            mouseevent.xdata, mouseevent.ydata = y, 0.
+        event = PickEvent("pick_event", gui.canvas, mouseevent, artist)
+        gui.canvas.callbacks.process("pick_event", event)
+
+    def _toggle(self, variable, command = None):
+        variable.set(not variable.get())
+        (command or self.gui.apply)()
+
+    def run(self, nstep = 10, npick = 20, seed = 0):
+        """
+        Replay a session: import the directory, open the first file, then
+        for each step go to the next file, pick and remove traces, and
+        toggle view options.
+
+        Parameters
+        ----------
+        nstep : int, default 10
+            Number of files stepped through.
+        npick : int, default 20
+            Number of picks per file.
+        seed : int, default 0
+            Seed of the random pick positions.
+
+        Returns
+        -------
+        latencies : dict
+            Latency statistics of each interaction (see summary).
+        """
+        gui = self.gui
+        rng = np.random.RandomState(seed)
+        filenames = gui._stread.read_dir(self._dirname)
+        if not filenames:
+            raise ValueError("no stream files in %s" % self._dirname)
+        self.interact("import", gui._init_file_list, self._dirname, filenames)
+        gui._file_list.select(0)
+        self.interact("open", gui.OnDoubleClick)
+        gui.lpcut.set(0.1 * gui.sampling_rate.get())
+        for i in range(min(nstep, len(filenames) - 1)):
+            # Arrow key (debounced read)
+            self.interact("step", gui.OnEntryDown)
+            nrcv, npts = gui._shape
+            tmax = npts / gui.sampling_rate.get() if gui.taxis_seconds.get() else npts
+            for k in rng.randint(0, nrcv, npick):
+                self.interact("pick", self.pick_event, k, rng.uniform(0.1, 0.9) * tmax)
+            self.interact("unpick", self.pick_event, rng.randint(nrcv), 0., 2)
+            self.interact("gather", self._toggle, gui.plot_type, gui.plot)
+            self.interact("time_axis", gui._set_taxis_seconds if gui.taxis_samples.get()
+                          else gui._set_taxis_samples)
+            self.interact("sort_offset", self._toggle, gui.sort_offset, gui._set_sort_offset)
+            self.interact("gain", self._toggle, gui.gain)
+            self.interact("lowpass", self._toggle, gui.lowpass)
+        return self.summary()
+
+    def summary(self):
+        """
+        Latency statistics of each interaction and timed method.
+
+        Returns
+        -------
+        latencies : dict
+            Count, mean, median, 90th and 99th percentiles and maximum (in
+            ms) by interaction name.
+        """
+        stats = {}
+        for name, values in self._latencies.items():
+            values = np.array(values)
+            stats[name] = { "count": len(values), "mean": float(values.mean()),
+                            "p50": float(np.percentile(values, 50)),
+                            "p90": float(np.percentile(values, 90)),
+                            "p99": float(np.percentile(values, 99)),
+                            "max": float(values.max()) }
+        return stats
+
+    def close(self):
+        """
+        Close the viewer and remove the synthetic survey.
+        """
+        self.gui.close()
+        if self._tmpdir is not None:
+            shutil.rmtree(self._tmpdir, ignore_errors = True)
+            self._tmpdir = None
+
+
+def format_latencies(stats):
+    """
+    Format latency statistics as a table.
+
+    Parameters
+    ----------
+    stats : dict
+        Latency statistics (see LatencyHarness.summary).
+
+    Returns
+    -------
+    table : str
+        One line per interaction.
+    """
+    lines = [ "%-16s %6s %9s %9s %9s %9s %9s" % ("interaction", "count", "mean", "p50", "p90", "p99", "max") ]
+    for name in sorted(stats):
+        s = stats[name]
+        lines.append("%-16s %6d %9.1f %9.1f %9.1f %9.1f %9.1f"
+                     % (name, s["count"], s["mean"], s["p50"], s["p90"], s["p99"], s["max"]))
+    return "\n".join(lines)
+
+
+def compare_latencies(stats, baseline, tolerance = 1.5, slack = 5.):
+    """
+    Compare latency statistics to a baseline.
+
+    Parameters
+    ----------
+    stats : dict
+        Latency statistics (see LatencyHarness.summary).
+    baseline : dict
+        Baseline latency statistics.
+    tolerance : scalar, default 1.5
+        Maximum ratio of 90th percentiles.
+    slack : scalar, default 5.
+        Latency increase always tolerated (in ms), so that fast interactions
+        do not fail on timer noise.
+
+    Returns
+    -------
+    regressions : list of tuple
+        Interaction name, baseline and current 90th percentiles (in ms) of
+        each regression.
+    """
+    regressions = []
+    for name in sorted(set(stats) & set(baseline)):
+        old, new = baseline[name]["p90"], stats[name]["p90"]
+        if new > max(tolerance * old, old + slack):
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main():
+    """
+    Run the latency harness from the command line.
+    """
+    import argparse, matplotlib
+    matplotlib.use("Agg")
+    parser = argparse.ArgumentParser(description = "Replay a scripted session on a headless Pycker Viewer and report interaction latencies.")
+    parser.add_argument("-d", "--dirname", default = None, help = "directory containing stream files (default: synthetic survey)")
+    parser.add_argument("-s", "--nshot", type = int, default = 12, help = "number of synthetic shots")
+    parser.add_argument("-r", "--nrcv", type = int, default = 48, help = "number of synthetic receivers")
+    parser.add_argument("-n", "--npts", type = int, default = 2000, help = "number of synthetic samples per trace")
+    parser.add_argument("--nstep", type = int, default = 10, help = "number of files stepped through")
+    parser.add_argument("--npick", type = int, default = 20, help = "number of picks per file")
+    parser.add_argument("--save", default = None, help = "save latency statistics to JSON file")
+    parser.add_argument("--baseline", default = None, help = "baseline JSON file, exit with status 1 on regression")
+    parser.add_argument("--tolerance", type = float, default = 1.5, help = "maximum ratio of 90th percentiles to baseline")
+    args = parser.parse_args()
+    kwargs = {} if args.dirname else { "nshot": args.nshot, "nrcv": args.nrcv, "npts": args.npts }
+    with LatencyHarness(args.dirname, **kwargs) as harness:
+        stats = harness.run(args.nstep, args.npick)
+    print(format_latencies(stats))
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(stats, f, indent = 1, sort_keys = True)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_latencies(stats, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print("Regression: %s p90 %.1f ms -> %.1f ms" % (name, old, new))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
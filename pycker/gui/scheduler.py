@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+__all__ = [ "RenderScheduler" ]
+
+
+class RenderScheduler:
+    """
+    Debounce rendering requests of a Tk application. A request runs a job in
+    a worker thread (e.g. reading a file) then its callback in the Tk main
+    loop (e.g. plotting). Only the latest request is honoured: requests made
+    within the debounce delay replace each other, a request waiting for the
+    worker replaces the previous waiting one, and the result of a job that
+    became stale while running is discarded.
+
+    Parameters
+    ----------
+    master : tkinter object
+        tkinter widget used to schedule callbacks.
+    delay : int, default 60
+        Debounce delay (in ms).
+    poll : int, default 15
+        Polling interval of the worker (in ms).
+    """
+
+    def __init__(self, master, delay = 60, poll = 15):
+        if not isinstance(delay, int) or delay < 0:
+            raise ValueError("delay must be a positive integer")
+        if not isinstance(poll, int) or poll < 1:
+            raise ValueError("poll must be a positive integer")
+        self._master = master
+        self._delay = delay
+        self._poll = poll
+        self._generation = 0
+        self._after = None
+        self._pending = None
+        self._running = False
+        self._results = queue.Queue()
+
+    def request(self, job, callback, errback = None, delay = None):
+        """
+        Schedule a rendering request.
+
+        Parameters
+        ----------
+        job : callable or None
+            Function without argument run in the worker thread. It must not
+            use Tk. If None, callback is called without argument.
+        callback : callable
+            Function run in the main loop with the result of job.
+        errback : callable or None, default None
+            Function run in the main loop with the exception raised by job.
+            If None, the exception is raised in the main loop.
+        delay : int or None, default None
+            Debounce delay (in ms). If None, use default delay.
+        """
+        self.cancel()
+        delay = self._delay if delay is None else delay
+        self._after = self._master.after(delay, self._submit, (self._generation, job, callback, errback))
+
+    def cancel(self):
+        """
+        Cancel scheduled requests and discard the result of the running job.
+        """
+        self._generation += 1
+        self._pending = None
+        if self._after is not None:
+            self._master.after_cancel(self._after)
+            self._after = None
+
+    def _submit(self, request):
+        self._after = None
+        generation, job, callback, errback = request
+        if job is None:
+            callback()
+        elif self._running:
+            self._pending = request
+        else:
+            self._running = True
+            thread = threading.Thread(target = self._work, args = (request,))
+            thread.daemon = True
+            thread.start()
+            self._master.after(self._poll, self._check)
+
+    def _work(self, request):
+        generation, job, callback, errback = request
+        try:
+            self._results.put((request, job(), None))
+        except Exception as e:
+            self._results.put((request, None, e))
+
+    def _check(self):
+        try:
+            request, result, error = self._results.get_nowait()
+        except queue.Empty:
+            self._master.after(self._poll, self._check)
+            return
+        self._running = False
+        generation, job, callback, errback = request
+        if generation == self._generation:
+            if error is None:
+                callback(result)
+            elif errback is not None:
+                errback(error)
+            else:
+                raise error
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._submit(pending)
+
+    @property
+    def busy(self):
+        """
+        bool
+        True if a job is running or waiting.
+        """
+        return self._running or self._pending is not None or self._after is not None
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+"""
+Amplitude spectrum window for Pycker Viewer.
+
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+from matplotlib.figure import Figure
+from matplotlib.gridspec import GridSpec
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+import numpy as np
+
+import sys
+if sys.version_info[0] < 3:
+    import Tkinter as tk
+else:
+    import tkinter as tk
+
+__all__ = [ "SpectrumPanel" ]
+
+
+class SpectrumPanel:
+    """
+    Window displaying the average and per-trace amplitude spectra of a
+    gather. The filter response is applied by multiplication with the
+    cached spectra so that the display can be updated live.
+
+    Parameters
+    ----------
+    master : tkinter object
+        Parent window.
+    on_close : callable or None, default None
+        Function called when the window is closed.
+    dbmin : scalar, default -80.
+        Minimum amplitude displayed (in dB).
+    """
+
+    def __init__(self, master, on_close = None, dbmin = -80.):
+        self._on_close = on_close
+        self._dbmin = dbmin
+        self._amp = None
+        self.window = tk.Toplevel(master)
+        self.window.title("Amplitude spectrum")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self.fig = Figure(figsize = (6, 6), facecolor = "white", dpi = 100)
+        self.canvas = FigureCanvasTkAgg(self.fig, master = self.window)
+        self.canvas.get_tk_widget().pack(side = "top", fill = "both", expand = 1)
+
+    def set_spectrum(self, freqs, amp, avg):
+        """
+        Display new spectra.
+
+        Parameters
+        ----------
+        freqs : ndarray
+            Frequency axis (in Hz).
+        amp : ndarray
+            Amplitude spectra. Each row corresponds to a seismic record.
+        avg : ndarray
+            Average amplitude spectrum.
+        """
+        self._amp = amp
+        self._avg = avg
+        self._ref = max(amp.max(), np.finfo(float).tiny)
+        self.fig.clear()
+        gs = GridSpec(3, 1)
+        self.ax1 = self.fig.add_subplot(gs[0])
+        self.ax2 = self.fig.add_subplot(gs[1:], sharex = self.ax1)
+        self.ax1.plot(freqs, self._todb(avg), color = "gray", linewidth = 0.5)
+        self._avg_line, = self.ax1.plot(freqs, self._todb(avg), color = "black", linewidth = 0.75)
+        self.ax1.set_ylabel("Amplitude (dB)", fontsize = 8)
+        self.ax1.set_ylim(self._dbmin, 0.)
+        self.ax1.get_xaxis().set_visible(False)
+        self._image = self.ax2.imshow(self._todb(amp), aspect = "auto", origin = "lower",
+                                      extent = (freqs[0], freqs[-1], 0.5, amp.shape[0]+0.5),
+                                      vmin = self._dbmin, vmax = 0., interpolation = "nearest")
+        self.ax2.set_xlabel("Frequency (Hz)", fontsize = 8)
+        self.ax2.set_ylabel("Trace number", fontsize = 8)
+        self.ax2.set_xlim(freqs[0], freqs[-1])
+        for ax in [ self.ax1, self.ax2 ]:
+            ax.tick_params(labelsize = 6)
+        self.fig.tight_layout()
+        self.canvas.draw()
+
+    def set_response(self, H):
+        """
+        Apply a filter amplitude response to the displayed spectra.
+
+        Parameters
+        ----------
+        H : ndarray
+            Amplitude response evaluated at the frequencies of the spectra.
+        """
+        if self._amp is not None:
+            self._avg_line.set_ydata(self._todb(self._avg * H))
+            self._image.set_data(self._todb(self._amp * H))
+            self.canvas.draw_idle()
+
+    def close(self):
+        self.window.destroy()
+        if self._on_close is not None:
+            self._on_close()
+
+    def _todb(self, amp):
+        return 20. * np.log10(np.maximum(amp / self._ref, 10.**(self._dbmin/20.)))
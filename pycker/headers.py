@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os
+import numpy as np
+from .read_stream import StreamReader
+
+__all__ = [ "trace_geometry", "read_geometry", "read_statics", "empty_geometry", "GEOMETRY_FIELDS" ]
+
+GEOMETRY_FIELDS = [ "source_x", "source_y", "receiver_x", "receiver_y", "offset", "channel" ]
+
+# Trace header fields (SEG-Y rev 1 byte offsets)
+_TRACE_HEADER = [ ("channel", "i4", 12), ("offset", "i4", 36), ("scalar", "i2", 70),
+                  ("source_x", "i4", 72), ("source_y", "i4", 76),
+                  ("receiver_x", "i4", 80), ("receiver_y", "i4", 84),
+                  ("source_static", "i2", 98), ("receiver_static", "i2", 100),
+                  ("npts", "i2", 114), ("time_scalar", "i2", 214) ]
+
+# Bytes per sample of SEG-Y data sample format codes
+_SAMPLE_SIZE = { 1: 4, 2: 4, 3: 2, 5: 4, 6: 8, 8: 1, 9: 8, 10: 4, 11: 2, 16: 1 }
+
+
+def _scale(scalar):
+    # SEG-Y scalars: negative values are divisors, zero means 1
+    scalar = np.asarray(scalar, dtype = float)
+    scale = np.ones(scalar.shape)
+    scale[scalar < 0.] = -1. / scalar[scalar < 0.]
+    scale[scalar > 0.] = scalar[scalar > 0.]
+    return scale
+
+
+def _location(value):
+    try:
+        values = [ float(v) for v in str(value).split() ]
+    except ValueError:
+        values = []
+    return (values + [ np.nan, np.nan ])[:2]
+
+
+def _trace_values(stats):
+    if "segy" in stats or "su" in stats:
+        h = (stats.segy if "segy" in stats else stats.su).trace_header
+        scale = float(_scale(h.scalar_to_be_applied_to_all_coordinates))
+        return [ h.source_coordinate_x * scale, h.source_coordinate_y * scale,
+                 h.group_coordinate_x * scale, h.group_coordinate_y * scale,
+                 h.distance_from_center_of_the_source_point_to_the_center_of_the_receiver_group,
+                 h.trace_number_within_the_original_field_record ]
+    elif "seg2" in stats:
+        h = stats.seg2
+        return _location(h.get("SOURCE_LOCATION")) + _location(h.get("RECEIVER_LOCATION")) \
+               + [ np.nan, float(h.get("CHANNEL_NUMBER", np.nan)) ]
+    elif "sac" in stats:
+        h = stats.sac
+        return [ h.get("evlo", np.nan), h.get("evla", np.nan),
+                 h.get("stlo", np.nan), h.get("stla", np.nan), np.nan, np.nan ]
+    else:
+        return [ np.nan ] * len(GEOMETRY_FIELDS)
+
+
+def _geometry(values):
+    values = np.array(values, dtype = float).reshape((-1, len(GEOMETRY_FIELDS)))
+    geometry = dict((field, values[:,k]) for k, field in enumerate(GEOMETRY_FIELDS))
+    coords = values[:,:4]
+    if np.all(np.nan_to_num(coords) == 0.):
+        coords[:] = np.nan
+    for field in [ "offset", "channel" ]:
+        if np.all(np.nan_to_num(geometry[field]) == 0.):
+            geometry[field][:] = np.nan
+    if np.isnan(geometry["offset"]).all():
+        dx = geometry["receiver_x"] - geometry["source_x"]
+        dy = np.nan_to_num(geometry["receiver_y"] - geometry["source_y"])
+        geometry["offset"][:] = np.where(dx < 0., -1., 1.) * np.hypot(dx, dy)
+    return geometry
+
+
+def empty_geometry(n):
+    """
+    Geometry of traces without header information.
+
+    Parameters
+    ----------
+    n : int
+        Number of traces.
+
+    Returns
+    -------
+    geometry : dict
+        Arrays of GEOMETRY_FIELDS filled with NaN.
+    """
+    return dict((field, np.full(n, np.nan)) for field in GEOMETRY_FIELDS)
+
+
+def trace_geometry(st):
+    """
+    Source and receiver coordinates, offsets and channel numbers of all
+    traces of a stream, taken from trace headers where available.
+
+    Parameters
+    ----------
+    st : Stream
+        List of Trace objects (headers only is enough).
+
+    Returns
+    -------
+    geometry : dict
+        Arrays of source_x, source_y, receiver_x, receiver_y, offset and
+        channel. Values not available are NaN. Coordinates, offsets or
+        channels that are all zero are considered not available. Offsets not
+        available are computed from coordinates (negative when the receiver
+        is at lower x than the source).
+    """
+    return _geometry([ _trace_values(tr.stats) for tr in st.traces ])
+
+
+def _header_dtype(endian, itemsize):
+    names, formats, offsets = zip(*_TRACE_HEADER)
+    return np.dtype({ "names": list(names), "formats": [ endian + f for f in formats ],
+                      "offsets": list(offsets), "itemsize": itemsize })
+
+
+def _scan_headers(filename, start, endian, sample_size):
+    size = os.path.getsize(filename) - start
+    npts = np.fromfile(filename, dtype = endian + "i2", count = 1, offset = start + 114)
+    if len(npts) == 0 or npts[0] <= 0:
+        return None
+    itemsize = 240 + int(npts[0]) * sample_size
+    if size % itemsize != 0:
+        return None
+    h = np.memmap(filename, dtype = _header_dtype(endian, itemsize), mode = "r",
+                  offset = start, shape = (size // itemsize,))
+    if np.any(h["npts"] != npts[0]):
+        return None
+    # Copy header fields so that the file is not kept mapped
+    return dict((name, np.array(h[name])) for name, _, _ in _TRACE_HEADER)
+
+
+def _segy_headers(filename):
+    head = np.fromfile(filename, dtype = np.uint8, count = 3600)
+    if len(head) < 3600:
+        return None
+    for endian in [ ">", "<" ]:
+        code = int(head[3224:3226].view(endian + "i2")[0])
+        if code in _SAMPLE_SIZE:
+            next_headers = int(head[3504:3506].view(endian + "i2")[0])
+            start = 3600 + 3200 * max(next_headers, 0)
+            return _scan_headers(filename, start, endian, _SAMPLE_SIZE[code])
+    return None
+
+
+def _su_headers(filename):
+    for endian in [ "<", ">" ]:
+        h = _scan_headers(filename, 0, endian, 4)
+        if h is not None:
+            return h
+    return None
+
+
+def _read_headers(filename):
+    # Trace header fields of SEG-Y and SU files, None for other formats
+    ext = os.path.splitext(filename)[1][1:].lower()
+    if ext in [ "segy", "sgy" ]:
+        return _segy_headers(filename)
+    elif ext == "su":
+        return _su_headers(filename)
+    else:
+        return None
+
+
+def read_geometry(filename):
+    """
+    Read the geometry of all traces of a file. SEG-Y and SU trace headers
+    are read at once as a structured array without decoding the data, other
+    formats are read with ObsPy (headers only).
+
+    Parameters
+    ----------
+    filename : str
+        Path to file.
+
+    Returns
+    -------
+    geometry : dict
+        Arrays of GEOMETRY_FIELDS (see trace_geometry).
+    """
+    h = _read_headers(filename)
+    if h is None:
+        return trace_geometry(StreamReader().read_file(filename, headonly = True))
+    scale = _scale(h["scalar"])
+    return _geometry(np.column_stack([ h["source_x"] * scale, h["source_y"] * scale,
+                                       h["receiver_x"] * scale, h["receiver_y"] * scale,
+                                       h["offset"], h["channel"] ]))
+
+
+def read_statics(filename):
+    """
+    Read the static corrections (source plus receiver statics) of all
+    traces of a file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to file.
+
+    Returns
+    -------
+    statics : ndarray
+        Static correction of each trace (in s), zero if not available. A
+        corrected trace is the input trace delayed by its static.
+    """
+    h = _read_headers(filename)
+    if h is not None:
+        statics = (h["source_static"].astype(float) + h["receiver_static"]) * _scale(h["time_scalar"])
+        return statics * 1e-3
+    statics = []
+    for tr in StreamReader().read_file(filename, headonly = True).traces:
+        if "segy" in tr.stats or "su" in tr.stats:
+            th = (tr.stats.segy if "segy" in tr.stats else tr.stats.su).trace_header
+            statics.append((th.source_static_correction_in_ms + th.group_static_correction_in_ms)
+                           * float(_scale(th.scalar_to_be_applied_to_times)) * 1e-3)
+        else:
+            statics.append(0.)
+    return np.array(statics)
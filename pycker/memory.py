@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import sys
+import numpy as np
+from collections import OrderedDict
+
+__all__ = [ "MemoryBudget", "array_nbytes", "picks_nbytes", "figure_nbytes" ]
+
+
+def array_nbytes(obj):
+    """
+    Bytes held by the arrays contained in an object. Arrays are counted once
+    even if they are referenced several times, views count for their base.
+
+    Parameters
+    ----------
+    obj : ndarray, list, tuple, dict or None
+        Array or (nested) container of arrays.
+
+    Returns
+    -------
+    nbytes : int
+        Number of bytes.
+    """
+    seen = set()
+    stack = [ obj ]
+    nbytes = 0
+    while stack:
+        item = stack.pop()
+        if isinstance(item, np.ndarray):
+            while isinstance(item.base, np.ndarray):
+                item = item.base
+            if id(item) not in seen and not isinstance(item, np.memmap):
+                seen.add(id(item))
+                nbytes += item.nbytes
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+    return nbytes
+
+
+def _object_nbytes(obj):
+    nbytes = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        nbytes += sys.getsizeof(obj.__dict__)
+    return nbytes
+
+
+def picks_nbytes(picks):
+    """
+    Approximate bytes held by the picks of a survey.
+
+    Parameters
+    ----------
+    picks : list
+        Picks of each file (list of Pick or None for each receiver).
+
+    Returns
+    -------
+    nbytes : int
+        Number of bytes.
+    """
+    nbytes = sys.getsizeof(picks)
+    pick_size = None
+    for shot in picks:
+        if shot is not None:
+            nbytes += sys.getsizeof(shot)
+            npicks = sum(pick is not None for pick in shot)
+            if npicks and pick_size is None:
+                pick = next(pick for pick in shot if pick is not None)
+                pick_size = _object_nbytes(pick) + _object_nbytes(pick.time_errors)
+            nbytes += npicks * (pick_size or 0)
+    return nbytes
+
+
+def figure_nbytes(fig):
+    """
+    Approximate bytes held by a matplotlib figure (artist data and canvas
+    buffer).
+
+    Parameters
+    ----------
+    fig : Figure
+        Matplotlib figure.
+
+    Returns
+    -------
+    nbytes : int
+        Number of bytes.
+    """
+    arrays = []
+    for ax in fig.axes:
+        arrays += [ line.get_xydata() for line in ax.lines ]
+        arrays += [ path.vertices for coll in ax.collections for path in coll.get_paths() ]
+        arrays += [ np.asarray(im.get_array()) for im in ax.images ]
+    return array_nbytes(arrays) + int(fig.bbox.width * fig.bbox.height * 4)
+
+
+class MemoryBudget:
+    """
+    Memory accounting of the consumers of an application (trace buffers,
+    caches, picks, figures...) with an optional budget. When the total
+    exceeds the budget, consumers are released (evicted or downcast) by
+    increasing priority until the total fits.
+
+    Parameters
+    ----------
+    limit : int or None, default None
+        Memory budget (in bytes). If None, memory is only accounted.
+    """
+
+    def __init__(self, limit = None):
+        self.limit = limit
+        self._consumers = OrderedDict()
+
+    def __repr__(self):
+        lines = [ "%s: %s" % (name.rjust(16), self._tostr(nbytes)) for name, nbytes in self.usage().items() ]
+        lines.append("%s: %s" % ("total".rjust(16), self._tostr(self.total())))
+        if self._limit is not None:
+            lines.append("%s: %s" % ("limit".rjust(16), self._tostr(self._limit)))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _tostr(nbytes):
+        for unit in [ "B", "kB", "MB" ]:
+            if nbytes < 1024.:
+                return "%.1f %s" % (nbytes, unit)
+            nbytes /= 1024.
+        return "%.1f GB" % nbytes
+
+    def register(self, name, sizeof, release = None, priority = 0):
+        """
+        Register a memory consumer.
+
+        Parameters
+        ----------
+        name : str
+            Consumer name.
+        sizeof : callable
+            Function without argument returning the bytes currently held.
+        release : callable or None, default None
+            Function without argument freeing memory (e.g. clearing a cache or
+            downcasting arrays). If None, the consumer is only accounted.
+        priority : int, default 0
+            Consumers with lower priority are released first.
+        """
+        if not callable(sizeof):
+            raise ValueError("sizeof must be callable")
+        if release is not None and not callable(release):
+            raise ValueError("release must be callable or None")
+        self._consumers[name] = (sizeof, release, priority)
+
+    def usage(self):
+        """
+        Bytes held by each consumer.
+
+        Returns
+        -------
+        usage : dict
+            Number of bytes by consumer name.
+        """
+        return OrderedDict((name, int(sizeof())) for name, (sizeof, _, _) in self._consumers.items())
+
+    def total(self):
+        """
+        Bytes held by all consumers.
+
+        Returns
+        -------
+        nbytes : int
+            Number of bytes.
+        """
+        return sum(self.usage().values())
+
+    def enforce(self):
+        """
+        Release consumers until the total fits in the budget.
+
+        Returns
+        -------
+        released : list of str
+            Names of the released consumers.
+        """
+        released = []
+        if self._limit is not None:
+            consumers = sorted([ (priority, name, release) for name, (_, release, priority)
+                                 in self._consumers.items() if release is not None ],
+                               key = lambda c: c[0])
+            for _, name, release in consumers:
+                if self.total() <= self._limit:
+                    break
+                release()
+                released.append(name)
+        return released
+
+    @property
+    def limit(self):
+        """
+        int or None
+        Memory budget (in bytes).
+        """
+        return self._limit
+
+    @limit.setter
+    def limit(self, value):
+        if value is not None and (not isinstance(value, (int, float)) or value < 0):
+            raise ValueError("limit must be a positive scalar or None")
+        self._limit = value
+
+    @property
+    def names(self):
+        """
+        list of str
+        Consumer names.
+        """
+        return list(self._consumers)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from collections import OrderedDict
+from .memory import array_nbytes
+
+try:
+    from scipy.fft import next_fast_len
+except ImportError:
+    from scipy.fftpack import next_fast_len
+
+__all__ = [ "PhaseShifter", "lmo_shifts" ]
+
+
+def lmo_shifts(offsets, velocity, sampling_rate):
+    """
+    Linear moveout of each trace for a reduction velocity.
+
+    Parameters
+    ----------
+    offsets : ndarray
+        Source-receiver offset of each trace (in m).
+    velocity : scalar
+        Reduction velocity (in m/s).
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+
+    Returns
+    -------
+    shifts : ndarray
+        Moveout of each trace (in samples).
+    """
+    if not isinstance(velocity, (int, float)) or velocity <= 0.:
+        raise ValueError("velocity must be a positive scalar")
+    return np.abs(np.asarray(offsets, dtype = float)) / velocity * sampling_rate
+
+
+class PhaseShifter:
+    """
+    Fractional-sample time shifts of all traces of a gather, applied as
+    linear phase ramps in the frequency domain. The spectra of the gather
+    are computed once (zero-padded to avoid wrap-around), and the latest
+    shifted gathers are cached by shifts.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    maxsize : int, default 4
+        Maximum number of shifted gathers kept in cache.
+    """
+
+    def __init__(self, X, maxsize = 4):
+        if not isinstance(X, np.ndarray) or X.ndim != 2:
+            raise ValueError("X must be a 2-D ndarray")
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self._X = X
+        self._nfft = next_fast_len(2 * X.shape[1])
+        self._spectra = None
+        self._maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def shift(self, shifts):
+        """
+        Shift traces.
+
+        Parameters
+        ----------
+        shifts : ndarray
+            Shift of each trace (in samples). Sample i of a shifted trace is
+            sample i + shift of the input trace, i.e. positive shifts move
+            traces toward earlier times. Samples shifted in are zero.
+
+        Returns
+        -------
+        Y : ndarray
+            Shifted seismic traces. It may be shared with the cache and must
+            not be modified in place.
+        """
+        shifts = np.asarray(shifts, dtype = float)
+        nrcv, npts = self._X.shape
+        if shifts.shape != (nrcv,):
+            raise ValueError("shifts must have one value per trace")
+        key = shifts.tobytes()
+        if key in self._cache:
+            self._cache[key] = self._cache.pop(key)
+            return self._cache[key]
+        if self._spectra is None:
+            self._spectra = np.fft.rfft(self._X, self._nfft, axis = 1)
+        freqs = np.fft.rfftfreq(self._nfft)
+        ramp = np.exp(2j * np.pi * np.outer(shifts, freqs))
+        Y = np.fft.irfft(self._spectra * ramp, self._nfft, axis = 1)[:,:npts]
+        # Shifts longer than the padding would wrap around
+        Y[np.abs(shifts) >= self._nfft - npts] = 0.
+        Y = Y.astype(np.result_type(self._X.dtype, np.float32))
+        self._cache[key] = Y
+        while len(self._cache) > self._maxsize:
+            self._cache.popitem(last = False)
+        return Y
+
+    @property
+    def input(self):
+        """
+        ndarray
+        Input seismic traces.
+        """
+        return self._X
+
+    @property
+    def nbytes(self):
+        """
+        int
+        Bytes held by the spectra and cached shifted gathers (input
+        excluded).
+        """
+        return array_nbytes([ self._spectra, list(self._cache.values()) ])
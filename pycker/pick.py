@@ -5,13 +5,14 @@ Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
 License: MIT
 """
 
+import numpy as np
 from obspy.core.utcdatetime import UTCDateTime
-from .quantity_error import QuantityError
+from .quantity_error import QuantityError, QuantityErrorArray
 
 __all__ = [ "Pick" ]
 
 
-class Pick:
+class Pick(object):
     """
     A pick is the observation of an amplitude anomaly in a seismogram at a
     specific point in time. It is not necessarily related to a seismic event.
@@ -24,8 +25,9 @@ class Pick:
         Corresponding index on trace.
     sampling_rate : scalar or None, default None
         Sampling rate (in Hz).
-    time_errors : QuantityError
-        Observed onset time of signal uncertainties.
+    time_errors : QuantityError or None, default None
+        Observed onset time of signal uncertainties. If None, uncertainties
+        are empty.
     shift : scalar or None
         Shift applied to origin time for picking (samples).
     phase_hint : str or None, default None
@@ -34,8 +36,10 @@ class Pick:
     
     _ATTRIBUTES = [ "time", "index", "sampling_rate",  "time_errors", "shift", "phase_hint" ]
     
+    __slots__ = [ "_" + attr for attr in _ATTRIBUTES ]
+    
     def __init__(self, time = None, index = None, sampling_rate = None,
-                 time_errors = QuantityError(), shift = None, phase_hint = None):
+                 time_errors = None, shift = None, phase_hint = None):
         if time is not None and not isinstance(time, (float, UTCDateTime)):
             raise ValueError("time must be a float or UTCDateTime")
         else:
@@ -49,7 +53,9 @@ class Pick:
             raise ValueError("sampling_rate must be a positive integer or float")
         else:
             self._sampling_rate = sampling_rate
-        if not isinstance(time_errors, QuantityError):
+        if time_errors is None:
+            self._time_errors = QuantityError()
+        elif not isinstance(time_errors, QuantityError):
             raise ValueError("time_errors must be QuantityError")
         else:
             self._time_errors = time_errors
@@ -67,6 +73,90 @@ class Pick:
                         for attr in self._ATTRIBUTES ]
         return "\n".join(attributes) + "\n"
     
+    def __getstate__(self):
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+    
+    def __setstate__(self, state):
+        # Picks pickled before slots were introduced have a dict state and
+        # may miss attributes added since
+        if isinstance(state, tuple):
+            state = state[1]
+        for slot in self.__slots__:
+            setattr(self, slot, state.get(slot))
+        if self._time_errors is None:
+            self._time_errors = QuantityError()
+    
+    @classmethod
+    def from_arrays(cls, index, sampling_rate, starttime = 0., time_errors = None,
+                    shift = None, phase_hint = None):
+        """
+        Create the picks of many traces at once. Inputs are validated as
+        arrays and picks are created without per-pick checks.
+
+        Parameters
+        ----------
+        index : array_like
+            Index on trace of each pick. NaN means no pick.
+        sampling_rate : scalar or array_like
+            Sampling rate (in Hz).
+        starttime : scalar, UTCDateTime or array_like, default 0.
+            Start time of traces. Pick time is starttime + index /
+            sampling_rate.
+        time_errors : QuantityErrorArray or None, default None
+            Time uncertainties of each pick. If None, uncertainties are
+            empty.
+        shift : scalar, array_like or None, default None
+            Shift applied to origin time for picking (samples).
+        phase_hint : str or None, default None
+            Tentative phase identification as specified by the picker.
+
+        Returns
+        -------
+        picks : list
+            Pick (or None where index is NaN) of each trace.
+        """
+        index = np.asarray(index, dtype = float)
+        if index.ndim != 1:
+            raise ValueError("index must be a 1-D array")
+        n = len(index)
+        sampling_rate = np.broadcast_to(np.asarray(sampling_rate, dtype = float), (n,))
+        if np.any(~(sampling_rate > 0.)):
+            raise ValueError("sampling_rate must be positive")
+        if shift is not None:
+            shift = np.broadcast_to(np.asarray(shift, dtype = float), (n,)).tolist()
+        else:
+            shift = [ None ] * n
+        if time_errors is None:
+            time_errors = [ QuantityError() for _ in range(n) ]
+        elif isinstance(time_errors, QuantityErrorArray) and len(time_errors) == n:
+            time_errors = time_errors.tolist()
+        else:
+            raise ValueError("time_errors must be a QuantityErrorArray of size %d" % n)
+        if phase_hint is not None and not isinstance(phase_hint, str):
+            raise ValueError("phase_hint must be a string")
+        valid = np.isfinite(index)
+        with np.errstate(invalid = "ignore"):
+            dt = np.where(valid, index / sampling_rate, 0.)
+        if isinstance(starttime, UTCDateTime):
+            # Nanosecond integers avoid a float conversion per pick
+            times = (starttime.ns + np.round(dt * 1e9).astype(np.int64)).tolist()
+        else:
+            times = (np.broadcast_to(np.asarray(starttime, dtype = float), (n,)) + dt).tolist()
+        utc = isinstance(starttime, UTCDateTime)
+        index, sampling_rate = index.tolist(), sampling_rate.tolist()
+        picks = [ None ] * n
+        new = object.__new__
+        for k in np.nonzero(valid)[0].tolist():
+            pick = new(cls)
+            pick._time = UTCDateTime(ns = times[k]) if utc else times[k]
+            pick._index = index[k]
+            pick._sampling_rate = sampling_rate[k]
+            pick._time_errors = time_errors[k]
+            pick._shift = shift[k]
+            pick._phase_hint = phase_hint
+            picks[k] = pick
+        return picks
+    
     def _print_attr(self, attr):
         if attr not in self._ATTRIBUTES:
             raise ValueError("error_type should be either 'time', 'index', 'sampling_rate', 'time_errors', 'shift' or 'phase_hint'")
@@ -83,7 +173,32 @@ class Pick:
                 return self._shift
             elif attr == "phase_hint":
                 return self._phase_hint
-        
+
+    def resample(self, sampling_rate):
+        """
+        Convert pick to another sampling rate. Pick time is unchanged, index
+        and shift are scaled accordingly.
+
+        Parameters
+        ----------
+        sampling_rate : scalar
+            New sampling rate (in Hz).
+
+        Returns
+        -------
+        pick : Pick
+            Converted pick (self if sampling rates are equal).
+        """
+        if not isinstance(sampling_rate, (int, float)) or sampling_rate <= 0.:
+            raise ValueError("sampling_rate must be a positive scalar")
+        if self._sampling_rate is None or self._sampling_rate == sampling_rate:
+            return self
+        ratio = sampling_rate / self._sampling_rate
+        index = self._index * ratio if self._index is not None else None
+        shift = self._shift * ratio if self._shift is not None else None
+        return Pick(self._time, index, float(sampling_rate), self._time_errors,
+                    shift, self._phase_hint)
+
     @property
     def time(self):
         """
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import sqlite3, threading, time
+import numpy as np
+from obspy.core.utcdatetime import UTCDateTime
+from .pick import Pick
+from .quantity_error import QuantityError
+from .headers import GEOMETRY_FIELDS
+
+__all__ = [ "PickStore", "pick_to_dict", "pick_from_dict" ]
+
+_COLUMNS = [ "time", "idx", "sampling_rate", "shift", "phase_hint", "uncertainty",
+             "lower_uncertainty", "upper_uncertainty", "confidence_level" ]
+
+
+def _time_to_string(t):
+    # ISO 8601 with nanoseconds whatever the precision of t
+    return str(UTCDateTime(ns = t.ns, precision = 9))
+
+
+def _time_from_string(t):
+    # Fractional seconds are parsed as an integer, UTCDateTime would round
+    # them to microseconds
+    head, _, frac = t.rstrip("Z").partition(".")
+    return UTCDateTime(ns = UTCDateTime(head).ns + int(frac[:9].ljust(9, "0")))
+
+
+def pick_to_dict(pick):
+    """
+    Convert a pick to a JSON serializable dictionary.
+
+    Parameters
+    ----------
+    pick : Pick
+        Pick to convert.
+
+    Returns
+    -------
+    d : dict
+        Pick attributes. Time is stored as a string (ISO 8601 with
+        nanoseconds if UTCDateTime).
+    """
+    errors = pick.time_errors
+    index = float(pick.index) if pick.index is not None else None
+    shift = float(pick.shift) if pick.shift is not None else None
+    fs = float(pick.sampling_rate) if pick.sampling_rate is not None else None
+    if isinstance(pick.time, UTCDateTime):
+        t = _time_to_string(pick.time)
+    else:
+        t = str(pick.time) if pick.time is not None else None
+    return { "time": t,
+             "idx": index,
+             "sampling_rate": fs,
+             "shift": shift,
+             "phase_hint": pick.phase_hint,
+             "uncertainty": errors.uncertainty,
+             "lower_uncertainty": errors.lower_uncertainty,
+             "upper_uncertainty": errors.upper_uncertainty,
+             "confidence_level": errors.confidence_level }
+
+
+def pick_from_dict(d):
+    """
+    Convert a dictionary created by pick_to_dict back to a pick.
+
+    Parameters
+    ----------
+    d : dict
+        Pick attributes.
+
+    Returns
+    -------
+    pick : Pick
+        Converted pick.
+    """
+    t = d["time"]
+    if t is not None:
+        try:
+            t = float(t)
+        except ValueError:
+            t = _time_from_string(t)
+    errors = QuantityError(d["uncertainty"], d["lower_uncertainty"],
+                           d["upper_uncertainty"], d["confidence_level"])
+    return Pick(t, d["idx"], d["sampling_rate"], errors, d["shift"], d["phase_hint"])
+
+
+class PickStore:
+    """
+    Pick storage in a SQLite database indexed by file and receiver. It can be
+    shared by several threads or processes: each thread uses its own
+    connection, the database runs in write-ahead logging mode and writes are
+    done in immediate transactions so that concurrent writers wait for each
+    other instead of failing. The last write of a (file, receiver) pair wins.
+
+    Parameters
+    ----------
+    filename : str
+        Path to database file.
+    timeout : scalar, default 30.
+        Time to wait for a lock (in s).
+    """
+
+    def __init__(self, filename, timeout = 30.):
+        self._filename = filename
+        self._timeout = timeout
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS picks (
+                        filename TEXT NOT NULL,
+                        receiver INTEGER NOT NULL,
+                        time TEXT,
+                        idx REAL,
+                        sampling_rate REAL,
+                        shift REAL,
+                        phase_hint TEXT,
+                        uncertainty REAL,
+                        lower_uncertainty REAL,
+                        upper_uncertainty REAL,
+                        confidence_level REAL,
+                        user TEXT,
+                        updated REAL,
+                        PRIMARY KEY (filename, receiver))""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS geometry (
+                        filename TEXT NOT NULL,
+                        receiver INTEGER NOT NULL,
+                        %s,
+                        PRIMARY KEY (filename, receiver))"""
+                     % ",\n".join("%s REAL" % field for field in GEOMETRY_FIELDS))
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._filename, timeout = self._timeout, isolation_level = None)
+            self._local.conn = conn
+        return conn
+
+    def _write(self, *statements):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for query, rows in statements:
+                conn.executemany(query, rows)
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+    def set_pick(self, filename, receiver, pick, user = None):
+        """
+        Insert or replace a pick.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        receiver : int
+            Receiver index.
+        pick : Pick or None
+            Pick to store. If None, delete pick.
+        user : str or None, default None
+            Name of the operator.
+        """
+        self.set_picks(filename, { receiver: pick }, user)
+
+    def set_picks(self, filename, picks, user = None):
+        """
+        Insert, replace or delete several picks of a shot in one transaction.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        picks : dict or list
+            Picks (or None to delete) by receiver index.
+        user : str or None, default None
+            Name of the operator.
+        """
+        items = picks.items() if isinstance(picks, dict) else enumerate(picks)
+        now = time.time()
+        rows, deleted = [], []
+        for receiver, pick in items:
+            if pick is None:
+                deleted.append((filename, int(receiver)))
+            else:
+                d = pick_to_dict(pick)
+                rows.append((filename, int(receiver)) + tuple(d[col] for col in _COLUMNS) + (user, now))
+        query = "INSERT OR REPLACE INTO picks VALUES (%s)" % ", ".join([ "?" ] * (len(_COLUMNS) + 4))
+        self._write((query, rows),
+                    ("DELETE FROM picks WHERE filename = ? AND receiver = ?", deleted))
+
+    def delete_pick(self, filename, receiver):
+        """
+        Delete a pick.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        receiver : int
+            Receiver index.
+        """
+        self._write(("DELETE FROM picks WHERE filename = ? AND receiver = ?", [ (filename, int(receiver)) ]))
+
+    def get_picks(self, filename, nrcv = None):
+        """
+        Get picks of a shot.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        nrcv : int or None, default None
+            Number of receivers. If None, use highest picked receiver.
+
+        Returns
+        -------
+        picks : list
+            Pick (or None) of each receiver.
+        """
+        cursor = self._connect().execute("SELECT receiver, %s FROM picks WHERE filename = ?"
+                                         % ", ".join(_COLUMNS), (filename,))
+        rows = cursor.fetchall()
+        if nrcv is None:
+            nrcv = max([ row[0] for row in rows ]) + 1 if rows else 0
+        picks = [ None ] * nrcv
+        for row in rows:
+            if row[0] < nrcv:
+                picks[row[0]] = pick_from_dict(dict(zip(_COLUMNS, row[1:])))
+        return picks
+
+    def set_geometry(self, filename, geometry):
+        """
+        Store the geometry of all receivers of a shot.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        geometry : dict
+            Arrays of GEOMETRY_FIELDS (NaN if not available).
+        """
+        values = np.column_stack([ np.asarray(geometry[field], dtype = float) for field in GEOMETRY_FIELDS ])
+        rows = [ (filename, r) + tuple(None if np.isnan(v) else float(v) for v in row)
+                 for r, row in enumerate(values) ]
+        query = "INSERT OR REPLACE INTO geometry VALUES (%s)" % ", ".join([ "?" ] * (len(GEOMETRY_FIELDS) + 2))
+        self._write(("DELETE FROM geometry WHERE filename = ?", [ (filename,) ]), (query, rows))
+
+    def get_geometry(self, filename):
+        """
+        Get the geometry of all receivers of a shot.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+
+        Returns
+        -------
+        geometry : dict or None
+            Arrays of GEOMETRY_FIELDS (NaN if not available), None if the
+            geometry of the shot has not been stored.
+        """
+        cursor = self._connect().execute("SELECT %s FROM geometry WHERE filename = ? ORDER BY receiver"
+                                         % ", ".join(GEOMETRY_FIELDS), (filename,))
+        rows = cursor.fetchall()
+        if not rows:
+            return None
+        values = np.array(rows, dtype = float)
+        return dict((field, values[:,k]) for k, field in enumerate(GEOMETRY_FIELDS))
+
+    def counts(self):
+        """
+        Number of picks of each shot.
+
+        Returns
+        -------
+        counts : dict
+            Number of picks by shot filename.
+        """
+        cursor = self._connect().execute("SELECT filename, COUNT(*) FROM picks GROUP BY filename")
+        return dict(cursor.fetchall())
+
+    def close(self):
+        """
+        Close the connection of the calling thread.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @property
+    def filename(self):
+        """
+        str
+        Path to database file.
+        """
+        return self._filename
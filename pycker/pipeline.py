@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from obspy.signal.filter import lowpass, highpass
+from .memory import array_nbytes
+
+__all__ = [ "ProcessingPipeline", "filter_traces" ]
+
+
+def filter_traces(X, sampling_rate, lpcut = None, hpcut = None):
+    """
+    Lowpass and/or highpass filter all traces at once.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+    lpcut : scalar or None, default None
+        Lowpass cutoff frequency (in Hz). If None, no lowpass filter.
+    hpcut : scalar or None, default None
+        Highpass cutoff frequency (in Hz). If None, no highpass filter.
+
+    Returns
+    -------
+    Y : ndarray
+        Filtered seismic traces.
+    """
+    if lpcut is not None:
+        X = lowpass(X, lpcut, sampling_rate)
+    if hpcut is not None:
+        X = highpass(X, hpcut, sampling_rate)
+    return X
+
+
+class ProcessingPipeline:
+    """
+    Chain of processing stages applied to a raw gather. The output of each
+    stage is cached with the parameters it has been computed with, so that
+    only the first stage whose parameters changed and the following ones
+    are re-run.
+
+    A stage is a function taking the output of the previous stage as first
+    argument followed by its parameters, and must not modify its input in
+    place.
+    """
+
+    def __init__(self):
+        self._stages = []
+        self._cache = []
+        self._raw = None
+
+    def add_stage(self, name, func):
+        """
+        Append a processing stage.
+
+        Parameters
+        ----------
+        name : str
+            Stage name, used to pass parameters to run.
+        func : callable
+            Stage function.
+        """
+        if name in self.names:
+            raise ValueError("stage '%s' already exists" % name)
+        if not callable(func):
+            raise ValueError("func must be callable")
+        self._stages.append((name, func))
+        self._cache.append(None)
+
+    def set_input(self, X):
+        """
+        Set raw gather and invalidate all stages.
+
+        Parameters
+        ----------
+        X : ndarray
+            Raw seismic traces. Each row corresponds to a seismic record.
+        """
+        self._raw = X
+        self._cache = [ None ] * len(self._stages)
+
+    def run(self, **params):
+        """
+        Process raw gather.
+
+        Parameters
+        ----------
+        params : tuple or None
+            Parameters of each stage given by name. A stage without parameters
+            (or with None) is skipped.
+
+        Returns
+        -------
+        X : ndarray
+            Processed seismic traces. It may be shared with the pipeline cache
+            and must not be modified in place.
+        """
+        if self._raw is None:
+            raise ValueError("no input gather set")
+        X = self._raw
+        valid = True
+        for k, (name, func) in enumerate(self._stages):
+            p = params.get(name)
+            if valid and self._cache[k] is not None and self._cache[k][0] == p:
+                X = self._cache[k][1]
+            else:
+                valid = False
+                if p is not None:
+                    X = func(X, *p)
+                self._cache[k] = (p, X)
+        return X
+
+    def clear_cache(self):
+        """
+        Drop the outputs of all stages. Next run re-runs every stage.
+        """
+        self._cache = [ None ] * len(self._stages)
+
+    def downcast(self, dtype = np.float32):
+        """
+        Convert raw gather and stage outputs to a smaller floating point type.
+        Cached outputs stay valid.
+
+        Parameters
+        ----------
+        dtype : dtype, default np.float32
+            New data type.
+        """
+        converted = {}
+        def convert(X):
+            if id(X) not in converted:
+                converted[id(X)] = X.astype(dtype, copy = False)
+            return converted[id(X)]
+        if self._raw is not None:
+            self._raw = convert(self._raw)
+        self._cache = [ (c[0], convert(c[1])) if c is not None else None for c in self._cache ]
+
+    @property
+    def nbytes(self):
+        """
+        int
+        Bytes held by raw gather and stage outputs.
+        """
+        return array_nbytes([ self._raw, self.outputs ])
+
+    @property
+    def outputs(self):
+        """
+        list of ndarray
+        Cached outputs of the stages that have been run.
+        """
+        return [ c[1] for c in self._cache if c is not None ]
+
+    @property
+    def raw(self):
+        """
+        ndarray or None
+        Raw seismic traces.
+        """
+        return self._raw
+
+    @property
+    def names(self):
+        """
+        list of str
+        Stage names.
+        """
+        return [ name for name, _ in self._stages ]
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from .read_stream import StreamReader
+
+__all__ = [ "pick_samples", "pick_windows", "local_snr", "moveout_residual", "trace_qc", "survey_qc", "shot_summary", "QC_DTYPE", "SUMMARY_DTYPE" ]
+
+QC_DTYPE = np.dtype([ ("shot", np.int32), ("receiver", np.int32), ("rms", np.float32),
+                      ("peak", np.float32), ("snr", np.float32), ("residual", np.float32),
+                      ("dead", bool), ("clipped", bool), ("outlier", bool) ])
+
+SUMMARY_DTYPE = np.dtype([ ("shot", np.int32), ("ntr", np.int32), ("ndead", np.int32),
+                           ("nclipped", np.int32), ("npicks", np.int32), ("nlowsnr", np.int32),
+                           ("noutliers", np.int32), ("snr", np.float32), ("score", np.float32) ])
+
+
+def pick_samples(picks, nrcv, sampling_rate):
+    """
+    Convert picks of a shot to sample positions in the records.
+
+    Parameters
+    ----------
+    picks : list or None
+        Pick (or None) of each receiver.
+    nrcv : int
+        Number of receivers.
+    sampling_rate : scalar
+        Sampling rate of the records (in Hz).
+
+    Returns
+    -------
+    idx : ndarray
+        Pick position of each receiver (in samples), NaN if not picked.
+    """
+    idx = np.full(nrcv, np.nan)
+    if picks is not None:
+        for k, pick in enumerate(picks[:nrcv]):
+            if pick is not None and pick.index is not None:
+                pick = pick.resample(sampling_rate)
+                idx[k] = pick.index + (pick.shift or 0.)
+    return idx
+
+
+def pick_windows(X, idx, window):
+    """
+    Extract the samples around picks.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces (or characteristic functions). Each row corresponds to
+        a seismic record.
+    idx : ndarray
+        Pick position of each trace (in samples), NaN if not picked.
+    window : int
+        Number of samples extracted on each side of the picks.
+
+    Returns
+    -------
+    rows : ndarray
+        Indices of picked traces.
+    values : ndarray
+        Samples from window before to window after (excluded) the pick of
+        each picked trace, 0 outside the records.
+    inside : ndarray
+        True for samples inside the records.
+    """
+    npts = X.shape[1]
+    idx = np.asarray(idx, dtype = float)
+    picked = np.isfinite(idx) & (idx >= 0.) & (idx < npts)
+    rows = np.nonzero(picked)[0]
+    p = np.round(idx[picked]).astype(int)
+    cols = p[:,None] + np.arange(-window, window)[None,:]
+    inside = (cols >= 0) & (cols < npts)
+    values = X[rows[:,None], np.clip(cols, 0, npts-1)] * inside
+    return rows, values, inside
+
+
+def local_snr(X, idx, window = 50):
+    """
+    Signal-to-noise ratio around picks, computed as the RMS ratio of the
+    windows after (signal) and before (noise) each pick.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    idx : ndarray
+        Pick position of each trace (in samples), NaN if not picked.
+    window : int, default 50
+        Length of the noise and signal windows (in samples).
+
+    Returns
+    -------
+    snr : ndarray
+        Amplitude SNR of each trace, NaN if not picked.
+    """
+    rows, values, inside = pick_windows(X, idx, window)
+    noise = np.sqrt((values[:,:window]**2).sum(axis = 1) / np.maximum(inside[:,:window].sum(axis = 1), 1))
+    signal = np.sqrt((values[:,window:]**2).sum(axis = 1) / np.maximum(inside[:,window:].sum(axis = 1), 1))
+    snr = np.full(len(X), np.nan)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        snr[rows] = signal / noise
+    return snr
+
+
+def moveout_residual(x, t, half_width = 2, groups = None):
+    """
+    Residuals of picks to a smooth moveout. Each pick is compared to the
+    linear extrapolations of its half_width neighbours on either side, and
+    the smaller residual is kept. Extrapolations are exact for linear
+    moveouts, so that spread ends and the apex of V-shaped moveouts are not
+    biased as with a running median, and a single outlier only affects the
+    extrapolation from one side of its neighbours.
+
+    Parameters
+    ----------
+    x : ndarray
+        Position of each pick (e.g. offset or receiver index), sorted in
+        ascending order within each group.
+    t : ndarray
+        Time of each pick (NaN are not allowed).
+    half_width : int, default 2
+        Number of neighbours on each side (at least 2 for an extrapolation).
+    groups : ndarray or None, default None
+        Group (e.g. shot) of each pick, picks of a group must be contiguous.
+        Neighbours are taken within the same group.
+
+    Returns
+    -------
+    residual : ndarray
+        Time residual of each pick. Picks without 2 neighbours on either side
+        are compared to the interpolation between their nearest neighbours,
+        or to their only neighbour. NaN if a pick has no neighbour.
+    """
+    if not isinstance(half_width, int) or half_width < 1:
+        raise ValueError("half_width must be a positive integer")
+    x = np.asarray(x, dtype = float)
+    t = np.asarray(t, dtype = float)
+    n = len(t)
+    g = np.asarray(groups) if groups is not None else np.zeros(n, dtype = int)
+    idx = np.arange(n)
+    residual = np.full(n, np.nan)
+    nearest = []
+    for side in [ -1, 1 ]:
+        J = idx[:,None] + side * np.arange(1, half_width+1)[None,:]
+        Jc = J.clip(0, max(n-1, 0))
+        valid = (J >= 0) & (J < n) & (g[Jc] == g[:,None])
+        count = valid.sum(axis = 1)
+        nearest.append(np.where(valid[:,0], Jc[:,0], -1))
+
+        # Least-squares line through neighbours of this side
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            xm = np.where(valid, x[Jc], 0.).sum(axis = 1) / count
+            tm = np.where(valid, t[Jc], 0.).sum(axis = 1) / count
+            dx = np.where(valid, x[Jc] - xm[:,None], 0.)
+            dt = np.where(valid, t[Jc] - tm[:,None], 0.)
+            sxx = (dx**2).sum(axis = 1)
+            slope = np.where(sxx > 0., (dx*dt).sum(axis = 1) / sxx, 0.)
+        r = np.where(count >= 2, t - (tm + slope * (x - xm)), np.nan)
+        better = np.isnan(residual) | (np.abs(r) < np.abs(residual))
+        residual = np.where(better & np.isfinite(r), r, residual)
+
+    # Interpolation between nearest neighbours otherwise, or nearest
+    # neighbour if there is only one
+    left, right = nearest
+    interp = np.isnan(residual) & (left >= 0) & (right >= 0)
+    if interp.any():
+        l, r = left[interp], right[interp]
+        w = np.where(x[r] > x[l], (x[interp] - x[l]) / np.where(x[r] > x[l], x[r] - x[l], 1.), 0.5)
+        residual[interp] = t[interp] - (t[l] + w * (t[r] - t[l]))
+    single = np.isnan(residual) & ((left >= 0) | (right >= 0))
+    residual[single] = t[single] - t[np.maximum(left, right)[single]]
+    return residual
+
+
+def trace_qc(X, idx = None, sampling_rate = 1., window = 50, dead_ratio = 1e-3,
+             min_clipped = 3, half_width = 2, nmad = 3.):
+    """
+    Quality control metrics of all traces of a gather.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    idx : ndarray or None, default None
+        Pick position of each trace (in samples), NaN if not picked.
+    sampling_rate : scalar, default 1.
+        Sampling rate (in Hz). Residuals are given in seconds.
+    window : int, default 50
+        Length of the noise (before pick) and signal (after pick) windows used
+        for SNR (in samples).
+    dead_ratio : scalar, default 1e-3
+        Traces with RMS lower than dead_ratio times the median RMS of the
+        gather are flagged as dead.
+    min_clipped : int, default 3
+        Traces with at least min_clipped samples at their peak amplitude are
+        flagged as clipped.
+    half_width : int, default 2
+        Number of picked neighbours on each side used as reference for pick
+        residuals (see moveout_residual).
+    nmad : scalar, default 3.
+        Picks with residual greater than nmad scaled median absolute
+        deviations are flagged as outliers.
+
+    Returns
+    -------
+    table : ndarray
+        QC table with dtype QC_DTYPE (shot index is set to 0).
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    if not isinstance(window, int) or window < 1:
+        raise ValueError("window must be a positive integer")
+    nrcv, npts = X.shape
+    table = np.zeros(nrcv, dtype = QC_DTYPE)
+    table["receiver"] = np.arange(nrcv)
+
+    absX = np.abs(X)
+    rms = np.sqrt(np.mean(X**2, axis = 1))
+    peak = absX.max(axis = 1)
+    table["rms"] = rms
+    table["peak"] = peak
+    table["dead"] = (peak == 0.) | (rms < dead_ratio * np.median(rms))
+    table["clipped"] = (peak > 0.) & ((absX >= peak[:,None] * (1. - 1e-6)).sum(axis = 1) >= min_clipped)
+
+    table["snr"] = np.nan
+    table["residual"] = np.nan
+    if idx is not None:
+        idx = np.asarray(idx, dtype = float)
+        picked = np.isfinite(idx) & (idx >= 0.) & (idx < npts)
+        if picked.any():
+            with np.errstate(divide = "ignore"):
+                table["snr"] = 20. * np.log10(local_snr(X, idx, window))
+
+            rows = np.nonzero(picked)[0]
+            residual = np.full(nrcv, np.nan)
+            residual[rows] = moveout_residual(rows, idx[rows] / sampling_rate, half_width)
+            table["residual"] = residual
+            finite = np.isfinite(residual)
+            if finite.sum() > 2:
+                mad = 1.4826 * np.median(np.abs(residual[finite] - np.median(residual[finite])))
+                scale = max(mad, 1. / sampling_rate)
+                table["outlier"][finite] = np.abs(residual[finite]) > nmad * scale
+    return table
+
+
+def survey_qc(filenames, picks = None, nproc = None, **kwargs):
+    """
+    Quality control metrics of all traces of a survey. Files are decoded by a
+    pool of worker processes (see StreamReader.read_many).
+
+    Parameters
+    ----------
+    filenames : list of str
+        Paths to stream files.
+    picks : list or None, default None
+        Picks of each file (list of Pick or None for each receiver).
+    nproc : int or None, default None
+        Number of worker processes. If None, use all available CPUs.
+    kwargs : dict
+        Keyword arguments passed to trace_qc.
+
+    Returns
+    -------
+    table : ndarray
+        QC table with dtype QC_DTYPE. Shot indices refer to filenames.
+    """
+    if not isinstance(filenames, (list, tuple)):
+        raise ValueError("filenames must be a list of str")
+    if picks is not None and len(picks) != len(filenames):
+        raise ValueError("picks must have the same length as filenames")
+    if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+        raise ValueError("nproc must be a positive integer")
+    if len(filenames) == 0:
+        return np.zeros(0, dtype = QC_DTYPE)
+    picks = picks if picks is not None else [ None ] * len(filenames)
+    tables = []
+    shots = StreamReader().read_many(filenames, nproc, detrend = True)
+    for k, ((_, X, header), p) in enumerate(zip(shots, picks)):
+        fs = header["sampling_rate"]
+        table = trace_qc(X, pick_samples(p, len(X), fs), fs, **kwargs)
+        table["shot"] = k
+        tables.append(table)
+    return np.concatenate(tables)
+
+
+def shot_summary(table, nshot = None, snr_min = 6.):
+    """
+    Summarize a QC table by shot.
+
+    Parameters
+    ----------
+    table : ndarray
+        QC table with dtype QC_DTYPE.
+    nshot : int or None, default None
+        Number of shots. If None, use highest shot index.
+    snr_min : scalar, default 6.
+        Picks with SNR lower than snr_min (in dB) are counted as low SNR.
+
+    Returns
+    -------
+    summary : ndarray
+        Summary table with dtype SUMMARY_DTYPE. Score is the fraction of
+        flagged traces (higher is worse).
+    """
+    nshot = nshot if nshot is not None else (table["shot"].max() + 1 if len(table) else 0)
+    shot = table["shot"]
+    picked = np.isfinite(table["residual"])
+    lowsnr = np.isfinite(table["snr"]) & (table["snr"] < snr_min)
+    flagged = table["dead"] | table["clipped"] | table["outlier"] | lowsnr
+    summary = np.zeros(nshot, dtype = SUMMARY_DTYPE)
+    summary["shot"] = np.arange(nshot)
+    summary["ntr"] = np.bincount(shot, minlength = nshot)
+    summary["ndead"] = np.bincount(shot, table["dead"], minlength = nshot)
+    summary["nclipped"] = np.bincount(shot, table["clipped"], minlength = nshot)
+    summary["npicks"] = np.bincount(shot, picked, minlength = nshot)
+    summary["nlowsnr"] = np.bincount(shot, lowsnr, minlength = nshot)
+    summary["noutliers"] = np.bincount(shot, table["outlier"], minlength = nshot)
+    finite = np.isfinite(table["snr"])
+    snr = np.where(finite, table["snr"], 0.)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        summary["snr"] = np.bincount(shot, snr, minlength = nshot) / np.bincount(shot, finite, minlength = nshot)
+        summary["score"] = np.bincount(shot, flagged, minlength = nshot) / summary["ntr"]
+    return summary
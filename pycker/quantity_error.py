@@ -7,10 +7,10 @@ License: MIT
 
 import numpy as np
 
-__all__ = [ "QuantityError" ]
+__all__ = [ "QuantityError", "QuantityErrorArray" ]
 
 
-class QuantityError:
+class QuantityError(object):
     """
     Uncertainty information for a physical quantity.
     
@@ -31,6 +31,8 @@ class QuantityError:
     
     _ATTRIBUTES = [ "uncertainty", "lower_uncertainty", "upper_uncertainty", "confidence_level" ]
     
+    __slots__ = [ "_" + attr for attr in _ATTRIBUTES ]
+    
     def __init__(self, uncertainty = None, lower_uncertainty = None,
                  upper_uncertainty = None, confidence_level = None):
         if uncertainty is not None and (not isinstance(uncertainty, (int, float)) or uncertainty < 0.):
@@ -56,6 +58,16 @@ class QuantityError:
         if self._lower_uncertainty is not None and self._upper_uncertainty is not None:
             uncertainty += ", lower: %s, upper: %s" % (self._print_attr("lower_uncertainty"), self._print_attr("upper_uncertainty"))
         return "QuantityError(%s)" % uncertainty
+    
+    def __getstate__(self):
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+    
+    def __setstate__(self, state):
+        # Instances pickled before slots were introduced have a dict state
+        if isinstance(state, tuple):
+            state = state[1]
+        for slot in self.__slots__:
+            setattr(self, slot, state.get(slot))
             
     def _print_attr(self, attr):
         if attr not in self._ATTRIBUTES:
@@ -130,4 +142,190 @@ class QuantityError:
     
     @confidence_level.setter
     def confidence_level(self, value):
-        self._confidence_level = value
\ No newline at end of file
+        self._confidence_level = value
+
+
+class QuantityErrorArray:
+    """
+    Uncertainty information for many values of a physical quantity, stored
+    in a float array (one row per value, one column per attribute). Missing
+    values are NaN.
+    
+    Parameters
+    ----------
+    uncertainty : array_like, scalar or None, default None
+        Uncertainty as the absolute value of symmetric deviation from the main
+        value.
+    lower_uncertainty : array_like, scalar or None, default None
+        Uncertainty as the absolute value of deviation from the main value
+        towards smaller values.
+    upper_uncertainty : array_like, scalar or None, default None
+        Uncertainty as the absolute value of deviation from the main value
+        towards larger values.
+    confidence_level : array_like, scalar or None, default None
+        Confidence level of the uncertainty, given in percent (0-100).
+    size : int or None, default None
+        Number of values. If None, infer it from the other parameters (at
+        least one must be an array unless all are None).
+    """
+    
+    _ATTRIBUTES = QuantityError._ATTRIBUTES
+    
+    def __init__(self, uncertainty = None, lower_uncertainty = None,
+                 upper_uncertainty = None, confidence_level = None, size = None):
+        values = [ uncertainty, lower_uncertainty, upper_uncertainty, confidence_level ]
+        if size is None:
+            sizes = [ np.size(v) for v in values if v is not None and np.ndim(v) > 0 ]
+            if not sizes and any(v is not None for v in values):
+                raise ValueError("size must be given if all values are scalars")
+            size = sizes[0] if sizes else 0
+        if not isinstance(size, (int, np.integer)) or size < 0:
+            raise ValueError("size must be a positive integer")
+        self._data = np.full((size, len(self._ATTRIBUTES)), np.nan)
+        for k, attr in enumerate(self._ATTRIBUTES):
+            if values[k] is not None:
+                self._set_column(attr, values[k])
+                
+    def __repr__(self):
+        return "QuantityErrorArray(size: %d, uncertainty: %s)" % (len(self), self.uncertainty)
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            row = self._data[key]
+            return QuantityError(*[ float(v) if np.isfinite(v) else None for v in row ])
+        else:
+            return self.fromarray(self._data[key])
+        
+    def __setitem__(self, key, value):
+        if isinstance(value, QuantityError):
+            value = value.toarray()
+        elif isinstance(value, QuantityErrorArray):
+            value = value.toarray()
+        self._data[key] = np.array(value, dtype = float)
+        
+    def _set_column(self, attr, value):
+        value = np.array(value, dtype = float)
+        finite = value[np.isfinite(value)]
+        if attr == "uncertainty" and np.any(finite < 0.):
+            raise ValueError("uncertainty must be positive")
+        if attr == "confidence_level" and np.any((finite < 0.) | (finite > 100.)):
+            raise ValueError("confidence_level must be in [ 0., 100. ]")
+        try:
+            self._data[:,self._ATTRIBUTES.index(attr)] = value
+        except ValueError:
+            raise ValueError("%s must be a scalar or an array of size %d" % (attr, len(self)))
+    
+    @classmethod
+    def fromarray(cls, arr):
+        """
+        Create from array.
+        
+        Parameters
+        ----------
+        arr : ndarray
+            Input array of shape (size, 4) as returned by toarray.
+        
+        Returns
+        -------
+        errors : QuantityErrorArray
+            Uncertainties.
+        """
+        arr = np.asarray(arr, dtype = float)
+        if arr.ndim != 2 or arr.shape[1] != len(cls._ATTRIBUTES):
+            raise ValueError("arr must be a 2-D array with %d columns" % len(cls._ATTRIBUTES))
+        return cls(*arr.T)
+    
+    @classmethod
+    def fromlist(cls, errors):
+        """
+        Create from a list of QuantityError.
+        
+        Parameters
+        ----------
+        errors : list
+            QuantityError (or None) of each value.
+        
+        Returns
+        -------
+        errors : QuantityErrorArray
+            Uncertainties.
+        """
+        arr = np.array([ e.toarray() if e is not None else [ None ] * len(cls._ATTRIBUTES)
+                         for e in errors ], dtype = float)
+        return cls.fromarray(arr.reshape((len(errors), len(cls._ATTRIBUTES))))
+    
+    def tolist(self):
+        """
+        Convert to a list of QuantityError.
+        
+        Returns
+        -------
+        errors : list
+            QuantityError of each value.
+        """
+        return [ self[k] for k in range(len(self)) ]
+        
+    def toarray(self):
+        """
+        Save attributes to array.
+        
+        Returns
+        -------
+        arr : ndarray
+            Output array of shape (size, 4).
+        """
+        return self._data.copy()
+    
+    @property
+    def uncertainty(self):
+        """
+        ndarray
+        Uncertainty as the absolute value of symmetric deviation from the main
+        value.
+        """
+        return self._data[:,0]
+    
+    @uncertainty.setter
+    def uncertainty(self, value):
+        self._set_column("uncertainty", value)
+        
+    @property
+    def lower_uncertainty(self):
+        """
+        ndarray
+        Uncertainty as the absolute value of deviation from the main value
+        towards smaller values.
+        """
+        return self._data[:,1]
+    
+    @lower_uncertainty.setter
+    def lower_uncertainty(self, value):
+        self._set_column("lower_uncertainty", value)
+        
+    @property
+    def upper_uncertainty(self):
+        """
+        ndarray
+        Uncertainty as the absolute value of deviation from the main value
+        towards larger values.
+        """
+        return self._data[:,2]
+    
+    @upper_uncertainty.setter
+    def upper_uncertainty(self, value):
+        self._set_column("upper_uncertainty", value)
+        
+    @property
+    def confidence_level(self):
+        """
+        ndarray
+        Confidence level of the uncertainty, given in percent (0-100).
+        """
+        return self._data[:,3]
+    
+    @confidence_level.setter
+    def confidence_level(self, value):
+        self._set_column("confidence_level", value)
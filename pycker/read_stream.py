@@ -6,9 +6,101 @@ License: MIT
 """
 
 import os
+import numpy as np
+from multiprocessing import Pool, cpu_count
 from obspy import read
 
-__all__ = [ "StreamReader" ]
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+__all__ = [ "StreamReader", "pool_map" ]
+
+# ObsPy format of each file extension
+_OBSPY_FORMATS = { "miniseed": "MSEED", "mseed": "MSEED", "reftek": "REFTEK130", "sac": "SAC",
+                   "seg2": "SEG2", "sg2": "SEG2", "segy": "SEGY", "sgy": "SEGY", "su": "SU" }
+
+
+def pool_map(func, iterable, nproc = None):
+    """
+    Apply a function to all items in a pool of worker processes.
+
+    Parameters
+    ----------
+    func : callable
+        Function (picklable) applied to each item.
+    iterable : iterable
+        Items.
+    nproc : int or None, default None
+        Number of worker processes. If None, use all available CPUs. If 1,
+        items are processed in the calling process.
+
+    Returns
+    -------
+    results : list
+        Result of each item, in input order.
+    """
+    if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+        raise ValueError("nproc must be a positive integer")
+    items = list(iterable)
+    nproc = min(nproc or cpu_count(), max(len(items), 1))
+    if nproc > 1:
+        pool = Pool(nproc)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        return list(map(func, items))
+
+
+def _read_headers(filename):
+    return StreamReader().read_file(filename, headonly = True)
+
+
+def _decode_shot(args):
+    filename, detrend, dtype, shm = args
+    st = StreamReader().read_file(filename)
+    npts = np.array([ tr.stats.npts for tr in st.traces ])
+    header = { "sampling_rate": st[0].stats.sampling_rate,
+               "starttime": st[0].stats.starttime,
+               "npts": npts }
+    shape = (len(st), npts.max())
+    if shm:
+        # Traces are written once into shared memory, only its name is pickled
+        buf = shared_memory.SharedMemory(create = True, size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1))
+        X = np.ndarray(shape, dtype = dtype, buffer = buf.buf)
+    else:
+        X = np.empty(shape, dtype = dtype)
+    for i, tr in enumerate(st.traces):
+        X[i,:npts[i]] = tr.data
+        X[i,npts[i]:] = 0.
+    if detrend:
+        X -= (X.sum(axis = 1) / np.maximum(npts, 1))[:,None]
+        X[np.arange(shape[1]) >= npts[:,None]] = 0.
+    if shm:
+        del X
+        buf.close()
+        return header, (buf.name, shape)
+    else:
+        return header, X
+
+
+def _attach_shot(result, dtype):
+    # Copy traces out of shared memory and release it
+    header, data = result
+    if isinstance(data, np.ndarray):
+        return header, data
+    name, shape = data
+    buf = shared_memory.SharedMemory(name = name)
+    try:
+        X = np.ndarray(shape, dtype = dtype, buffer = buf.buf).copy()
+    finally:
+        buf.close()
+        buf.unlink()
+    return header, X
 
 
 class StreamReader:
@@ -63,7 +155,7 @@ class StreamReader:
                 file_list.append(filename)
         return file_list
     
-    def read_file(self, filename):
+    def read_file(self, filename, headonly = False):
         """
         Read file.
         
@@ -71,6 +163,8 @@ class StreamReader:
         ----------
         filename : str
             Path to file.
+        headonly : bool, default False
+            Read only the headers (traces contain no data).
             
         Returns
         -------
@@ -78,16 +172,132 @@ class StreamReader:
             List of Trace objects.
         """
         ext = os.path.splitext(filename)[1][1:].lower()
-        if ext in [ "miniseed", "mseed" ]:
-            st = read(filename, format = "MSEED")
-        elif ext == "reftek":
-            st = read(filename, format = "REFTEK130")
-        elif ext == "sac":
-            st = read(filename, format = "SAC")
-        elif ext in [ "seg2", "sg2" ]:
-            st = read(filename, format = "SEG2")
-        elif ext in [ "segy", "sgy" ]:
-            st = read(filename, format = "SEGY")
-        elif ext == "su":
-            st = read(filename, format = "SU")
-        return st
\ No newline at end of file
+        if ext not in _OBSPY_FORMATS:
+            raise ValueError("unsupported file format '%s'" % ext)
+        return read(filename, format = _OBSPY_FORMATS[ext], headonly = headonly)
+    
+    def read_traces(self, filename, detrend = False, dtype = np.float64):
+        """
+        Read file into an array.
+        
+        Parameters
+        ----------
+        filename : str
+            Path to file.
+        detrend : bool, default False
+            Remove the mean of each trace.
+        dtype : data-type, default np.float64
+            Data type of traces.
+            
+        Returns
+        -------
+        X : ndarray
+            Seismic traces. Each row corresponds to a seismic record,
+            shorter traces are padded with zeros.
+        header : dict
+            Sampling rate (in Hz), start time (UTCDateTime) of first trace
+            and number of samples of each trace (ndarray).
+        """
+        header, X = _decode_shot((filename, detrend, np.dtype(dtype), False))
+        return X, header
+    
+    def read_headers(self, filenames, nproc = None):
+        """
+        Read headers of files in a pool of worker processes.
+        
+        Parameters
+        ----------
+        filenames : list of str
+            Paths to files.
+        nproc : int or None, default None
+            Number of worker processes. If None, use all available CPUs. If
+            1, files are read in the calling process.
+            
+        Returns
+        -------
+        streams : list of Stream
+            Traces (with no data) of each file, in input order.
+        """
+        return pool_map(_read_headers, filenames, nproc)
+    
+    def read_many(self, filenames, nproc = None, ordered = True, maxsize = None,
+                  detrend = False, dtype = np.float64):
+        """
+        Decode files in a pool of worker processes. Traces are transferred
+        through shared memory (when available) instead of being pickled, and
+        at most maxsize files are decoded ahead of the consumer so that
+        memory use does not depend on the number of files.
+        
+        Parameters
+        ----------
+        filenames : list of str
+            Paths to files.
+        nproc : int or None, default None
+            Number of worker processes. If None, use all available CPUs. If
+            1, files are decoded in the calling process.
+        ordered : bool, default True
+            If True, yield files in input order, otherwise as they are
+            decoded.
+        maxsize : int or None, default None
+            Maximum number of files decoded but not consumed yet. If None,
+            twice the number of worker processes.
+        detrend : bool, default False
+            Remove the mean of each trace.
+        dtype : data-type, default np.float64
+            Data type of traces.
+            
+        Yields
+        ------
+        filename : str
+            Path to file.
+        X : ndarray
+            Seismic traces. Each row corresponds to a seismic record,
+            shorter traces are padded with zeros.
+        header : dict
+            Sampling rate (in Hz), start time (UTCDateTime) of first trace
+            and number of samples of each trace (ndarray).
+        """
+        if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+            raise ValueError("nproc must be a positive integer")
+        if maxsize is not None and (not isinstance(maxsize, int) or maxsize < 1):
+            raise ValueError("maxsize must be a positive integer")
+        filenames = list(filenames)
+        nproc = min(nproc or cpu_count(), max(len(filenames), 1))
+        maxsize = maxsize or 2 * nproc
+        dtype = np.dtype(dtype)
+        if nproc == 1:
+            for filename in filenames:
+                header, X = _decode_shot((filename, detrend, dtype, False))
+                yield filename, X, header
+            return
+        
+        shm = shared_memory is not None
+        if shm:
+            # Workers must share the tracker of the process releasing the memory
+            resource_tracker.ensure_running()
+        pool = Pool(nproc)
+        pending = []
+        try:
+            for k, filename in enumerate(filenames):
+                pending.append((filename, pool.apply_async(_decode_shot, ((filename, detrend, dtype, shm),))))
+                while len(pending) >= maxsize or (pending and k == len(filenames) - 1):
+                    filename, result = pending.pop(self._next_ready(pending, ordered))
+                    header, X = _attach_shot(result.get(), dtype)
+                    yield filename, X, header
+        finally:
+            pool.terminate()
+            pool.join()
+            # Release shared memory of files decoded but not consumed
+            for _, result in pending:
+                if shm and result.ready() and result.successful():
+                    _attach_shot(result.get(), dtype)
+    
+    @staticmethod
+    def _next_ready(pending, ordered):
+        if ordered:
+            return 0
+        while True:
+            for k, (_, result) in enumerate(pending):
+                if result.ready():
+                    return k
+            pending[0][1].wait(0.01)
\ No newline at end of file
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+"""
+Headless QC report of all shots of a directory (PNG thumbnails and HTML
+index page).
+
+Usage:
+    python -m pycker.report dirname [-o output] [-p picks] [-n nproc]
+
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os, json, hashlib, pickle
+import numpy as np
+from .read_stream import StreamReader, pool_map
+from .wiggle import wiggle
+from .qc import pick_samples
+from .pick_store import PickStore, pick_to_dict
+from .server import STORE_NAME
+
+try:
+    from html import escape
+except ImportError:
+    from cgi import escape
+try:
+    from urllib.parse import quote
+except ImportError:
+    from urllib import quote
+
+__all__ = [ "render_report", "REPORT_NAME" ]
+
+REPORT_NAME = "pycker_report"
+
+
+def _render_shot(args):
+    # Errors are returned so that one unreadable shot does not abort the report
+    try:
+        return _render(args) + (None,)
+    except Exception as e:
+        return None, None, "%s: %s" % (type(e).__name__, e)
+
+
+def _render(args):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    filename, path, picks, params = args
+    X, header = StreamReader().read_traces(filename, detrend = True)
+    fs = header["sampling_rate"]
+    fig = Figure(figsize = params["figsize"], facecolor = "white", dpi = params["dpi"])
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    wiggle(X, perc = params["perc"], fill = params["fill"], axes = ax)
+    idx = pick_samples(picks, len(X), fs)
+    for k in np.nonzero(np.isfinite(idx))[0]:
+        ax.plot([ k+0.5, k+1.5 ], [ idx[k], idx[k] ], color = "red", linewidth = 1.)
+    ax.set_ylabel("Time (samples)")
+    ax.set_title(os.path.basename(filename), fontsize = 8)
+    fig.tight_layout()
+    fig.savefig(path)
+    return len(X), int(np.isfinite(idx).sum())
+
+
+def _shot_key(filename, picks, params):
+    stat = os.stat(filename)
+    picks = [ pick_to_dict(pick) if pick is not None else None for pick in picks ] \
+            if picks is not None else None
+    data = json.dumps([ stat.st_size, stat.st_mtime, picks, params ], sort_keys = True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def _write_index(output, dirname, shots):
+    lines = [ "<!DOCTYPE html>",
+              "<html>",
+              "<head>",
+              "<meta charset=\"utf-8\">",
+              "<title>Pycker report - %s</title>" % escape(dirname),
+              "<style>",
+              "body { font-family: Helvetica, sans-serif; font-size: 12px; }",
+              "figure { display: inline-block; margin: 4px; text-align: center; }",
+              "img { width: 320px; border: 1px solid #ccc; }",
+              "</style>",
+              "</head>",
+              "<body>",
+              "<h1>%s</h1>" % escape(dirname),
+              "<p>%d shots, %d picks</p>" % (len(shots), sum(shot["npicks"] for shot in shots if "error" not in shot)) ]
+    failed = [ shot for shot in shots if "error" in shot ]
+    if failed:
+        lines += [ "<h2>%d shots could not be rendered</h2>" % len(failed), "<ul>" ]
+        lines += [ "<li>%s: %s</li>" % (escape(shot["filename"]), escape(shot["error"])) for shot in failed ]
+        lines += [ "</ul>" ]
+    for shot in shots:
+        if "error" in shot:
+            continue
+        png = escape(quote(shot["png"]), quote = True)
+        lines += [ "<figure>",
+                   "<a href=\"%s\"><img src=\"%s\" loading=\"lazy\"></a>" % (png, png),
+                   "<figcaption>%s (%d/%d picks)</figcaption>"
+                   % (escape(shot["filename"]), shot["npicks"], shot["ntr"]),
+                   "</figure>" ]
+    lines += [ "</body>", "</html>" ]
+    with open(os.path.join(output, "index.html"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def render_report(dirname, picks = None, output = None, nproc = None,
+                  figsize = (6, 4), dpi = 80, perc = 0.98, fill = True):
+    """
+    Render all shots of a directory with their picks to PNG images with the
+    Agg backend by a pool of worker processes, and write an HTML index page.
+    Images are named after the shot files, and shots whose data, picks and
+    rendering parameters did not change since last run are not rendered
+    again. Shots that cannot be rendered are listed in the index page.
+
+    Parameters
+    ----------
+    dirname : str
+        Path to directory containing stream files.
+    picks : list, str or None, default None
+        Picks of each file (as exported by Pycker Viewer), or path to a pick
+        pickle file or pick database. If None, use 'pycker_picks.db' in
+        dirname if it exists.
+    output : str or None, default None
+        Output directory. If None, use 'pycker_report' in dirname.
+    nproc : int or None, default None
+        Number of worker processes. If None, use all available CPUs.
+    figsize : tuple, default (6, 4)
+        Image width and height (in inches).
+    dpi : int, default 80
+        Image resolution.
+    perc : scalar, default 0.98
+        Maximum amplitude percentile for clipping.
+    fill : bool, default True
+        Fill with black positive lobes.
+
+    Returns
+    -------
+    nrender : int
+        Number of shots rendered (others were up to date or failed).
+    """
+    if not os.path.isdir(dirname):
+        raise ValueError("dirname must be an existing directory")
+    if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+        raise ValueError("nproc must be a positive integer")
+    dirname = os.path.join(dirname, "")
+    output = output if output is not None else dirname + REPORT_NAME
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    filenames = StreamReader().read_dir(dirname)
+
+    if picks is None and os.path.isfile(dirname + STORE_NAME):
+        picks = dirname + STORE_NAME
+    if isinstance(picks, str):
+        if picks.endswith(".pickle"):
+            with open(picks, "rb") as f:
+                picks = pickle.load(f)
+        else:
+            store = PickStore(picks)
+            picks = [ store.get_picks(filename) or None for filename in filenames ]
+            store.close()
+    if picks is None:
+        picks = [ None ] * len(filenames)
+    if len(picks) != len(filenames):
+        raise ValueError("picks must have the same length as the number of files")
+
+    manifest_path = os.path.join(output, "manifest.json")
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    else:
+        manifest = {}
+
+    params = { "figsize": list(figsize), "dpi": dpi, "perc": perc, "fill": fill }
+    shots, jobs = [], []
+    for k, (filename, p) in enumerate(zip(filenames, picks)):
+        png = filename + ".png"
+        try:
+            key = _shot_key(dirname + filename, p, params)
+        except OSError as e:
+            shots.append({ "filename": filename, "png": png, "key": None, "error": str(e) })
+            continue
+        entry = manifest.get(filename)
+        if entry is not None and "error" not in entry and entry["key"] == key and entry["png"] == png \
+            and os.path.isfile(os.path.join(output, png)):
+            shots.append(entry)
+        else:
+            shots.append({ "filename": filename, "png": png, "key": key })
+            jobs.append((k, (dirname + filename, os.path.join(output, png), p, params)))
+
+    if jobs:
+        counts = pool_map(_render_shot, [ job for _, job in jobs ], nproc)
+        for (k, _), (ntr, npicks, error) in zip(jobs, counts):
+            if error is None:
+                shots[k]["ntr"], shots[k]["npicks"] = ntr, npicks
+            else:
+                shots[k]["error"] = error
+
+    # Remove images of shots no longer in directory (or from older naming)
+    pngs = set(shot["png"] for shot in shots)
+    for entry in manifest.values():
+        if entry["png"] not in pngs and os.path.isfile(os.path.join(output, entry["png"])):
+            os.remove(os.path.join(output, entry["png"]))
+
+    with open(manifest_path, "w") as f:
+        json.dump(dict((shot["filename"], shot) for shot in shots), f, indent = 1)
+    _write_index(output, dirname, shots)
+    return sum(1 for k, _ in jobs if "error" not in shots[k])
+
+
+def main():
+    """
+    Render a QC report from the command line.
+    """
+    import argparse, matplotlib
+    matplotlib.use("Agg")
+    parser = argparse.ArgumentParser(description = "Render all shots of a directory to PNG images and an HTML index page.")
+    parser.add_argument("dirname", help = "directory containing stream files")
+    parser.add_argument("-o", "--output", default = None, help = "output directory")
+    parser.add_argument("-p", "--picks", default = None, help = "pick pickle file or database")
+    parser.add_argument("-n", "--nproc", type = int, default = None, help = "number of worker processes")
+    args = parser.parse_args()
+    nrender = render_report(args.dirname, args.picks, args.output, args.nproc)
+    print("%d shots rendered" % nrender)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from fractions import Fraction
+from scipy.signal import firwin, resample_poly
+
+__all__ = [ "rate_ratio", "resample" ]
+
+_FILTERS = {}
+
+
+def rate_ratio(sampling_rate, target_rate, max_denominator = 1000):
+    """
+    Rational approximation of the ratio between two sampling rates.
+
+    Parameters
+    ----------
+    sampling_rate : scalar
+        Original sampling rate (in Hz).
+    target_rate : scalar
+        Target sampling rate (in Hz).
+    max_denominator : int, default 1000
+        Maximum denominator of the ratio.
+
+    Returns
+    -------
+    up : int
+        Upsampling factor.
+    down : int
+        Downsampling factor.
+    """
+    if not isinstance(sampling_rate, (int, float)) or sampling_rate <= 0.:
+        raise ValueError("sampling_rate must be a positive scalar")
+    if not isinstance(target_rate, (int, float)) or target_rate <= 0.:
+        raise ValueError("target_rate must be a positive scalar")
+    ratio = Fraction(target_rate / sampling_rate).limit_denominator(max_denominator)
+    if ratio == 0:
+        raise ValueError("target_rate is too small compared to sampling_rate")
+    return ratio.numerator, ratio.denominator
+
+
+def _design_filter(up, down):
+    if (up, down) not in _FILTERS:
+        max_rate = max(up, down)
+        _FILTERS[(up, down)] = firwin(20 * max_rate + 1, 1. / max_rate, window = ("kaiser", 5.0))
+    return _FILTERS[(up, down)]
+
+
+def resample(X, sampling_rate, target_rate, max_denominator = 1000):
+    """
+    Resample all traces at once using polyphase filtering. The anti-aliasing
+    filter is designed once per rate ratio and cached.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    sampling_rate : scalar
+        Original sampling rate (in Hz).
+    target_rate : scalar
+        Target sampling rate (in Hz). Actual sampling rate is
+        sampling_rate * up / down (see rate_ratio).
+    max_denominator : int, default 1000
+        Maximum denominator of the rate ratio.
+
+    Returns
+    -------
+    Y : ndarray
+        Resampled seismic traces.
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    up, down = rate_ratio(sampling_rate, target_rate, max_denominator)
+    if up == down:
+        return X
+    return resample_poly(X, up, down, axis = -1, window = _design_filter(up, down))
@@ -0,0 +1,486 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local multi-user picking service.
+
+Usage:
+    python -m pycker.server dirname [--host host] [--port port] [--store store]
+                                    [--watch interval] [--autopick]
+
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os, io, json, threading
+import numpy as np
+from collections import OrderedDict
+from obspy.core.utcdatetime import UTCDateTime
+from .read_stream import StreamReader
+from .data_cube import DataCube, CUBE_NAME
+from .pick_store import PickStore, pick_to_dict, pick_from_dict
+from .headers import read_geometry, GEOMETRY_FIELDS
+from .watch import FolderWatcher
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import quote, unquote, urlparse, parse_qs
+    from urllib.request import Request, urlopen
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import quote, unquote
+    from urlparse import urlparse, parse_qs
+    from urllib2 import Request, urlopen
+
+__all__ = [ "PickServer", "PickClient", "STORE_NAME" ]
+
+STORE_NAME = "pycker_picks.db"
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [ unquote(part) for part in url.path.strip("/").split("/") ]
+        return parts, parse_qs(url.query)
+
+    def _send(self, body, content_type = "application/json", headers = {}):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _filename(self, parts):
+        if len(parts) < 2 or parts[1] not in self.server.service:
+            self.send_error(404, "unknown file")
+            return None
+        return parts[1]
+
+    def do_GET(self):
+        service = self.server.service
+        parts, query = self._route()
+        if parts == [ "files" ]:
+            self._send({ "filenames": service.filenames, "counts": service.store.counts() })
+        elif parts[0] == "gather":
+            filename = self._filename(parts)
+            if filename is not None:
+                body, sampling_rate, starttime = service.gather(filename)
+                self._send(body, "application/octet-stream",
+                           { "X-Sampling-Rate": repr(sampling_rate), "X-Starttime": str(starttime) })
+        elif parts[0] == "geometry":
+            filename = self._filename(parts)
+            if filename is not None:
+                geometry = service.geometry(filename)
+                self._send(dict((field, [ None if np.isnan(v) else float(v) for v in geometry[field] ])
+                                for field in GEOMETRY_FIELDS))
+        elif parts[0] == "picks":
+            filename = self._filename(parts)
+            if filename is not None:
+                nrcv = int(query["nrcv"][0]) if "nrcv" in query else None
+                picks = service.store.get_picks(filename, nrcv)
+                self._send({ "picks": [ pick_to_dict(pick) if pick is not None else None for pick in picks ] })
+        else:
+            self.send_error(404)
+
+    def do_PUT(self):
+        service = self.server.service
+        parts, _ = self._route()
+        if parts[0] == "picks":
+            filename = self._filename(parts)
+            if filename is not None:
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    data = json.loads(self.rfile.read(length).decode("utf-8"))
+                    picks = dict((int(k), pick_from_dict(v) if v is not None else None)
+                                 for k, v in data["picks"].items())
+                except (ValueError, KeyError, TypeError) as e:
+                    self.send_error(400, str(e))
+                else:
+                    service.store.set_picks(filename, picks, data.get("user"))
+                    self._send({ "updated": len(picks) })
+        else:
+            self.send_error(404)
+
+
+class PickServer:
+    """
+    HTTP picking service serving the gathers of a directory and storing the
+    picks sent by several clients in a shared PickStore. Requests are
+    handled concurrently, decoded gathers are cached.
+
+    Parameters
+    ----------
+    dirname : str
+        Path to directory containing stream files.
+    store : str or None, default None
+        Path to pick database. If None, use 'pycker_picks.db' in dirname.
+    host : str, default "127.0.0.1"
+        Host name or address to listen on.
+    port : int, default 8765
+        Port to listen on (0 for any free port).
+    cache_size : int, default 16
+        Maximum number of gathers kept in cache.
+    watch : scalar or None, default None
+        Polling interval of dirname for new files (in s). New files are
+        served as soon as they are completely written. If None, only files
+        present at start are served.
+    autopick : bool, default False
+        Auto-pick new files and store their picks (only if watch is not
+        None).
+    """
+
+    def __init__(self, dirname, store = None, host = "127.0.0.1", port = 8765,
+                 cache_size = 16, watch = None, autopick = False):
+        if not os.path.isdir(dirname):
+            raise ValueError("dirname must be an existing directory")
+        if not isinstance(cache_size, int) or cache_size < 1:
+            raise ValueError("cache_size must be a positive integer")
+        if watch is not None and (not isinstance(watch, (int, float)) or watch <= 0.):
+            raise ValueError("watch must be a positive scalar or None")
+        self._dirname = os.path.join(dirname, "")
+        self._stread = StreamReader()
+        self._filenames = self._stread.read_dir(self._dirname)
+        self._lookup = set(self._filenames)
+        if os.path.isfile(self._dirname + CUBE_NAME + ".json"):
+            self._cube = DataCube(self._dirname + CUBE_NAME)
+        else:
+            self._cube = None
+        self._store = PickStore(store if store is not None else self._dirname + STORE_NAME)
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._httpd = _ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.service = self
+        self._watch = watch
+        self._stop = threading.Event()
+        if watch is not None:
+            self._watcher = FolderWatcher(self._dirname, self._filenames, autopick = autopick,
+                                          store = self._store)
+        else:
+            self._watcher = None
+
+    def __contains__(self, filename):
+        return filename in self._lookup
+
+    def gather(self, filename):
+        """
+        Encoded gather of a file.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+
+        Returns
+        -------
+        body : bytes
+            Detrended seismic traces (float32) in NumPy format.
+        sampling_rate : scalar
+            Sampling rate (in Hz).
+        starttime : UTCDateTime
+            Start time.
+        """
+        with self._lock:
+            if filename in self._cache:
+                self._cache[filename] = self._cache.pop(filename)
+                return self._cache[filename]
+        if self._cube is not None and self._cube.is_current(filename, self._dirname + filename):
+            i = self._cube.index(filename)
+            X = np.array(self._cube.shot(i), dtype = np.float64)
+            sampling_rate, starttime = self._cube.sampling_rates[i], self._cube.starttimes[i]
+        else:
+            st = self._stread.read_file(self._dirname + filename)
+            X = np.array([ tr.data for tr in st.traces ], dtype = np.float64)
+            sampling_rate, starttime = st[0].stats.sampling_rate, st[0].stats.starttime
+        X -= X.mean(axis = 1, keepdims = True)
+        f = io.BytesIO()
+        np.save(f, X.astype(np.float32), allow_pickle = False)
+        entry = (f.getvalue(), float(sampling_rate), starttime)
+        with self._lock:
+            self._cache[filename] = entry
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last = False)
+        return entry
+
+    def geometry(self, filename):
+        """
+        Geometry of all receivers of a file. Trace headers are read once and
+        stored in the pick store.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+
+        Returns
+        -------
+        geometry : dict
+            Arrays of GEOMETRY_FIELDS (NaN if not available).
+        """
+        geometry = self._store.get_geometry(filename)
+        if geometry is None:
+            geometry = read_geometry(self._dirname + filename)
+            self._store.set_geometry(filename, geometry)
+        return geometry
+
+    def serve_forever(self):
+        """
+        Handle requests until shutdown is called.
+        """
+        if self._watcher is not None:
+            thread = threading.Thread(target = self._watch_dir)
+            thread.daemon = True
+            thread.start()
+        self._httpd.serve_forever()
+
+    def _watch_dir(self):
+        while not self._stop.wait(self._watch):
+            self._watcher.poll()
+            for filename, _, _ in self._watcher.collect():
+                with self._lock:
+                    self._filenames.append(filename)
+                    self._lookup.add(filename)
+
+    def start(self):
+        """
+        Handle requests in a background thread.
+
+        Returns
+        -------
+        thread : Thread
+            Server thread.
+        """
+        thread = threading.Thread(target = self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        """
+        Stop handling requests and close the socket.
+        """
+        self._stop.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._watcher is not None:
+            self._watcher.close()
+
+    @property
+    def filenames(self):
+        """
+        list of str
+        Shot filenames.
+        """
+        return self._filenames
+
+    @property
+    def store(self):
+        """
+        PickStore
+        Shared pick storage.
+        """
+        return self._store
+
+    @property
+    def url(self):
+        """
+        str
+        Server URL.
+        """
+        host, port = self._httpd.server_address[:2]
+        return "http://%s:%d" % (host, port)
+
+
+class PickClient:
+    """
+    Client of a PickServer. It provides the same pick methods as PickStore.
+
+    Parameters
+    ----------
+    url : str
+        Server URL.
+    user : str or None, default None
+        Name of the operator sent with each pick update.
+    timeout : scalar, default 30.
+        Request timeout (in s).
+    """
+
+    def __init__(self, url, user = None, timeout = 30.):
+        self._url = url.rstrip("/")
+        self._user = user
+        self._timeout = timeout
+
+    def _request(self, path, data = None, method = "GET"):
+        if data is not None:
+            data = json.dumps(data).encode("utf-8")
+        req = Request(self._url + path, data = data, headers = { "Content-Type": "application/json" })
+        req.get_method = lambda: method
+        return urlopen(req, timeout = self._timeout)
+
+    def filenames(self):
+        """
+        Shot filenames served.
+
+        Returns
+        -------
+        filenames : list of str
+            Shot filenames.
+        """
+        return json.loads(self._request("/files").read().decode("utf-8"))["filenames"]
+
+    def counts(self):
+        """
+        Number of picks of each shot.
+
+        Returns
+        -------
+        counts : dict
+            Number of picks by shot filename.
+        """
+        return json.loads(self._request("/files").read().decode("utf-8"))["counts"]
+
+    def gather(self, filename):
+        """
+        Download a gather.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+
+        Returns
+        -------
+        X : ndarray
+            Detrended seismic traces. Each row corresponds to a seismic record.
+        sampling_rate : scalar
+            Sampling rate (in Hz).
+        starttime : UTCDateTime
+            Start time.
+        """
+        resp = self._request("/gather/" + quote(filename))
+        X = np.load(io.BytesIO(resp.read()), allow_pickle = False).astype(np.float64)
+        return X, float(resp.headers["X-Sampling-Rate"]), UTCDateTime(resp.headers["X-Starttime"])
+
+    def geometry(self, filename):
+        """
+        Download the geometry of all receivers of a shot.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+
+        Returns
+        -------
+        geometry : dict
+            Arrays of GEOMETRY_FIELDS (NaN if not available).
+        """
+        geometry = json.loads(self._request("/geometry/" + quote(filename)).read().decode("utf-8"))
+        return dict((field, np.array([ np.nan if v is None else v for v in geometry[field] ], dtype = float))
+                    for field in GEOMETRY_FIELDS)
+
+    def get_picks(self, filename, nrcv = None):
+        """
+        Get picks of a shot.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        nrcv : int or None, default None
+            Number of receivers. If None, use highest picked receiver.
+
+        Returns
+        -------
+        picks : list
+            Pick (or None) of each receiver.
+        """
+        path = "/picks/" + quote(filename)
+        if nrcv is not None:
+            path += "?nrcv=%d" % nrcv
+        picks = json.loads(self._request(path).read().decode("utf-8"))["picks"]
+        return [ pick_from_dict(pick) if pick is not None else None for pick in picks ]
+
+    def set_pick(self, filename, receiver, pick):
+        """
+        Insert or replace a pick.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        receiver : int
+            Receiver index.
+        pick : Pick or None
+            Pick to store. If None, delete pick.
+        """
+        self.set_picks(filename, { receiver: pick })
+
+    def set_picks(self, filename, picks):
+        """
+        Insert, replace or delete several picks of a shot at once.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        picks : dict or list
+            Picks (or None to delete) by receiver index.
+        """
+        items = picks.items() if isinstance(picks, dict) else enumerate(picks)
+        data = { "picks": dict((str(int(k)), pick_to_dict(pick) if pick is not None else None)
+                               for k, pick in items),
+                 "user": self._user }
+        self._request("/picks/" + quote(filename), data, "PUT").read()
+
+    def delete_pick(self, filename, receiver):
+        """
+        Delete a pick.
+
+        Parameters
+        ----------
+        filename : str
+            Shot filename.
+        receiver : int
+            Receiver index.
+        """
+        self.set_picks(filename, { receiver: None })
+
+
+def main():
+    """
+    Start a picking service from the command line.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description = "Serve a survey directory to several Pycker Viewers.")
+    parser.add_argument("dirname", help = "directory containing stream files")
+    parser.add_argument("--host", default = "127.0.0.1", help = "host name or address to listen on")
+    parser.add_argument("--port", type = int, default = 8765, help = "port to listen on")
+    parser.add_argument("--store", default = None, help = "path to pick database")
+    parser.add_argument("--watch", type = float, default = None, help = "polling interval for new files (in s)")
+    parser.add_argument("--autopick", action = "store_true", help = "auto-pick new files")
+    args = parser.parse_args()
+    server = PickServer(args.dirname, args.store, args.host, args.port,
+                        watch = args.watch, autopick = args.autopick)
+    print("Serving %d files on %s" % (len(server.filenames), server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
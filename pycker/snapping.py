@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d
+
+__all__ = [ "PickSnapper", "energy_ratio", "energy_ratio_picks", "SNAP_KINDS" ]
+
+SNAP_KINDS = [ "onset", "peak", "trough", "zero" ]
+
+
+def energy_ratio(X, window):
+    """
+    Energy ratio characteristic function. Each sample is the ratio of the
+    mean energy of the window after it to the mean energy of the window
+    before it, computed with cumulative sums so that the cost does not
+    depend on the window length.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    window : int
+        Window length (in samples).
+
+    Returns
+    -------
+    cf : ndarray
+        Characteristic functions (0 where the energy before is null, and
+        within window samples of the ends of the traces).
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    if not isinstance(window, (int, np.integer)) or window < 1:
+        raise ValueError("window must be a positive integer")
+    nrcv, npts = X.shape
+    S = np.zeros((nrcv, npts+1))
+    np.cumsum(np.square(X, dtype = np.float64), axis = 1, out = S[:,1:])
+    # Only samples with full windows on both sides, a truncated window near
+    # the ends of the traces would average too few samples
+    cf = np.zeros((nrcv, npts))
+    i = np.arange(window, npts - window + 1)
+    if len(i) > 0:
+        before = S[:,i] - S[:,i-window]
+        after = S[:,i+window] - S[:,i]
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            cf[:,i] = np.where(before > 0., after / before, 0.)
+    return cf
+
+
+def energy_ratio_picks(X, window = 20, threshold = 2.):
+    """
+    Automatic first break picks of a gather, taken at the maximum of the
+    energy ratio of each trace.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    window : int, default 20
+        Window length of the energy ratio (in samples).
+    threshold : scalar, default 2.
+        Minimum energy ratio of a pick.
+
+    Returns
+    -------
+    idx : ndarray
+        Pick position of each trace (in samples), NaN if the energy ratio
+        never reaches the threshold.
+    """
+    cf = energy_ratio(X, window)
+    idx = np.argmax(cf, axis = 1).astype(float)
+    idx[cf[np.arange(len(cf)),idx.astype(int)] < threshold] = np.nan
+    return idx
+
+
+def _local_maxima(X):
+    return (X[:,1:-1] > X[:,:-2]) & (X[:,1:-1] >= X[:,2:])
+
+
+class PickSnapper:
+    """
+    Snap manual picks of a gather to the nearest onset, peak, trough or zero
+    crossing. The positions of each kind of feature are computed once for
+    all traces (on first use) and stored sorted by trace, so that a snap is
+    a binary search.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    window : int, default 20
+        Window length of the energy ratio characteristic function (in
+        samples).
+    threshold : scalar, default 2.
+        Minimum energy ratio of an onset.
+    """
+
+    def __init__(self, X, window = 20, threshold = 2.):
+        if not isinstance(X, np.ndarray) or X.ndim != 2:
+            raise ValueError("X must be a 2-D ndarray")
+        if not isinstance(threshold, (int, float)) or threshold < 0.:
+            raise ValueError("threshold must be a positive scalar")
+        self._X = X
+        self._cf = energy_ratio(X, window)
+        self._window = window
+        self._threshold = threshold
+        self._features = {}
+
+    def _compute(self, kind):
+        X = self._X
+        if kind == "onset":
+            # Energy ratio maxima that dominate their neighborhood
+            cf = self._cf
+            cfmax = maximum_filter1d(cf, 2*self._window+1, axis = 1, mode = "nearest")
+            rows, cols = np.nonzero(_local_maxima(cf) & (cf[:,1:-1] == cfmax[:,1:-1])
+                                    & (cf[:,1:-1] >= self._threshold))
+            positions = cols + 1.
+        elif kind == "peak":
+            rows, cols = np.nonzero(_local_maxima(X) & (X[:,1:-1] > 0.))
+            positions = cols + 1.
+        elif kind == "trough":
+            rows, cols = np.nonzero(_local_maxima(-X) & (X[:,1:-1] < 0.))
+            positions = cols + 1.
+        elif kind == "zero":
+            rows, cols = np.nonzero((X[:,:-1] > 0.) != (X[:,1:] > 0.))
+            x0, x1 = X[rows,cols], X[rows,cols+1]
+            positions = cols + x0 / (x0 - x1)
+        else:
+            raise ValueError("kind must be either 'onset', 'peak', 'trough' or 'zero'")
+        # Features are sorted by trace then position (row-major order)
+        indptr = np.concatenate(([ 0 ], np.cumsum(np.bincount(rows, minlength = len(X)))))
+        self._features[kind] = (positions, indptr)
+
+    def features(self, row, kind = "onset"):
+        """
+        Positions of the features of a trace.
+
+        Parameters
+        ----------
+        row : int
+            Trace index in gather.
+        kind : str, default 'onset'
+            Feature kind:
+                - 'onset', maximum of the energy ratio within the
+                  characteristic function window,
+                - 'peak', positive local maximum,
+                - 'trough', negative local minimum,
+                - 'zero', zero crossing (linearly interpolated).
+
+        Returns
+        -------
+        positions : ndarray
+            Sorted feature positions (in samples).
+        """
+        if kind not in self._features:
+            self._compute(kind)
+        positions, indptr = self._features[kind]
+        return positions[indptr[row]:indptr[row+1]]
+
+    def snap(self, row, index, kind = "onset", window = 20):
+        """
+        Snap a position to the nearest feature of a trace.
+
+        Parameters
+        ----------
+        row : int
+            Trace index in gather.
+        index : scalar
+            Position to snap (in samples).
+        kind : str, default 'onset'
+            Feature kind (see features).
+        window : scalar, default 20
+            Maximum snapping distance (in samples).
+
+        Returns
+        -------
+        index : scalar
+            Position of the nearest feature, or input position if no
+            feature is within the window.
+        """
+        positions = self.features(row, kind)
+        j = np.searchsorted(positions, index)
+        candidates = positions[max(j-1, 0):j+1]
+        if len(candidates) == 0:
+            return index
+        nearest = candidates[np.argmin(np.abs(candidates - index))]
+        return float(nearest) if abs(nearest - index) <= window else index
+
+    @property
+    def cf(self):
+        """
+        ndarray
+        Energy ratio characteristic functions (e.g. for
+        peak_width_uncertainty).
+        """
+        return self._cf
+
+    @property
+    def nbytes(self):
+        """
+        int
+        Bytes held by the characteristic functions and feature positions.
+        """
+        return self._cf.nbytes + sum(positions.nbytes + indptr.nbytes
+                                     for positions, indptr in self._features.values())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from collections import OrderedDict
+from scipy.signal import iirfilter, sosfreqz
+from .memory import array_nbytes
+
+__all__ = [ "amplitude_spectrum", "filter_response", "SpectrumCache" ]
+
+
+def amplitude_spectrum(X, sampling_rate):
+    """
+    Amplitude spectra of all traces computed in one batched real FFT.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+
+    Returns
+    -------
+    freqs : ndarray
+        Frequency axis (in Hz).
+    amp : ndarray
+        Amplitude spectra. Each row corresponds to a seismic record.
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    if not isinstance(sampling_rate, (int, float)) or sampling_rate <= 0.:
+        raise ValueError("sampling_rate must be a positive scalar")
+    freqs = np.fft.rfftfreq(X.shape[1], 1. / sampling_rate)
+    amp = np.abs(np.fft.rfft(X, axis = -1))
+    return freqs, amp
+
+
+def filter_response(freqs, sampling_rate, lpcut = None, hpcut = None, corners = 4):
+    """
+    Amplitude response of the Butterworth lowpass and highpass filters used
+    by the viewer (obspy.signal.filter).
+
+    Parameters
+    ----------
+    freqs : ndarray
+        Frequencies at which the response is evaluated (in Hz).
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+    lpcut : scalar or None, default None
+        Lowpass cutoff frequency (in Hz). If None, no lowpass filter.
+    hpcut : scalar or None, default None
+        Highpass cutoff frequency (in Hz). If None, no highpass filter.
+    corners : int, default 4
+        Filter corners / order.
+
+    Returns
+    -------
+    H : ndarray
+        Amplitude response.
+    """
+    fe = 0.5 * sampling_rate
+    H = np.ones(len(freqs))
+    for freq, btype in zip([ lpcut, hpcut ], [ "lowpass", "highpass" ]):
+        if freq is not None and 0. < freq / fe < 1.:
+            sos = iirfilter(corners, freq / fe, btype = btype, ftype = "butter", output = "sos")
+            H *= np.abs(sosfreqz(sos, worN = freqs, fs = sampling_rate)[1])
+    return H
+
+
+class SpectrumCache:
+    """
+    Least-recently-used cache of gather amplitude spectra.
+
+    Parameters
+    ----------
+    maxsize : int, default 8
+        Maximum number of gathers kept in cache.
+    """
+
+    def __init__(self, maxsize = 8):
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self._maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def get(self, key, X, sampling_rate):
+        """
+        Get amplitude spectra of a gather, computing them if not in cache.
+
+        Parameters
+        ----------
+        key : hashable
+            Gather identifier.
+        X : ndarray
+            Seismic traces. Each row corresponds to a seismic record.
+        sampling_rate : scalar
+            Sampling rate (in Hz).
+
+        Returns
+        -------
+        freqs : ndarray
+            Frequency axis (in Hz).
+        amp : ndarray
+            Amplitude spectra. Each row corresponds to a seismic record.
+        avg : ndarray
+            Average amplitude spectrum.
+        """
+        if key in self._cache:
+            self._cache[key] = self._cache.pop(key)
+        else:
+            freqs, amp = amplitude_spectrum(X, sampling_rate)
+            self._cache[key] = (freqs, amp, amp.mean(axis = 0))
+            while len(self._cache) > self._maxsize:
+                self._cache.popitem(last = False)
+        return self._cache[key]
+
+    def clear(self):
+        """
+        Remove all gathers from cache.
+        """
+        self._cache.clear()
+
+    @property
+    def nbytes(self):
+        """
+        int
+        Bytes held by cached spectra.
+        """
+        return array_nbytes(list(self._cache.values()))
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os, shutil, tempfile
+import numpy as np
+from multiprocessing import cpu_count
+from .read_stream import StreamReader
+
+__all__ = [ "SuperGather" ]
+
+
+class SuperGather:
+    """
+    Multi-shot gather stored in a contiguous memory-mapped buffer of shape
+    (shots x receivers x samples). Shots are decoded by parallel workers (see
+    StreamReader.read_many), shorter shots are padded with zeros.
+
+    Parameters
+    ----------
+    filenames : list of str
+        Paths to stream files (one shot per file).
+    nproc : int or None, default None
+        Number of worker processes. If None, use all available CPUs.
+    tmpdir : str or None, default None
+        Directory in which the buffer file is created. If None, use system
+        default temporary directory.
+    """
+
+    def __init__(self, filenames, nproc = None, tmpdir = None):
+        if not isinstance(filenames, (list, tuple)) or len(filenames) < 1:
+            raise ValueError("filenames must be a non-empty list of str")
+        if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+            raise ValueError("nproc must be a positive integer")
+        self._filenames = list(filenames)
+        self._nproc = min(nproc or cpu_count(), len(self._filenames))
+        self._tmpdir = tempfile.mkdtemp(prefix = "pycker_", dir = tmpdir)
+        self._path = os.path.join(self._tmpdir, "gather.dat")
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _load(self):
+        stread = StreamReader()
+        headers = [ (len(st), max(tr.stats.npts for tr in st), st[0].stats.sampling_rate, st[0].stats.starttime)
+                    for st in stread.read_headers(self._filenames, self._nproc) ]
+        nrcv, npts, sampling_rate, starttimes = zip(*headers)
+        if not np.allclose(sampling_rate, sampling_rate[0]):
+            raise ValueError("all shots must share the same sampling rate")
+        self._nrcv = np.array(nrcv)
+        self._npts = np.array(npts)
+        self._sampling_rate = sampling_rate[0]
+        self._starttimes = list(starttimes)
+        shape = (len(self._filenames), self._nrcv.max(), self._npts.max())
+        buf = np.memmap(self._path, dtype = np.float32, mode = "w+", shape = shape)
+        shots = stread.read_many(self._filenames, self._nproc, detrend = True, dtype = np.float32)
+        for k, (_, X, _) in enumerate(shots):
+            buf[k,:X.shape[0],:X.shape[1]] = X
+        buf.flush()
+        del buf
+        self._data = np.memmap(self._path, dtype = np.float32, mode = "r", shape = shape)
+
+    def close(self):
+        """
+        Release the buffer and remove its file.
+        """
+        self._data = None
+        shutil.rmtree(self._tmpdir, ignore_errors = True)
+
+    def side_by_side(self):
+        """
+        Concatenate all shots along the receiver axis.
+
+        Returns
+        -------
+        X : ndarray
+            Seismic traces. Each row corresponds to a seismic record.
+        trace_map : ndarray
+            Shot and receiver indices of each row of X.
+        """
+        shots = np.repeat(np.arange(len(self._filenames)), self._nrcv)
+        receivers = np.concatenate([ np.arange(n) for n in self._nrcv ])
+        X = np.array(self._data[shots,receivers,:], dtype = np.float64)
+        return X, np.column_stack((shots, receivers))
+
+    def common_receiver(self, receiver):
+        """
+        Extract common-receiver gather.
+
+        Parameters
+        ----------
+        receiver : int
+            Receiver index.
+
+        Returns
+        -------
+        X : ndarray
+            Seismic traces. Each row corresponds to a shot.
+        trace_map : ndarray
+            Shot and receiver indices of each row of X.
+        """
+        if not isinstance(receiver, (int, np.integer)) or not 0 <= receiver < self._nrcv.max():
+            raise ValueError("receiver must be an integer in [ 0, %d ]" % (self._nrcv.max()-1))
+        shots = np.nonzero(self._nrcv > receiver)[0]
+        X = np.array(self._data[shots,receiver,:], dtype = np.float64)
+        return X, np.column_stack((shots, np.full(len(shots), receiver)))
+
+    @property
+    def data(self):
+        """
+        ndarray
+        Memory-mapped buffer (shots x receivers x samples).
+        """
+        return self._data
+
+    @property
+    def filenames(self):
+        """
+        list of str
+        Paths to stream files.
+        """
+        return self._filenames
+
+    @property
+    def nrcv(self):
+        """
+        ndarray
+        Number of receivers of each shot.
+        """
+        return self._nrcv
+
+    @property
+    def npts(self):
+        """
+        ndarray
+        Number of samples of each shot.
+        """
+        return self._npts
+
+    @property
+    def sampling_rate(self):
+        """
+        scalar
+        Sampling rate (in Hz).
+        """
+        return self._sampling_rate
+
+    @property
+    def starttimes(self):
+        """
+        list of UTCDateTime
+        Start time of each shot.
+        """
+        return self._starttimes
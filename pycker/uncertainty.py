@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import numpy as np
+from .quantity_error import QuantityErrorArray
+from .qc import pick_windows, local_snr
+
+__all__ = [ "snr_uncertainty", "peak_width_uncertainty" ]
+
+
+def snr_uncertainty(X, idx, sampling_rate, window = 50, confidence_level = None):
+    """
+    Pick uncertainties of a gather derived from the local SNR. The
+    uncertainty is half the dominant period of the signal after the pick
+    divided by the amplitude SNR, bounded by one sample and half the
+    dominant period.
+
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    idx : ndarray
+        Pick position of each trace (in samples), NaN if not picked.
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+    window : int, default 50
+        Length of the noise (before pick) and signal (after pick) windows
+        (in samples).
+    confidence_level : scalar or None, default None
+        Confidence level assigned to the uncertainties (in percent).
+
+    Returns
+    -------
+    errors : QuantityErrorArray
+        Uncertainty (in s) of each pick, NaN if not picked.
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    if not isinstance(window, int) or window < 1:
+        raise ValueError("window must be a positive integer")
+    snr = local_snr(X, idx, window)
+    rows, values, inside = pick_windows(X, idx, window)
+    signal = values[:,window:]
+    crossings = (np.diff(np.sign(signal), axis = 1) != 0).sum(axis = 1)
+    period = 2. * inside[:,window:].sum(axis = 1) / np.maximum(crossings, 1) / sampling_rate
+    uncertainty = np.full(len(X), np.nan)
+    with np.errstate(divide = "ignore"):
+        u = 0.5 * period / snr[rows]
+    uncertainty[rows] = np.clip(np.where(np.isnan(u), np.inf, u), 1. / sampling_rate, 0.5 * period)
+    return QuantityErrorArray(uncertainty, confidence_level = confidence_level)
+
+
+def peak_width_uncertainty(cf, idx, sampling_rate, window = 50, level = 0.5,
+                           confidence_level = None):
+    """
+    Pick uncertainties of a gather derived from the width of the
+    characteristic function peak following each pick. The uncertainty is
+    half the width of the peak at the given level of its maximum.
+
+    Parameters
+    ----------
+    cf : ndarray
+        Characteristic functions (e.g. STA/LTA). Each row corresponds to a
+        seismic record.
+    idx : ndarray
+        Pick position of each trace (in samples), NaN if not picked.
+    sampling_rate : scalar
+        Sampling rate (in Hz).
+    window : int, default 50
+        Half length of the search window of the peak around the pick (in
+        samples).
+    level : scalar, default 0.5
+        Fraction of the peak value at which the width is measured.
+    confidence_level : scalar or None, default None
+        Confidence level assigned to the uncertainties (in percent).
+
+    Returns
+    -------
+    errors : QuantityErrorArray
+        Uncertainty (in s) of each pick, NaN if not picked.
+    """
+    if not isinstance(cf, np.ndarray) or cf.ndim != 2:
+        raise ValueError("cf must be a 2-D ndarray")
+    if not isinstance(window, int) or window < 1:
+        raise ValueError("window must be a positive integer")
+    if not 0. < level < 1.:
+        raise ValueError("level must be in ] 0., 1. [")
+    rows, values, inside = pick_windows(cf, idx, window)
+    values = np.where(inside, values, -np.inf)
+    ipeak = values.argmax(axis = 1)
+    peak = values[np.arange(len(rows)),ipeak]
+    below = values < level * peak[:,None]
+    j = np.arange(values.shape[1])[None,:]
+    left = np.where(below & (j < ipeak[:,None]), j, -1).max(axis = 1) + 1
+    right = np.where(below & (j > ipeak[:,None]), j, values.shape[1]).min(axis = 1)
+    uncertainty = np.full(len(cf), np.nan)
+    uncertainty[rows] = 0.5 * (right - left) / sampling_rate
+    return QuantityErrorArray(uncertainty, confidence_level = confidence_level)
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+"""
+Author: Keurfon Luu <keurfon.luu@mines-paristech.fr>
+License: MIT
+"""
+
+import os
+import numpy as np
+from multiprocessing import Pool, cpu_count
+from .pick import Pick
+from .read_stream import StreamReader
+from .pick_store import PickStore
+from .snapping import energy_ratio_picks
+from .uncertainty import snr_uncertainty
+
+__all__ = [ "FolderWatcher" ]
+
+
+def _process_shot(args):
+    path, autopick, window, threshold = args
+    X, header = StreamReader().read_traces(path, detrend = True)
+    if not autopick:
+        return len(X), None
+    fs, starttime = header["sampling_rate"], header["starttime"]
+    idx = energy_ratio_picks(X, window, threshold)
+    errors = snr_uncertainty(X, idx, fs)
+    return len(X), Pick.from_arrays(idx, fs, starttime, errors, shift = 0.)
+
+
+class _Done:
+    # Result of a shot processed without worker pool
+
+    def __init__(self, func, args):
+        try:
+            self._value, self._error = func(args), None
+        except Exception as e:
+            self._value, self._error = None, e
+
+    def ready(self):
+        return True
+
+    def get(self):
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class FolderWatcher:
+    """
+    Incremental ingestion of the stream files landing in a directory during
+    acquisition. Each poll lists the directory, and new files whose size
+    and modification time did not change since the previous poll (i.e.
+    completely written) are decoded and optionally auto-picked by a pool of
+    worker processes.
+
+    Parameters
+    ----------
+    dirname : str
+        Path to directory containing stream files.
+    filenames : list of str or None, default None
+        Files already known (not processed). If None, all files currently in
+        dirname.
+    nproc : int or None, default None
+        Number of worker processes. If None, use all available CPUs.
+    autopick : bool, default False
+        Auto-pick new files (maximum of the energy ratio, see
+        energy_ratio_picks).
+    window : int, default 20
+        Window length of the energy ratio (in samples).
+    threshold : scalar, default 2.
+        Minimum energy ratio of a pick.
+    store : PickStore, str or None, default None
+        Pick storage (or path to pick database) where auto-picks are
+        written. If None, auto-picks are only returned.
+    """
+
+    def __init__(self, dirname, filenames = None, nproc = None, autopick = False,
+                 window = 20, threshold = 2., store = None):
+        if not os.path.isdir(dirname):
+            raise ValueError("dirname must be an existing directory")
+        if nproc is not None and (not isinstance(nproc, int) or nproc < 1):
+            raise ValueError("nproc must be a positive integer")
+        if not isinstance(autopick, bool):
+            raise ValueError("autopick must be either True or False")
+        self._dirname = os.path.join(dirname, "")
+        self._stread = StreamReader()
+        self._known = set(filenames if filenames is not None else self._stread.read_dir(self._dirname))
+        self._params = (autopick, window, threshold)
+        self._owns_store = isinstance(store, str)
+        self._store = PickStore(store) if self._owns_store else store
+        # Files are submitted as they land and collected without blocking, so
+        # they are decoded by a pool of its own rather than by read_many
+        self._nproc = nproc or cpu_count()
+        self._pool = Pool(self._nproc) if self._nproc > 1 else None
+        self._stats = {}
+        self._pending = []
+        self._failed = []
+
+    def poll(self):
+        """
+        List directory and submit new completely written files.
+
+        Returns
+        -------
+        filenames : list of str
+            Files submitted.
+        """
+        stats = {}
+        for filename in sorted(os.listdir(self._dirname)):
+            if filename not in self._known and self._stread.format_ok(filename):
+                try:
+                    st = os.stat(self._dirname + filename)
+                except OSError:
+                    continue
+                stats[filename] = (st.st_size, st.st_mtime)
+        submitted = [ filename for filename, stat in stats.items()
+                      if stat[0] > 0 and self._stats.get(filename) == stat ]
+        submitted.sort()
+        for filename in submitted:
+            self._known.add(filename)
+            del stats[filename]
+            args = (self._dirname + filename,) + self._params
+            if self._pool is not None:
+                result = self._pool.apply_async(_process_shot, (args,))
+            else:
+                result = _Done(_process_shot, args)
+            self._pending.append((filename, result))
+        self._stats = stats
+        return submitted
+
+    def collect(self):
+        """
+        Results of the files processed so far, in submission order. Files
+        that cannot be read are skipped (see failed). Auto-picks are
+        written to the pick store.
+
+        Returns
+        -------
+        results : list of tuple
+            Filename, number of receivers and picks (list of Pick or None
+            for each receiver, None if not auto-picked) of each file.
+        """
+        results = []
+        while self._pending and self._pending[0][1].ready():
+            filename, result = self._pending.pop(0)
+            try:
+                nrcv, picks = result.get()
+            except Exception:
+                self._failed.append(filename)
+                continue
+            if picks is not None and self._store is not None:
+                self._store.set_picks(filename, picks, "autopick")
+            results.append((filename, nrcv, picks))
+        return results
+
+    def close(self):
+        """
+        Stop worker processes and discard pending files.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._owns_store:
+            self._store.close()
+        self._pending = []
+
+    @property
+    def autopick(self):
+        """
+        bool
+        Auto-pick new files. Changes apply to files submitted afterwards.
+        """
+        return self._params[0]
+
+    @autopick.setter
+    def autopick(self, value):
+        if not isinstance(value, bool):
+            raise ValueError("autopick must be either True or False")
+        self._params = (value,) + self._params[1:]
+
+    @property
+    def busy(self):
+        """
+        bool
+        True if files are being processed.
+        """
+        return len(self._pending) > 0
+
+    @property
+    def failed(self):
+        """
+        list of str
+        Files that could not be read.
+        """
+        return list(self._failed)
@@ -7,13 +7,16 @@ License: MIT
 
 import numpy as np
 import matplotlib.pyplot as plt
+from collections import OrderedDict
 from matplotlib.axes import Axes
+from .gain import apply_gain
+from .memory import array_nbytes
 
-__all__ = [ "wiggle" ]
+__all__ = [ "wiggle", "wiggle_image", "RasterCache" ]
 
 
 def wiggle(X, perc = 1., taxis = None, norm = True, fill = True, axes = None,
-           figsize = (12, 8)):
+           figsize = (12, 8), gain = None, limits = None, resolution = None):
     """
     Wiggle plot.
     
@@ -33,11 +36,21 @@ def wiggle(X, perc = 1., taxis = None, norm = True, fill = True, axes = None,
         Axes used for plot.
     figsize : tuple, default (12, 8)
         Figure width and height if axes is None.
+    gain : tuple or None, default None
+        Display gain applied before normalization, given as (method, value)
+        or (method, value, sampling_rate) (see apply_gain).
+    limits : tuple or None, default None
+        Visible trace numbers and times (xmin, xmax, tmin, tmax). Only
+        traces and samples within limits are drawn. If None, draw all.
+    resolution : int or None, default None
+        Number of pixels along the time axis. If not None, traces are
+        decimated to their minimum and maximum within each pixel.
     
     Returns
     -------
     ax1 : matplotlib axes
-        Axes used for plot.
+        Axes used for plot. Lines and filled areas of traces have gid
+        'wiggle'.
     """
     if not isinstance(X, np.ndarray) or X.ndim != 2:
         raise ValueError("X must be a 2-D ndarray")
@@ -53,6 +66,10 @@ def wiggle(X, perc = 1., taxis = None, norm = True, fill = True, axes = None,
         raise ValueError("axes must be Axes")
     if not isinstance(figsize, (list, tuple)) or len(figsize) != 2:
         raise ValueError("figsize must be a tuple with 2 elements")
+    if limits is not None and (not isinstance(limits, (list, tuple)) or len(limits) != 4):
+        raise ValueError("limits must be a tuple with 4 elements")
+    if resolution is not None and (not isinstance(resolution, int) or resolution < 1):
+        raise ValueError("resolution must be a positive integer")
         
     if axes is None:
         fig = plt.figure(figsize = figsize, facecolor = "white")
@@ -64,25 +81,224 @@ def wiggle(X, perc = 1., taxis = None, norm = True, fill = True, axes = None,
     if taxis is None:
         taxis = np.arange(npts)
     
-    if norm and perc < 1.:
-        clip = np.percentile(np.abs(X.ravel()), perc * 100.)
-        X_clip = np.clip(X, -clip, clip)
-    else:
-        X_clip = np.array(X)
-        
-    if norm:
-        ymax = np.max(np.abs(X_clip))
+    if gain is not None:
+        X = apply_gain(X, *gain)
+    if limits is None:
+        limits = (0, nrcv+1, taxis[0], taxis[-1])
+    xmin, xmax, tmin, tmax = limits
     
-    for k, tr in enumerate(X_clip):
-        if not norm:
-            ymax = np.max(np.abs(tr))
-        x = tr / ymax + k + 1
-        ax1.plot(x, taxis, color = "black", linewidth = 0.5)
+    # Traces and samples within limits (one more sample on each side)
+    k0, k1 = _visible_traces(nrcv, xmin, xmax)
+    i0, i1 = _visible_samples(taxis, tmin, tmax)
+    X_clip = _normalize(X, perc, norm, slice(k0, k1), slice(i0, i1))
+    t, X_clip = _envelope(taxis[i0:i1], X_clip, resolution)
+    for k, tr in zip(range(k0, k1), X_clip):
+        x = tr + k + 1
+        ax1.plot(x, t, color = "black", linewidth = 0.5, gid = "wiggle")
         if fill: 
-            ax1.fill_betweenx(taxis, x, k + 1, where = (x > k + 1), color = "black")
+            ax1.fill_betweenx(t, x, k + 1, where = (x > k + 1), color = "black", gid = "wiggle")
     
     ax1.set_xlabel("Trace number")
-    ax1.set_xlim(0, nrcv+1)
-    ax1.set_ylim(taxis[0], taxis[-1])
+    ax1.set_xlim(xmin, xmax)
+    ax1.set_ylim(tmin, tmax)
     ax1.invert_yaxis()
-    return ax1
\ No newline at end of file
+    return ax1
+
+
+def _visible_traces(nrcv, xmin, xmax):
+    # Trace k is drawn around k+1 with a normalized amplitude up to 1
+    k0 = min(max(int(np.floor(min(xmin, xmax))) - 2, 0), nrcv)
+    k1 = min(max(int(np.ceil(max(xmin, xmax))) + 1, k0), nrcv)
+    return k0, k1
+
+
+def _visible_samples(taxis, tmin, tmax):
+    i0 = max(np.searchsorted(taxis, min(tmin, tmax), side = "right") - 1, 0)
+    i1 = min(np.searchsorted(taxis, max(tmin, tmax), side = "left") + 1, len(taxis))
+    return i0, i1
+
+
+def _envelope(t, X, resolution):
+    # Minimum and maximum of each trace within each pixel
+    npts = X.shape[1]
+    if resolution is None or npts <= 2 * resolution:
+        return t, X
+    starts = np.linspace(0, npts, resolution, endpoint = False).astype(int)
+    E = np.empty((len(X), 2*resolution), dtype = X.dtype)
+    E[:,0::2] = np.minimum.reduceat(X, starts, axis = 1)
+    E[:,1::2] = np.maximum.reduceat(X, starts, axis = 1)
+    return np.repeat(t[starts], 2), E
+
+
+def _normalize(X, perc, norm, rows = slice(None), cols = slice(None)):
+    # Amplitudes are scaled over the whole gather, then cropped
+    if norm and perc < 1.:
+        clip = np.percentile(np.abs(X.ravel()), perc * 100.)
+        ymax = min(clip, np.max(np.abs(X)))
+        X_clip = np.clip(X[rows,cols], -clip, clip)
+    else:
+        X_clip = np.array(X[rows,cols], dtype = float)
+        if norm:
+            ymax = np.max(np.abs(X))
+        else:
+            ymax = np.max(np.abs(X[rows]), axis = 1, keepdims = True)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        return X_clip / ymax
+
+
+def wiggle_image(X, shape, perc = 1., norm = True, fill = True, color = (0, 0, 0),
+                 limits = None):
+    """
+    Rasterize a wiggle plot to an RGBA image without matplotlib, so that it
+    can be computed out of the GUI thread. By default, the image spans trace
+    numbers 0 to nrcv+1 horizontally and the first to last sample vertically
+    (top to bottom), as in wiggle.
+    
+    Parameters
+    ----------
+    X : ndarray
+        Seismic traces. Each row corresponds to a seismic record.
+    shape : tuple
+        Image height and width (in pixels).
+    perc : int or float, default 1.
+        Maximum amplitude percentile for clipping. Only used if norm is True.
+    norm : bool, default True
+        Normalize seismic traces.
+    fill : bool, default True
+        Fill with color positive lobes.
+    color : tuple, default (0, 0, 0)
+        RGB color of traces (0-255).
+    limits : tuple or None, default None
+        Trace numbers and samples spanned by the image (xmin, xmax, imin,
+        imax). Only traces and samples within limits are rasterized, with
+        amplitudes scaled over the whole gather.
+    
+    Returns
+    -------
+    img : ndarray
+        RGBA image of shape (height, width, 4) and dtype uint8. Pixels
+        without traces are transparent.
+    """
+    if not isinstance(X, np.ndarray) or X.ndim != 2:
+        raise ValueError("X must be a 2-D ndarray")
+    if not isinstance(shape, (list, tuple)) or len(shape) != 2 or min(shape) < 1:
+        raise ValueError("shape must be a tuple with 2 positive integers")
+    if limits is not None and (not isinstance(limits, (list, tuple)) or len(limits) != 4):
+        raise ValueError("limits must be a tuple with 4 elements")
+    height, width = int(shape[0]), int(shape[1])
+    img = np.zeros((height, width, 4), dtype = np.uint8)
+    if X.shape[1] < 2:
+        X = np.repeat(X, 2, axis = 1)
+    nrcv, npts = X.shape
+    xmin, xmax, imin, imax = limits if limits is not None else (0., nrcv+1., 0., npts-1.)
+    
+    # Traces and samples within limits
+    k0, k1 = _visible_traces(nrcv, xmin, xmax)
+    j0 = min(max(int(np.floor(imin)), 0), npts-2)
+    j1 = max(min(int(np.ceil(imax)) + 1, npts), j0+2)
+    if k0 == k1 or imin >= npts-1 or imax <= 0:
+        return img
+    X = np.nan_to_num(_normalize(X, perc, norm, slice(k0, k1), slice(j0, j1)))
+    nrcv, npts = X.shape
+    
+    # Amplitude range of each trace within each pixel row
+    edges = np.linspace(imin, imax, height+1) - j0
+    inside = (edges[1:] >= 0.) & (edges[:-1] <= npts-1.)
+    edges = edges.clip(0., npts-1.)
+    i0 = np.floor(edges).astype(int).clip(0, npts-2)
+    w = edges - i0
+    E = X[:,i0] * (1. - w) + X[:,i0+1] * w
+    lo = np.minimum(E[:,:-1], E[:,1:])
+    hi = np.maximum(E[:,:-1], E[:,1:])
+    first = np.ceil(edges[:-1]).astype(int)
+    last = np.floor(edges[1:]).astype(int)
+    nonempty = (first <= last) & (first < npts)
+    if nonempty.any():
+        starts = first[nonempty]
+        lo[:,nonempty] = np.minimum(lo[:,nonempty], np.minimum.reduceat(X, starts, axis = 1))
+        hi[:,nonempty] = np.maximum(hi[:,nonempty], np.maximum.reduceat(X, starts, axis = 1))
+    if fill:
+        lo = np.where(hi > 0., np.minimum(lo, 0.), lo)
+    
+    # Horizontal pixel spans, drawn with a difference array
+    offset = np.arange(k0+1, k1+1)[:,None] - xmin
+    scale = width / float(xmax - xmin)
+    c0 = np.floor((lo + offset) * scale)
+    c1 = np.floor((hi + offset) * scale)
+    visible = (c1 >= 0) & (c0 < width) & inside
+    rows = np.broadcast_to(np.arange(height), lo.shape)[visible]
+    c0 = c0[visible].clip(0, width-1).astype(int)
+    c1 = c1[visible].clip(0, width-1).astype(int)
+    size = height * (width+1)
+    D = np.bincount(rows * (width+1) + c0, minlength = size) \
+        - np.bincount(rows * (width+1) + c1 + 1, minlength = size)
+    covered = np.cumsum(D.reshape((height, width+1)), axis = 1)[:,:width] > 0
+    img[covered] = tuple(color) + (255,)
+    return img
+
+
+class RasterCache:
+    """
+    Least-recently-used cache of rasterized viewports.
+
+    Parameters
+    ----------
+    maxsize : int, default 16
+        Maximum number of images kept in cache.
+    """
+
+    def __init__(self, maxsize = 16):
+        if not isinstance(maxsize, int) or maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self._maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    def get(self, key):
+        """
+        Get a cached image.
+
+        Parameters
+        ----------
+        key : hashable
+            Viewport identifier.
+
+        Returns
+        -------
+        img : ndarray or None
+            RGBA image, None if not in cache.
+        """
+        if key in self._cache:
+            self._cache[key] = self._cache.pop(key)
+        return self._cache.get(key)
+
+    def add(self, key, img):
+        """
+        Add an image to cache.
+
+        Parameters
+        ----------
+        key : hashable
+            Viewport identifier.
+        img : ndarray
+            RGBA image.
+        """
+        self._cache[key] = img
+        while len(self._cache) > self._maxsize:
+            self._cache.popitem(last = False)
+
+    def clear(self):
+        """
+        Remove all images from cache.
+        """
+        self._cache.clear()
+
+    @property
+    def nbytes(self):
+        """
+        int
+        Bytes held by cached images.
+        """
+        return array_nbytes(list(self._cache.values()))
@@ -14,6 +14,7 @@ REQUIREMENTS = [
     "numpy",
     "matplotlib",
     "obspy",
+    "scipy",
 ]
 CLASSIFIERS = [
     "Programming Language :: Python",
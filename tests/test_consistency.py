@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from pycker.pick import Pick
+from pycker.read_stream import StreamReader
+from pycker.consistency import PICK_DTYPE, pick_table, reciprocity_check, moveout_outliers, _group_median
+from pycker.gui.latency import synthetic_survey
+
+
+def shot_table(shot, x, velocity = 1500., sampling_rate = 4000.):
+    table = np.zeros(len(x), dtype = PICK_DTYPE)
+    table["shot"] = shot
+    table["receiver"] = np.arange(len(x))
+    table["source_x"], table["receiver_x"] = 0., x
+    table["source_y"], table["receiver_y"] = 0., 0.
+    table["time"] = np.round(np.hypot(x, 10.) / velocity * sampling_rate) / sampling_rate
+    table["sampling_rate"] = sampling_rate
+    return table
+
+
+def test_group_median():
+    values = np.array([ 3., 1., 2., 10., 20. ])
+    groups = np.array([ 0, 0, 0, 2, 2 ])
+    med = _group_median(values, groups, 3)
+    np.testing.assert_allclose(med, [ 2., np.nan, 15. ])
+    assert np.isnan(_group_median(np.zeros(0), np.zeros(0, dtype = int), 2)).all()
+
+
+def test_moveout_outliers():
+    table = shot_table(0, np.arange(-48., 50., 2.))
+    assert not moveout_outliers(table)[1].any()
+    table["time"][[ 0, 24 ]] += 0.005
+    assert np.nonzero(moveout_outliers(table)[1])[0].tolist() == [ 0, 24 ]
+
+
+def test_moveout_outliers_missing_times():
+    # Picks without residual must not shrink the residual scale of their shot
+    table = shot_table(0, np.arange(-48., 50., 2.))
+    table["time"] += 0.0005 * np.random.RandomState(0).randn(len(table))
+    table["time"][30:] = np.nan
+    residual, flagged = moveout_outliers(table)
+    assert np.isfinite(residual).sum() == 30
+    assert not flagged.any()
+    table["time"][10] += 0.01
+    assert np.nonzero(moveout_outliers(table)[1])[0].tolist() == [ 10 ]
+
+
+def test_reciprocity_check():
+    a, b = shot_table(0, [ 10., 20. ]), shot_table(1, [ -10., 10. ])
+    b["source_x"], b["receiver_x"] = 10., [ 0., 20. ]
+    table = np.concatenate((a, b))
+    table["time"][2] = table["time"][0] + 0.01
+    mismatch, flagged = reciprocity_check(table, 0.001)
+    np.testing.assert_allclose(mismatch[[ 0, 2 ]], [ -0.01, 0.01 ])
+    assert np.isnan(mismatch[[ 1, 3 ]]).all()
+    assert flagged.tolist() == [ True, False, True, False ]
+
+
+def test_pick_table(tmp_path):
+    dirname = str(tmp_path) + "/"
+    filenames = [ dirname + filename for filename in synthetic_survey(dirname, nshot = 3, nrcv = 6, npts = 200) ]
+    starttime = StreamReader().read_file(filenames[1], headonly = True)[0].stats.starttime
+    picks = [ None, [ Pick(starttime + 0.01, 40., 4000.), None, Pick(starttime + 0.02, 80., 4000.) ], [ None ] * 6 ]
+    table = pick_table(filenames, picks, nproc = 1)
+    assert table["shot"].tolist() == [ 1, 1 ]
+    assert table["receiver"].tolist() == [ 0, 2 ]
+    np.testing.assert_allclose(table["time"], [ 0.01, 0.02 ])
+    assert len(pick_table(filenames, [ None ] * 3)) == 0
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import numpy as np
+from pycker.data_cube import ingest
+from pycker.gui.latency import synthetic_survey
+
+
+def test_ingest(tmp_path):
+    dirname = str(tmp_path) + "/"
+    filenames = synthetic_survey(dirname, nshot = 3, nrcv = 8, npts = 200)
+    cube = ingest(dirname, nproc = 1)
+    assert cube.filenames == filenames
+    assert np.all(np.array(cube.shapes) == [ 8, 200 ])
+    assert cube.shot(cube.index(filenames[1])).shape == (8, 200)
+    assert all(cube.is_current(filename, dirname + filename) for filename in filenames)
+    assert not cube.is_current("missing.sgy", dirname + "missing.sgy")
+
+
+def test_stale_file(tmp_path):
+    dirname = str(tmp_path) + "/"
+    filenames = synthetic_survey(dirname, nshot = 2, nrcv = 8, npts = 200)
+    cube = ingest(dirname, nproc = 1)
+    # Rewrite the first file after ingest
+    shutil.copyfile(dirname + filenames[1], dirname + filenames[0])
+    st = os.stat(dirname + filenames[0])
+    os.utime(dirname + filenames[0], (st.st_atime, st.st_mtime + 10.))
+    assert not cube.is_current(filenames[0], dirname + filenames[0])
+    assert cube.is_current(filenames[1], dirname + filenames[1])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from obspy.core.utcdatetime import UTCDateTime
+from pycker.pick import Pick
+from pycker.pick_store import PickStore
+from pycker.quantity_error import QuantityError
+from pycker.headers import GEOMETRY_FIELDS
+from pycker.export import pick_records, export_csv, iter_events
+
+
+def shot_picks(starttime, nrcv = 4):
+    return [ Pick(starttime + k / 1000., float(k), 1000., QuantityError(0.001 * k)) if k % 2 else None
+             for k in range(nrcv) ]
+
+
+def test_pick_records():
+    starttime = UTCDateTime(ns = 1577836800000000123)
+    records = pick_records("a.segy", shot_picks(starttime))
+    assert records["receiver"].tolist() == [ 1, 3 ]
+    assert records["time"][0] == "2020-01-01T00:00:00.001000123Z"
+    np.testing.assert_allclose(records["traveltime"], [ 0.001, 0.003 ])
+    np.testing.assert_allclose(records["uncertainty"], [ 0.001, 0.003 ])
+    assert np.isnan(records["offset"]).all()
+    assert len(pick_records("b.segy", [ None, None ])) == 0
+
+
+def test_export_csv_round_trip(tmp_path):
+    starttime = UTCDateTime(2020, 1, 1)
+    filenames = [ "a.segy", "b.segy", "c.segy" ]
+    picks = [ shot_picks(starttime), None, shot_picks(starttime + 60., 6) ]
+    output = str(tmp_path / "picks.csv")
+    assert export_csv(output, filenames, picks, chunksize = 2) == 5
+    table = np.genfromtxt(output, delimiter = ",", names = True, dtype = None, encoding = "utf-8")
+    assert table["filename"].tolist() == [ "a.segy" ] * 2 + [ "c.segy" ] * 3
+    assert table["receiver"].tolist() == [ 1, 3, 1, 3, 5 ]
+    assert table["time"][-1] == "2020-01-01T00:01:00.005000000Z"
+
+
+def test_export_csv_from_store(tmp_path):
+    store = PickStore(str(tmp_path / "picks.db"))
+    picks = shot_picks(UTCDateTime(ns = 1577836800123456789))
+    store.set_picks("b.segy", picks)
+    store.set_geometry("b.segy", dict((field, np.arange(4.)) for field in GEOMETRY_FIELDS))
+    output = str(tmp_path / "picks.csv")
+    assert export_csv(output, [ "a.segy", "b.segy" ], store) == 2
+    table = np.genfromtxt(output, delimiter = ",", names = True, dtype = None, encoding = "utf-8")
+    assert table["time"][0] == "2020-01-01T00:00:00.124456789Z"
+    assert table["offset"].tolist() == [ 1., 3. ]
+    store.close()
+
+
+def test_iter_events():
+    starttime = UTCDateTime(ns = 1577836800000000123)
+    events = list(iter_events([ "a.segy", "b.segy" ], [ None, shot_picks(starttime) ]))
+    assert len(events) == 1
+    assert events[0].event_descriptions[0].text == "b.segy"
+    assert [ p.waveform_id.station_code for p in events[0].picks ] == [ "1", "3" ]
+    assert events[0].picks[0].time.ns == starttime.ns + 1000000
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from pycker.gain import agc, tpow_gain, exp_gain, apply_gain
+
+
+def test_agc():
+    t = np.arange(2000.)
+    X = np.array([ np.sin(2. * np.pi * t / 50.) * np.exp(-t / 500.), np.zeros_like(t) ], dtype = np.float32)
+    Y = agc(X, 100)
+    assert Y.dtype == np.float32
+    rms = np.sqrt(np.mean(Y[0,200:1800].reshape(-1, 100)**2, axis = 1))
+    np.testing.assert_allclose(rms, 1., atol = 0.05)
+    assert np.all(Y[1] == 0.)
+
+
+def test_agc_brute_force():
+    X = np.random.RandomState(0).randn(3, 50)
+    window, half = 7, 3
+    Y = agc(X, window)
+    for i in range(50):
+        w = X[:,max(i-half, 0):min(i+window-half, 50)]
+        np.testing.assert_allclose(Y[:,i], X[:,i] / np.sqrt(np.mean(w**2, axis = 1)))
+    with pytest.raises(ValueError):
+        agc(X, 0)
+
+
+def test_tpow_exp_gain():
+    X = np.ones((2, 5))
+    np.testing.assert_allclose(tpow_gain(X, 2.)[0], (np.arange(5) / 2.)**2)
+    np.testing.assert_allclose(exp_gain(X, 2., 0.5)[1], np.exp(0.25 * np.arange(5)))
+    assert tpow_gain(X.astype(np.float32), 2.).dtype == np.float32
+
+
+def test_apply_gain():
+    X = np.random.RandomState(0).randn(2, 100)
+    np.testing.assert_allclose(apply_gain(X, "agc", 10.), agc(X, 10))
+    np.testing.assert_allclose(apply_gain(X, "tpow", 1.5, 100.), tpow_gain(X, 100., 1.5))
+    with pytest.raises(ValueError):
+        apply_gain(X, "rms", 1.)
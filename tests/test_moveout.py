@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from pycker.moveout import PhaseShifter, lmo_shifts
+
+
+def test_lmo_shifts():
+    np.testing.assert_allclose(lmo_shifts([ -30., 0., 15. ], 1500., 1000.), [ 20., 0., 10. ])
+    with pytest.raises(ValueError):
+        lmo_shifts([ 1. ], 0., 1000.)
+
+
+def test_integer_shifts():
+    X = np.random.RandomState(0).randn(3, 64)
+    Y = PhaseShifter(X).shift([ 0., 5., -3. ])
+    np.testing.assert_allclose(Y[0], X[0], atol = 1e-10)
+    np.testing.assert_allclose(Y[1,:-5], X[1,5:], atol = 1e-10)
+    np.testing.assert_allclose(Y[1,-5:], 0., atol = 1e-10)
+    np.testing.assert_allclose(Y[2,3:], X[2,:-3], atol = 1e-10)
+    np.testing.assert_allclose(Y[2,:3], 0., atol = 1e-10)
+
+
+def test_fractional_shift():
+    t = np.arange(512.)
+    f = lambda t: np.exp(-((t - 256.) / 20.)**2)
+    Y = PhaseShifter(f(t)[None,:]).shift([ 2.5 ])
+    np.testing.assert_allclose(Y[0], f(t + 2.5), atol = 1e-6)
+
+
+def test_cache():
+    X = np.random.RandomState(0).randn(2, 32).astype(np.float32)
+    shifter = PhaseShifter(X, maxsize = 1)
+    Y = shifter.shift([ 1., 2. ])
+    assert Y.dtype == np.float32
+    assert shifter.shift([ 1., 2. ]) is Y
+    shifter.shift([ 0., 0. ])
+    assert shifter.shift([ 1., 2. ]) is not Y
+    assert shifter.nbytes > 0
+    with pytest.raises(ValueError):
+        shifter.shift([ 1. ])
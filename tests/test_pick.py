@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+import numpy as np
+import pytest
+from obspy.core.utcdatetime import UTCDateTime
+from pycker.pick import Pick
+from pycker.quantity_error import QuantityError, QuantityErrorArray
+
+
+def test_default_time_errors_not_shared():
+    a, b = Pick(1., 10., 100.), Pick(2., 20., 100.)
+    a.time_errors.uncertainty = 0.5
+    assert b.time_errors.uncertainty is None
+    assert Pick().time_errors.uncertainty is None
+
+
+def test_from_arrays():
+    starttime = UTCDateTime(2020, 1, 1)
+    picks = Pick.from_arrays([ 10., np.nan, 25.5 ], 1000., starttime, shift = 2.)
+    assert picks[1] is None
+    assert picks[0].time == starttime + 0.01
+    assert picks[2].time.ns == starttime.ns + 25500000
+    assert picks[2].index == 25.5 and picks[2].shift == 2. and picks[2].sampling_rate == 1000.
+    picks[0].time_errors.uncertainty = 0.5
+    assert picks[2].time_errors.uncertainty is None
+
+
+def test_from_arrays_time_errors():
+    errors = QuantityErrorArray([ 0.1, 0.2 ])
+    picks = Pick.from_arrays([ 1., 2. ], [ 100., 200. ], 0., time_errors = errors)
+    assert [ p.time_errors.uncertainty for p in picks ] == [ 0.1, 0.2 ]
+    assert [ p.time for p in picks ] == [ 0.01, 0.01 ]
+    with pytest.raises(ValueError):
+        Pick.from_arrays([ 1., 2. ], 100., time_errors = QuantityErrorArray([ 0.1 ]))
+    with pytest.raises(ValueError):
+        Pick.from_arrays([ 1. ], 0.)
+
+
+def test_pickle_round_trip():
+    pick = Pick(UTCDateTime(ns = 1577836800123456789), 3., 1000., QuantityError(0.01), 1., "P")
+    copy = pickle.loads(pickle.dumps(pick))
+    assert copy.time.ns == pick.time.ns
+    assert (copy.index, copy.shift, copy.phase_hint) == (3., 1., "P")
+    assert copy.time_errors.uncertainty == 0.01
+
+
+def test_quantity_error_array_scalar():
+    with pytest.raises(ValueError):
+        QuantityErrorArray(0.1)
+    errors = QuantityErrorArray(0.1, size = 3)
+    np.testing.assert_allclose(errors.uncertainty, 0.1)
+    assert len(QuantityErrorArray()) == 0
+
+
+def test_quantity_error_array_list_round_trip():
+    errors = [ QuantityError(0.1, 0.05, 0.2, 90.), None, QuantityError() ]
+    arr = QuantityErrorArray.fromlist(errors)
+    assert len(arr) == 3
+    assert arr[0].confidence_level == 90.
+    assert arr[1].uncertainty is None
+    assert arr.tolist()[0].upper_uncertainty == 0.2
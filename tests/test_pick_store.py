@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import numpy as np
+from obspy.core.utcdatetime import UTCDateTime
+from pycker.pick import Pick
+from pycker.pick_store import PickStore, pick_to_dict, pick_from_dict
+from pycker.quantity_error import QuantityError
+from pycker.headers import GEOMETRY_FIELDS
+
+
+def test_pick_dict_round_trip():
+    pick = Pick(UTCDateTime(ns = 1577836800123456789), 3.25, 1000., QuantityError(0.01, 0.005, 0.02, 95.), 1., "P")
+    copy = pick_from_dict(pick_to_dict(pick))
+    assert copy.time.ns == pick.time.ns
+    assert (copy.index, copy.sampling_rate, copy.shift, copy.phase_hint) == (3.25, 1000., 1., "P")
+    assert copy.time_errors.upper_uncertainty == 0.02
+    assert pick_from_dict(pick_to_dict(Pick(0.5, 2., 100.))).time == 0.5
+
+
+def test_set_get_picks(tmp_path):
+    store = PickStore(str(tmp_path / "picks.db"))
+    starttime = UTCDateTime(ns = 1577836800123456789)
+    store.set_picks("a.segy", [ Pick(starttime, 1., 1000.), None, Pick(starttime + 0.001, 2., 1000.) ], "alice")
+    picks = store.get_picks("a.segy")
+    assert len(picks) == 3 and picks[1] is None
+    assert picks[2].time.ns == starttime.ns + 1000000
+    assert len(store.get_picks("a.segy", 5)) == 5
+    # Last write wins, None deletes
+    store.set_pick("a.segy", 0, Pick(starttime, 5., 1000.), "bob")
+    store.set_picks("a.segy", { 2: None })
+    picks = store.get_picks("a.segy")
+    assert picks[0].index == 5. and len(picks) == 1
+    store.delete_pick("a.segy", 0)
+    assert store.get_picks("a.segy") == []
+    assert store.get_picks("b.segy") == []
+    store.close()
+
+
+def test_counts_and_geometry(tmp_path):
+    store = PickStore(str(tmp_path / "picks.db"))
+    store.set_picks("a.segy", [ Pick(0., 1., 1000.) ] * 3)
+    store.set_picks("b.segy", [ None, Pick(0., 1., 1000.) ])
+    assert store.counts() == { "a.segy": 3, "b.segy": 1 }
+    assert store.get_geometry("a.segy") is None
+    geometry = dict((field, np.arange(4.)) for field in GEOMETRY_FIELDS)
+    geometry["source_y"][:] = np.nan
+    store.set_geometry("a.segy", geometry)
+    stored = store.get_geometry("a.segy")
+    np.testing.assert_array_equal(stored["offset"], np.arange(4.))
+    assert np.isnan(stored["source_y"]).all()
+    store.close()
+
+
+def test_concurrent_writers(tmp_path):
+    filename = str(tmp_path / "picks.db")
+    PickStore(filename).close()
+
+    def write(k):
+        store = PickStore(filename)
+        for r in range(20):
+            store.set_pick("a.segy", 20*k + r, Pick(0., float(r), 1000.))
+        store.close()
+
+    threads = [ threading.Thread(target = write, args = (k,)) for k in range(4) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store = PickStore(filename)
+    assert store.counts() == { "a.segy": 80 }
+    store.close()
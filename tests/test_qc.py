@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from pycker.pick import Pick
+from pycker.qc import pick_samples, local_snr, moveout_residual, trace_qc, survey_qc, shot_summary
+from pycker.gui.latency import synthetic_survey
+
+
+def test_pick_samples():
+    picks = [ Pick(0., 10., 1000.), None, Pick(0., 4., 500., shift = 1.) ]
+    np.testing.assert_allclose(pick_samples(picks, 4, 1000.), [ 10., np.nan, 10., np.nan ])
+    assert np.isnan(pick_samples(None, 2, 1000.)).all()
+
+
+def test_local_snr():
+    X = np.ones((2, 200))
+    X[:,100:] = 10.
+    snr = local_snr(X, [ 100., np.nan ], 50)
+    np.testing.assert_allclose(snr[0], 10.)
+    assert np.isnan(snr[1])
+
+
+def test_moveout_residual():
+    x = np.arange(20.)
+    t = np.abs(x - 7.) * 0.01
+    np.testing.assert_allclose(moveout_residual(x, t), 0., atol = 1e-12)
+    t[12] += 0.05
+    residual = moveout_residual(x, t)
+    assert np.argmax(np.abs(residual)) == 12
+    np.testing.assert_allclose(residual[12], 0.05)
+    # Neighbours are taken within groups only
+    groups = np.repeat([ 0, 1 ], 10)
+    assert np.isnan(moveout_residual([ 0. ], [ 1. ])).all()
+    assert np.isfinite(moveout_residual(x, t, groups = groups)).all()
+
+
+def test_trace_qc():
+    rng = np.random.RandomState(0)
+    X = rng.randn(20, 300)
+    X[1] = 0.
+    X[2,50:60] = 100.
+    idx = 100. + 2. * np.arange(20)
+    idx[10] += 20.
+    table = trace_qc(X, idx, window = 20)
+    assert np.nonzero(table["dead"])[0].tolist() == [ 1 ]
+    assert np.nonzero(table["clipped"])[0].tolist() == [ 2 ]
+    assert np.nonzero(table["outlier"])[0].tolist() == [ 10 ]
+    assert np.isnan(trace_qc(X)["snr"]).all()
+
+
+def test_survey_qc(tmp_path):
+    dirname = str(tmp_path) + "/"
+    filenames = [ dirname + filename for filename in synthetic_survey(dirname, nshot = 3, nrcv = 6, npts = 300) ]
+    picks = [ None, [ Pick(None, 50., 4000.) ] * 6, None ]
+    table = survey_qc(filenames, picks, nproc = 1, window = 20)
+    assert table["shot"].tolist() == np.repeat([ 0, 1, 2 ], 6).tolist()
+    summary = shot_summary(table)
+    assert summary["ntr"].tolist() == [ 6, 6, 6 ]
+    assert summary["npicks"].tolist() == [ 0, 6, 0 ]
+    assert len(survey_qc([])) == 0
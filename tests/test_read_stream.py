@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from pycker.read_stream import StreamReader, pool_map
+from pycker.gui.latency import synthetic_survey
+
+
+@pytest.fixture
+def survey(tmp_path):
+    dirname = str(tmp_path) + "/"
+    return [ dirname + filename for filename in synthetic_survey(dirname, nshot = 4, nrcv = 6, npts = 300) ]
+
+
+def test_read_traces(survey):
+    st = StreamReader().read_file(survey[0])
+    X, header = StreamReader().read_traces(survey[0], detrend = True, dtype = np.float32)
+    assert X.dtype == np.float32 and X.shape == (6, 300)
+    np.testing.assert_allclose(X, [ tr.detrend("constant").data for tr in st.traces ], atol = 1e-6)
+    assert header["sampling_rate"] == st[0].stats.sampling_rate
+    assert header["starttime"] == st[0].stats.starttime
+
+
+@pytest.mark.parametrize("nproc", [ 1, 2 ])
+def test_read_many(survey, nproc):
+    stread = StreamReader()
+    shots = list(stread.read_many(survey, nproc, maxsize = 1))
+    assert [ filename for filename, _, _ in shots ] == survey
+    for filename, X, _ in shots:
+        np.testing.assert_array_equal(X, stread.read_traces(filename)[0])
+
+
+@pytest.mark.parametrize("nproc", [ 1, 2 ])
+def test_read_headers(survey, nproc):
+    streams = StreamReader().read_headers(survey, nproc)
+    assert [ len(st) for st in streams ] == [ 6 ] * 4
+    assert all(len(tr.data) == 0 for st in streams for tr in st)
+
+
+def test_pool_map():
+    assert pool_map(abs, [ -1, 2, -3 ], 2) == [ 1, 2, 3 ]
+    assert pool_map(abs, [], 2) == []
+    with pytest.raises(ValueError):
+        pool_map(abs, [ 1 ], 0)
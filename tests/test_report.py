@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import matplotlib
+matplotlib.use("Agg")
+from pycker.report import render_report
+from pycker.gui.latency import synthetic_survey
+
+
+def test_render_report_incremental(tmp_path):
+    dirname = str(tmp_path / "survey") + "/"
+    output = str(tmp_path / "report")
+    filenames = synthetic_survey(dirname, nshot = 3, nrcv = 6, npts = 200)
+    assert render_report(dirname, output = output, nproc = 1) == 3
+    assert sorted(os.listdir(output)) == sorted([ filename + ".png" for filename in filenames ] + [ "index.html", "manifest.json" ])
+    # Inserting a shot only renders the new one
+    shutil.copyfile(dirname + filenames[0], dirname + "shot_0.segy")
+    assert render_report(dirname, output = output, nproc = 1) == 1
+    # Removing a shot renders nothing and removes its image
+    os.remove(dirname + filenames[1])
+    assert render_report(dirname, output = output, nproc = 1) == 0
+    assert not os.path.isfile(os.path.join(output, filenames[1] + ".png"))
+
+
+def test_render_report_errors(tmp_path):
+    dirname = str(tmp_path / "survey") + "/"
+    output = str(tmp_path / "report")
+    synthetic_survey(dirname, nshot = 2, nrcv = 6, npts = 200)
+    with open(dirname + "broken.segy", "wb") as f:
+        f.write(b"not a seg-y file")
+    assert render_report(dirname, output = output, nproc = 1) == 2
+    with open(os.path.join(output, "index.html")) as f:
+        index = f.read()
+    assert "1 shots could not be rendered" in index
+    assert "<li>broken.segy: " in index
+    # Failed shots are tried again
+    assert render_report(dirname, output = output, nproc = 1) == 0
+    assert not os.path.isfile(os.path.join(output, "broken.segy.png"))
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from pycker.resample import rate_ratio, resample
+
+
+def sines(freqs, sampling_rate, npts = 4000):
+    t = np.arange(npts) / sampling_rate
+    return np.array([ np.sin(2. * np.pi * f * t) for f in freqs ])
+
+
+def test_rate_ratio():
+    assert rate_ratio(4000., 1000.) == (1, 4)
+    assert rate_ratio(1000., 1500.) == (3, 2)
+    assert rate_ratio(1000., 1000.) == (1, 1)
+    with pytest.raises(ValueError):
+        rate_ratio(0., 1000.)
+    with pytest.raises(ValueError):
+        rate_ratio(1e6, 1e-3, max_denominator = 10)
+
+
+def test_resample_same_rate():
+    X = sines([ 50. ], 1000.)
+    assert resample(X, 1000., 1000.) is X
+
+
+def test_resample_down():
+    X = sines([ 50., 1800. ], 4000.)
+    Y = resample(X, 4000., 1000.)
+    assert Y.shape == (2, 1000)
+    # Low frequency is preserved away from edges, high frequency is removed
+    np.testing.assert_allclose(Y[0,100:-100], sines([ 50. ], 1000., 1000)[0,100:-100], atol = 0.01)
+    assert np.abs(Y[1,100:-100]).max() < 0.01
+
+
+def test_resample_up():
+    X = sines([ 50. ], 1000.)
+    Y = resample(X, 1000., 1500.)
+    assert Y.shape == (1, 6000)
+    np.testing.assert_allclose(Y[0,100:-100], sines([ 50. ], 1500., 6000)[0,100:-100], atol = 0.01)
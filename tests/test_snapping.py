@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from pycker.snapping import energy_ratio, energy_ratio_picks, PickSnapper
+
+
+def synthetic_gather(onsets, npts = 500, period = 25., noise = 0.01, seed = 0):
+    rng = np.random.RandomState(seed)
+    X = noise * rng.randn(len(onsets), npts)
+    t = np.arange(npts)
+    for k, onset in enumerate(onsets):
+        tau = t[onset:] - onset
+        X[k,onset:] += np.sin(2. * np.pi * tau / period) * np.exp(-tau / 80.)
+    return X
+
+
+def test_energy_ratio_full_windows():
+    X = synthetic_gather([ 100, 200 ])
+    cf = energy_ratio(X, 20)
+    assert np.all(cf[:,:20] == 0.)
+    assert np.all(cf[:,-19:] == 0.)
+    assert np.all(np.abs(np.argmax(cf, axis = 1) - [ 100, 200 ]) <= 8)
+
+
+def test_energy_ratio_short_traces():
+    cf = energy_ratio(np.ones((2, 30)), 20)
+    assert cf.shape == (2, 30)
+    assert np.all(cf == 0.)
+
+
+def test_energy_ratio_picks_known_onsets():
+    onsets = np.linspace(25, 300, 24).round().astype(int)
+    X = synthetic_gather(onsets)
+    X[:,:3] *= [ 0.01, 0.1, 0.5 ]
+    idx = energy_ratio_picks(X, window = 20)
+    assert np.all(np.abs(idx - onsets) <= 12)   # Half a period
+
+
+def test_energy_ratio_picks_threshold():
+    X = 0.01 * np.random.RandomState(1).randn(3, 500)
+    assert np.all(np.isnan(energy_ratio_picks(X, threshold = 10.)))
+
+
+def test_onset_snap_near_trace_start():
+    onsets = [ 25, 40, 60 ]
+    X = synthetic_gather(onsets)
+    X[:,:3] *= [ 0.01, 0.1, 0.5 ]   # Tapered start of records
+    snapper = PickSnapper(X)
+    for k, onset in enumerate(onsets):
+        assert abs(snapper.snap(k, onset + 5., "onset") - onset) <= 8
+        assert abs(snapper.snap(k, onset - 12., "onset") - onset) <= 8
+    # No onset within the first window, the click is kept
+    assert snapper.snap(0, 3., "onset", window = 10) == 3.
+
+
+def test_zero_crossing_snap():
+    X = np.sin(2. * np.pi * np.arange(100.) / 20.)[None,:] + 0.1
+    snapper = PickSnapper(X)
+    x = snapper.snap(0, 12., "zero")
+    assert abs(np.sin(2. * np.pi * x / 20.) + 0.1) < 0.05